@@ -0,0 +1,152 @@
+"""
+Logging pipeline — queued handlers and sampled structured access logs.
+
+Log records are put on a bounded in-memory queue by the request threads;
+a single listener thread formats them and does the I/O, so a slow
+terminal, pipe or disk never shows up in request latency. When the queue
+is full records are dropped and counted rather than blocking the request.
+
+Every request gets one JSON access-log line. Successful (< 400) requests
+faster than ACCESS_LOG_SLOW_MS are sampled at ACCESS_LOG_SAMPLE_RATE;
+errors and slow requests are always logged.
+"""
+
+import atexit
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import threading
+import time
+from datetime import datetime, timezone
+
+from flask import g, request
+
+LOG_LEVEL = os.getenv('LOG_LEVEL', 'INFO').upper()
+LOG_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+LOG_QUEUE_SIZE = int(os.getenv('LOG_QUEUE_SIZE', '10000'))
+ACCESS_LOG_SAMPLE_RATE = float(os.getenv('ACCESS_LOG_SAMPLE_RATE', '1.0'))
+ACCESS_LOG_SLOW_MS = float(os.getenv('ACCESS_LOG_SLOW_MS', '500'))
+
+access_logger = logging.getLogger('access')
+
+
+class _DroppingQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler that drops records instead of blocking when the queue is full."""
+
+    def __init__(self, log_queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class _Formatter(logging.Formatter):
+    """The usual text format; access records become a single JSON line."""
+
+    def format(self, record):
+        entry = getattr(record, 'access', None)
+        if entry is None:
+            return super().format(record)
+        entry = {'ts': datetime.fromtimestamp(record.created, timezone.utc).isoformat(), **entry}
+        return json.dumps(entry, separators=(',', ':'), default=str)
+
+
+_handler = None
+_listener = None
+_lock = threading.Lock()
+
+
+def _start_listener():
+    global _listener
+    output = logging.StreamHandler()
+    output.setFormatter(_Formatter(LOG_FORMAT))
+    _listener = logging.handlers.QueueListener(_handler.queue, output, respect_handler_level=False)
+    _listener.start()
+
+
+def _stop_listener():
+    """Flush everything queued so far (atexit)."""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+    if _handler is not None and _handler.dropped:
+        logging.getLogger(__name__).warning(f"Dropped {_handler.dropped} log records (queue full)")
+
+
+def _after_fork():
+    # The listener thread does not survive fork; the child gets its own queue and thread
+    if _handler is None:
+        return
+    _handler.queue = queue.Queue(LOG_QUEUE_SIZE)
+    _handler.dropped = 0
+    _start_listener()
+
+
+def configure_logging(level: str = LOG_LEVEL):
+    """Route every log record through the queue (idempotent)."""
+    global _handler
+    with _lock:
+        if _handler is not None:
+            return
+        _handler = _DroppingQueueHandler(queue.Queue(LOG_QUEUE_SIZE))
+        root = logging.getLogger()
+        for existing in list(root.handlers):
+            root.removeHandler(existing)
+        root.addHandler(_handler)
+        root.setLevel(level)
+        _start_listener()
+        atexit.register(_stop_listener)
+        os.register_at_fork(after_in_child=_after_fork)
+
+
+def dropped_records() -> int:
+    return _handler.dropped if _handler is not None else 0
+
+
+# ── Access log ───────────────────────────────────
+
+def _should_log(status: int, elapsed_ms: float) -> bool:
+    if status >= 400 or elapsed_ms >= ACCESS_LOG_SLOW_MS:
+        return True
+    return ACCESS_LOG_SAMPLE_RATE >= 1.0 or random.random() < ACCESS_LOG_SAMPLE_RATE
+
+
+def init_access_log(app):
+    """Log one structured line per request (sampled for fast successes)."""
+
+    @app.before_request
+    def start_timer():
+        g.start_time = time.perf_counter()
+
+    @app.after_request
+    def log_access(response):
+        start = g.get('start_time')
+        if start is None or request.method == 'OPTIONS':
+            return response
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        status = response.status_code
+        if not _should_log(status, elapsed_ms) or not access_logger.isEnabledFor(logging.INFO):
+            return response
+        user = g.get('user')
+        # Formatting happens on the listener thread
+        access_logger.info('access', extra={'access': {
+            'method': request.method,
+            'path': request.path,
+            'status': status,
+            'ms': round(elapsed_ms, 2),
+            # Measuring a streamed body would consume it (and block on event streams)
+            'bytes': None if response.is_streamed else response.calculate_content_length(),
+            'ip': request.remote_addr,
+            'user': getattr(user, 'id', None),
+            'slow': elapsed_ms >= ACCESS_LOG_SLOW_MS,
+            'sample': ACCESS_LOG_SAMPLE_RATE if status < 400 and elapsed_ms < ACCESS_LOG_SLOW_MS else 1.0,
+        }})
+        return response
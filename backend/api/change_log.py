@@ -0,0 +1,182 @@
+"""
+Append-only change log shared by every process using the same data directory.
+
+Each committed JsonCollection mutation can be appended as one JSON line
+(collection, event, record id, owner ids). A cursor is "<log id>.<byte offset>":
+reading from a cursor returns the entries appended after it and the cursor
+for the new end. Appends are single O_APPEND writes, so concurrent writers
+(threads or worker processes) never interleave lines.
+
+When the file grows past max_bytes it is rotated to a new log id; cursors
+into the old log are reported as expired and clients resynchronize.
+Appends hold a shared flock on <log>.lock and rotation an exclusive one,
+so no process can append to a log another has just rotated away. reset()
+writes a marker that expires every cursor from before it, for changes
+that were never logged (a collection restored from backup).
+"""
+
+import json
+import logging
+import os
+import secrets
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+try:
+    import fcntl
+except ImportError:  # Windows: no cross-process locking (run a single server process)
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_BYTES = 16 * 1024 * 1024
+
+
+class ChangeLog:
+    """Cursor-addressable append-only JSON-lines log."""
+
+    def __init__(self, path: Path, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.path = Path(path)
+        self.lockpath = self.path.with_name(self.path.name + '.lock')
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._fd = None
+        self._ino = None
+        self._log_id = None
+
+    # ── Writing ──────────────────────────────────
+
+    def _open(self):
+        """(Re)open the current log file, creating it with a header if needed."""
+        os.makedirs(self.path.parent, exist_ok=True)
+        if self._fd is not None:
+            os.close(self._fd)
+        self._fd = os.open(self.path, os.O_RDWR | os.O_APPEND | os.O_CREAT, 0o644)
+        st = os.fstat(self._fd)
+        if st.st_size == 0:
+            header = {'log': secrets.token_hex(8), 'created': time.time()}
+            os.write(self._fd, (json.dumps(header) + '\n').encode())
+        self._ino = st.st_ino
+        self._log_id = self._read_header()
+
+    def _read_header(self) -> Optional[str]:
+        # Through our descriptor: the path may already name a newer, rotated-in log.
+        # Seeking is harmless, since O_APPEND writes always go to the end.
+        os.lseek(self._fd, 0, os.SEEK_SET)
+        try:
+            return json.loads(os.read(self._fd, 4096).split(b'\n', 1)[0]).get('log')
+        except ValueError:
+            return None
+
+    def _current(self):
+        """Make sure our descriptor points at the live file (another process may have rotated it)."""
+        try:
+            ino = os.stat(self.path).st_ino
+        except FileNotFoundError:
+            ino = None
+        if self._fd is None or ino != self._ino:
+            self._open()
+
+    @contextmanager
+    def _flocked(self, exclusive: bool = False):
+        """flock on the lock file: shared to append, exclusive to rotate.
+
+        A fresh descriptor each time, since flocks held through descriptors
+        inherited across fork() would not exclude the other process.
+        """
+        if fcntl is None:
+            yield
+            return
+        os.makedirs(self.path.parent, exist_ok=True)
+        fd = os.open(self.lockpath, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+            yield
+        finally:
+            os.close(fd)  # releases the flock
+
+    def append(self, entry: dict):
+        line = (json.dumps(entry, separators=(',', ':'), default=str) + '\n').encode()
+        with self._lock:
+            with self._flocked():
+                self._current()
+                os.write(self._fd, line)
+                full = os.fstat(self._fd).st_size > self.max_bytes
+            if full:
+                self._rotate()
+
+    def reset(self, reason: str):
+        """Expire every cursor issued so far, e.g. after changes that were not logged."""
+        line = (json.dumps({'reset': reason, 't': time.time()}) + '\n').encode()
+        with self._lock:
+            with self._flocked():
+                self._current()
+                os.write(self._fd, line)
+        logger.warning(f"Change log {self.path.name} reset: {reason}")
+
+    def _rotate(self):
+        """Start a new log once appends in flight (in any process) are done. Caller holds _lock."""
+        with self._flocked(exclusive=True):
+            # Another process may have rotated while we waited for the lock
+            self._current()
+            if os.fstat(self._fd).st_size <= self.max_bytes:
+                return
+            rotated = self.path.with_name(self.path.name + '.1')
+            try:
+                os.replace(self.path, rotated)
+            except FileNotFoundError:
+                pass
+            self._open()
+        logger.info(f"Rotated change log {self.path.name} (new log {self._log_id})")
+
+    # ── Reading ──────────────────────────────────
+
+    def cursor(self) -> str:
+        """Cursor for the current end of the log."""
+        with self._lock:
+            self._current()
+            return f'{self._log_id}.{os.fstat(self._fd).st_size}'
+
+    def read_since(self, cursor: str) -> Tuple[Optional[List[dict]], str]:
+        """Entries after `cursor` and the new cursor.
+
+        Entries are None when the cursor is malformed, belongs to a rotated
+        log or predates a reset(); the caller should then resynchronize from
+        scratch.
+        """
+        try:
+            cursor_log, offset = cursor.rsplit('.', 1)
+            offset = int(offset)
+        except (AttributeError, ValueError):
+            return None, self.cursor()
+
+        try:
+            with open(self.path, 'rb') as f:
+                try:
+                    log_id = json.loads(f.readline()).get('log')
+                except ValueError:
+                    log_id = None
+                if cursor_log != log_id or offset < f.tell():
+                    return None, self.cursor()
+                f.seek(offset)
+                data = f.read()
+        except FileNotFoundError:
+            return None, self.cursor()
+
+        # Stop at the last complete line; a concurrent append may be mid-flight
+        end = data.rfind(b'\n') + 1
+        entries = []
+        for line in data[:end].splitlines():
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                logger.warning(f"Skipping malformed change log line in {self.path.name}")
+                continue
+            if 'reset' in entry:
+                return None, self.cursor()
+            if 'c' in entry:  # skip headers
+                entries.append(entry)
+        return entries, f'{log_id}.{offset + end}'
@@ -0,0 +1,62 @@
+"""
+Request-scoped identity map for JsonCollection reads.
+
+Within one request the same records are often loaded several times (auth,
+profile lookups, joins). While an IdentityMap is active, each distinct read —
+a (collection, id) or (collection, filter) — hits the file at most once; any
+write to a collection drops that collection's cached reads.
+
+The map is framework-agnostic: json_db asks a provider function for the
+current map (the Flask app returns `g.identity_map`).
+"""
+
+import threading
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+
+_MISSING = object()
+
+
+class IdentityMap:
+    """Cache of read results keyed by collection and query."""
+
+    def __init__(self):
+        self._entries: Dict[str, Dict[Hashable, Any]] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def lookup(self, collection: str, key: Hashable) -> Tuple[bool, Any]:
+        with self._lock:
+            value = self._entries.get(collection, {}).get(key, _MISSING)
+            if value is _MISSING:
+                self.misses += 1
+                return False, None
+            self.hits += 1
+            return True, value
+
+    def store(self, collection: str, key: Hashable, value: Any):
+        with self._lock:
+            self._entries.setdefault(collection, {})[key] = value
+
+    def invalidate(self, collection: str):
+        with self._lock:
+            self._entries.pop(collection, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+_provider: Optional[Callable[[], Optional[IdentityMap]]] = None
+
+
+def set_identity_map_provider(provider: Optional[Callable[[], Optional[IdentityMap]]]):
+    """Register the function that returns the active IdentityMap (or None)."""
+    global _provider
+    _provider = provider
+
+
+def current_identity_map() -> Optional[IdentityMap]:
+    if _provider is None:
+        return None
+    return _provider()
@@ -8,22 +8,44 @@ Improvements over original:
 - bulk_create() and bulk_delete()
 - Auto-backup on writes (keeps last 3 backups)
 - Input validation hooks
+- Checksummed, atomically replaced collection files (re-verified whenever
+  another process has rewritten them)
+- Startup verification with automatic restore from the newest good backup
 """
 
 import json
 import os
 import shutil
+import tempfile
 import threading
 import hashlib
-import secrets
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
 from datetime import datetime, date
 from typing import Any, Dict, List, Optional, Callable
 from pathlib import Path
 
-# Determine data directory
-DATA_DIR = Path(__file__).resolve().parent.parent / 'data'
+try:
+    import fcntl
+except ImportError:  # Windows: no cross-process locking (run a single server process)
+    fcntl = None
+
+from .identity_map import current_identity_map
+from .metrics import collection_metrics
+from .timing import record as record_span
+
+logger = logging.getLogger(__name__)
+
+# Determine data directory (JSON_DB_DIR overrides, e.g. for load-test datasets)
+DATA_DIR = Path(os.getenv('JSON_DB_DIR') or Path(__file__).resolve().parent.parent / 'data')
 BACKUP_DIR = DATA_DIR / '_backups'
 MAX_BACKUPS = 3
+CORRUPT_DIR_NAME = '_corrupt'
+# Fields that partition a collection by owner, for per-owner version counters
+OWNER_FIELDS = ('user', 'user_id', 'patient', 'doctor', 'recorded_by', 'created_by')
+MAX_TRACKED_PARTITIONS = 100_000
 
 
 class DateTimeEncoder(json.JSONEncoder):
@@ -47,52 +69,493 @@ def _parse_datetime(val):
     return val
 
 
+class CorruptCollectionError(Exception):
+    """Raised when a collection file is corrupt and no good backup exists."""
+
+
+def _serialize(data: dict) -> str:
+    """Serialize a collection payload with an embedded SHA-256 checksum.
+
+    The checksum covers the pretty-printed payload without the checksum key,
+    so verification only needs to re-serialize what was loaded.
+    """
+    payload = {k: v for k, v in data.items() if k != 'checksum'}
+    body = json.dumps(payload, indent=2, cls=DateTimeEncoder)
+    digest = hashlib.sha256(body.encode()).hexdigest()
+    return f'{body[:-2]},\n  "checksum": "{digest}"\n}}'
+
+
+def _checksum_status(data) -> str:
+    """Return 'ok', 'legacy' (no checksum stored) or 'corrupt'."""
+    if not isinstance(data, dict) or not isinstance(data.get('records'), list):
+        return 'corrupt'
+    stored = data.get('checksum')
+    if stored is None:
+        return 'legacy'
+    payload = {k: v for k, v in data.items() if k != 'checksum'}
+    body = json.dumps(payload, indent=2, cls=DateTimeEncoder)
+    return 'ok' if hashlib.sha256(body.encode()).hexdigest() == stored else 'corrupt'
+
+
+_CHECKSUM_MARKER = b',\n  "checksum": "'
+_CHECKSUM_TAIL_BYTES = 128  # the marker, 64 hex digits and the closing '"\n}'
+
+
+def _stored_checksum(raw: bytes) -> str:
+    """The checksum at the end of a file written by _serialize() ('' if there is none)."""
+    marker = raw.rfind(_CHECKSUM_MARKER, -_CHECKSUM_TAIL_BYTES)
+    if marker == -1:
+        return ''
+    start = marker + len(_CHECKSUM_MARKER)
+    return raw[start:start + 64].decode('ascii', 'replace')
+
+
+def _read_tail(f, size: int) -> bytes:
+    f.seek(max(0, size - _CHECKSUM_TAIL_BYTES))
+    return f.read()
+
+
+def _raw_checksum_status(raw: bytes, data) -> str:
+    """_checksum_status() by hashing the file bytes instead of re-serializing.
+
+    Files written by _serialize() are the hashed body with the checksum
+    spliced in before the closing brace; anything else takes the slow path.
+    """
+    stored = data.get('checksum') if isinstance(data, dict) else None
+    marker = raw.rfind(_CHECKSUM_MARKER)
+    if stored is not None and marker != -1 and isinstance(data.get('records'), list):
+        if hashlib.sha256(raw[:marker] + b'\n}').hexdigest() == stored:
+            return 'ok'
+    return _checksum_status(data)
+
+
+def _load_verified(path: Path):
+    """Load a collection file, returning (data, status)."""
+    try:
+        with open(path, 'r') as f:
+            data = json.load(f)
+    except FileNotFoundError:
+        return None, 'missing'
+    except (json.JSONDecodeError, UnicodeDecodeError):
+        return None, 'corrupt'
+    return data, _checksum_status(data)
+
+
+def _copy(record: dict, fields: Optional[tuple] = None) -> dict:
+    """Shallow copy of a record, keeping only `fields` when given."""
+    if fields is None:
+        return dict(record)
+    return {k: record[k] for k in fields if k in record}
+
+
+def _copy_records(records: List[dict], fields: Optional[tuple] = None) -> List[dict]:
+    return [_copy(r, fields) for r in records]
+
+
+def _copy_record(record: Optional[dict], fields: Optional[tuple] = None) -> Optional[dict]:
+    return _copy(record, fields) if record is not None else None
+
+
+def _copy_mapping(records: Dict[Any, dict], fields: Optional[tuple] = None) -> Dict[Any, dict]:
+    return {k: _copy(v, fields) for k, v in records.items()}
+
+
+def _field_tuple(fields) -> Optional[tuple]:
+    if fields is None:
+        return None
+    return (fields,) if isinstance(fields, str) else tuple(fields)
+
+
+# Every collection instance, keyed by name (first instance wins).
+_registry: Dict[str, 'JsonCollection'] = {}
+
+
 class JsonCollection:
-    """Manages a single JSON file as a collection of records."""
+    """Manages a single JSON file as a collection of records.
+
+    `version` increases on every committed write, and on writes made to the
+    file by another process (detected from its stat signature on access).
+    Per-record and per-owner versions are tracked for the fields in
+    OWNER_FIELDS; see version_of(). validator_of() gives the same, but
+    comparable between processes.
+    """
 
     def __init__(self, name: str, data_dir: Path = DATA_DIR):
         self.name = name
         self.data_dir = data_dir
         self.filepath = data_dir / f'{name}.json'
+        self.backup_dir = data_dir / '_backups' / name
+        self.lockpath = data_dir / f'{name}.json.lock'
         self._lock = threading.Lock()
+        self._file_mutex = threading.RLock()
+        self._file_lock_owner = None  # thread id holding file_lock()
+        self.metrics = collection_metrics(name)
+        self._span = f'db.{name}'
+        self._listeners: List[Callable[[str, Optional[dict], Optional[dict]], None]] = []
+        self.version = 0
+        self.last_modified = 0.0
+        self._partition_versions: Dict[tuple, int] = {}
+        self._floor_version = 0
+        self._partition_stamps: Dict[tuple, str] = {}
+        self._floor_stamp = ''
+        self._file_signature = None
+        self._file_checksum = ''
+        self._verified_signature = None
         self._ensure_file()
+        self._detect_external_change()
+        self._floor_stamp = self._stamp()
+        _registry.setdefault(name, self)
+
+    def add_listener(self, callback: Callable[[str, Optional[dict], Optional[dict]], None]):
+        """Call `callback(event, record, previous)` after every committed write.
+
+        `event` is 'create', 'update', 'delete' or 'reload' (file restored from
+        backup or rewritten by another process; `record` is None, and
+        `previous` is {'restored_from': <backup name>} when this process did
+        the restore, else None). Listeners run while the collection lock
+        is held, so they must not call back into the same collection.
+        """
+        self._listeners.append(callback)
+
+    def _notify(self, event: str, record: Optional[dict], previous: Optional[dict] = None):
+        self._bump(event, record, previous)
+        for callback in self._listeners:
+            try:
+                callback(event, _copy_record(record), previous)
+            except Exception:
+                logger.exception(f"Listener failed for {self.name} {event}")
+
+    # ── Versions ─────────────────────────────────
+
+    def _stamp(self) -> str:
+        """The file's stat signature and stored checksum as text; the same in every process reading it."""
+        parts = [f'{n:x}' for n in self._file_signature or ()]
+        if self._file_checksum:
+            parts.append(self._file_checksum[:16])
+        return '-'.join(parts)
+
+    def _bump(self, event: str, record: Optional[dict], previous: Optional[dict]):
+        self.version += 1
+        stamp = self._stamp()
+        if event == 'reload' or len(self._partition_versions) > MAX_TRACKED_PARTITIONS:
+            # Unknown set of changed records: every partition moves forward
+            self._partition_versions.clear()
+            self._partition_stamps.clear()
+            self._floor_version = self.version
+            self._floor_stamp = stamp
+            return
+        for rec in (record, previous):
+            if not rec:
+                continue
+            for field in ('id',) + OWNER_FIELDS:
+                value = rec.get(field)
+                if value is not None and not isinstance(value, (dict, list)):
+                    self._partition_versions[(field, value)] = self.version
+                    self._partition_stamps[(field, value)] = stamp
+
+    def _detect_external_change(self, check_content: bool = False):
+        """Notice writes made by other processes. Caller holds the lock (or is __init__).
+
+        A changed stat signature is enough on its own; with check_content the
+        stored checksum is read as well, for a replacement that landed on a
+        reused inode within one mtime tick and with the same size.
+        """
+        try:
+            st = os.stat(self.filepath)
+        except FileNotFoundError:
+            return
+        signature = (st.st_mtime_ns, st.st_size, st.st_ino)
+        checksum = self._file_checksum
+        if signature != self._file_signature or check_content:
+            try:
+                with open(self.filepath, 'rb') as f:
+                    st = os.fstat(f.fileno())  # the stat that goes with the bytes read
+                    signature = (st.st_mtime_ns, st.st_size, st.st_ino)
+                    checksum = _stored_checksum(_read_tail(f, st.st_size))
+            except FileNotFoundError:
+                return
+        if signature == self._file_signature and checksum == self._file_checksum:
+            return
+        known = self._file_signature is not None
+        self._file_signature = signature
+        self._file_checksum = checksum
+        self.last_modified = st.st_mtime
+        if known:
+            self._notify('reload', None)
+
+    def version_of(self, field: Optional[str] = None, value: Any = None) -> int:
+        """Current version of the collection, or of one partition (e.g. 'patient', 7).
+
+        A partition's version only moves when a record in it changes, so it
+        can validate cached per-owner lists and per-record detail responses.
+        """
+        with self._locked('version'):
+            self._detect_external_change()
+            if field is None:
+                return self.version
+            return max(self._partition_versions.get((field, value), 0), self._floor_version)
+
+    def validator_of(self, field: Optional[str] = None, value: Any = None) -> str:
+        """Like version_of(), but the same in every process serving the same file.
+
+        The whole collection is identified by the file's current stat signature
+        (mtime_ns, size, inode) plus its stored checksum, which is re-read on
+        every call; a partition by the stamp of the write that last changed it. Processes only see each other's writes as reloads, so
+        a worker that did not make the write may hand out a newer tag for an
+        unchanged partition (a needless 200), never an equal tag for changed data.
+        """
+        with self._locked('version'):
+            self._detect_external_change(check_content=True)
+            if field is None:
+                return self._stamp()
+            return self._partition_stamps.get((field, value), self._floor_stamp)
+
+    @contextmanager
+    def _locked(self, op: str):
+        """Hold the collection lock for one operation, recording wait and hold time."""
+        start = time.perf_counter()
+        self._lock.acquire()
+        acquired = time.perf_counter()
+        try:
+            yield
+        finally:
+            self._lock.release()
+            done = time.perf_counter()
+            self.metrics.observe_op(op, acquired - start, done - acquired)
+            record_span(self._span, done - start)
+
+    @contextmanager
+    def file_lock(self):
+        """Exclusive lock on the collection across threads and processes.
+
+        Every read-modify-write cycle holds it (an flock on <name>.json.lock),
+        so writes from several server processes take turns instead of
+        overwriting each other. Re-entrant within a thread: a caller may hold
+        it around a check and the write that depends on it. Acquire it before
+        the in-process lock, never while holding that.
+        """
+        with self._file_mutex:
+            if self._file_lock_owner is not None or fcntl is None:
+                # Already held by this thread (the mutex admits no other)
+                yield
+                return
+            fd = os.open(self.lockpath, os.O_RDWR | os.O_CREAT, 0o644)
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX)
+                self._file_lock_owner = threading.get_ident()
+                yield
+            finally:
+                self._file_lock_owner = None
+                os.close(fd)  # releases the flock
+
+    @contextmanager
+    def _write_locked(self, op: str):
+        with self.file_lock(), self._locked(op):
+            yield
 
     def _ensure_file(self):
         os.makedirs(self.filepath.parent, exist_ok=True)
-        if not self.filepath.exists():
-            self._write_raw({'auto_id': 0, 'records': []})
+        with self.file_lock():
+            if not self.filepath.exists() and not self._backups():
+                self._write_raw({'auto_id': 0, 'records': []})
 
     def _read_raw(self) -> dict:
+        self._detect_external_change()
         try:
-            with open(self.filepath, 'r') as f:
-                return json.load(f)
-        except (json.JSONDecodeError, FileNotFoundError):
-            return {'auto_id': 0, 'records': []}
+            with open(self.filepath, 'rb') as f:
+                st = os.fstat(f.fileno())
+                raw = f.read()
+            start = time.perf_counter()
+            data = json.loads(raw)
+            self.metrics.observe_read(len(raw), time.perf_counter() - start)
+            signature = (st.st_mtime_ns, st.st_size, st.st_ino)
+            if signature == self._file_signature and _stored_checksum(raw) != self._file_checksum:
+                # Replaced without a visible stat change; drop stamps and caches like any reload
+                self._file_checksum = _stored_checksum(raw)
+                self._verified_signature = None
+                self._notify('reload', None)
+            if signature == self._verified_signature:
+                return data
+            # Not written by this process (or not read since startup): a file
+            # that parses can still be damaged, so check it before trusting it
+            if _raw_checksum_status(raw, data) != 'corrupt':
+                self._verified_signature = signature
+                return data
+            logger.error(f"Collection '{self.name}' failed its checksum on reload")
+        except FileNotFoundError:
+            if not self._backups():
+                return {'auto_id': 0, 'records': []}
+        except (json.JSONDecodeError, UnicodeDecodeError):
+            pass
+        # Never hand back an empty collection for a damaged file: the next
+        # write would persist that over the real data.
+        report = self._recover_locked()
+        if report['action'] == 'failed':
+            raise CorruptCollectionError(
+                f'{self.name}: collection file is corrupt and no good backup was found'
+            )
+        with open(self.filepath, 'r') as f:
+            return json.load(f)
 
     def _write_raw(self, data: dict):
-        with open(self.filepath, 'w') as f:
-            json.dump(data, f, indent=2, cls=DateTimeEncoder)
+        """Atomically replace the collection file with a checksummed copy.
+
+        Each write goes through its own temp file, so concurrent writers can
+        never rename a file another one is still filling.
+        """
+        start = time.perf_counter()
+        raw = _serialize(data).encode()
+        self.metrics.observe_write(len(raw), time.perf_counter() - start)
+        fd, tmp = tempfile.mkstemp(dir=self.filepath.parent, prefix=f'.{self.filepath.name}.', suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                os.fchmod(f.fileno(), 0o644)  # mkstemp creates files as 0600
+                f.write(raw)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp, self.filepath)
+        except BaseException:
+            try:
+                os.unlink(tmp)
+            except FileNotFoundError:
+                pass
+            raise
+        st = os.stat(self.filepath)
+        self._file_signature = (st.st_mtime_ns, st.st_size, st.st_ino)
+        self._file_checksum = _stored_checksum(raw)
+        self._verified_signature = self._file_signature
+        self.last_modified = st.st_mtime
+        imap = current_identity_map()
+        if imap is not None:
+            imap.invalidate(str(self.filepath))
+
+    def _read_through(self, key, load: Callable[[], Any], copy: Callable[..., Any] = _copy_records,
+                      fields=None):
+        """Serve a read from the request's identity map, loading it at most once.
+
+        Callers always get copies so mutating a result never leaks into
+        later reads in the same request. With `fields`, the copies are
+        projections holding only those fields; full records stay cached.
+        """
+        fields = _field_tuple(fields)
+        imap = current_identity_map()
+        if imap is None:
+            value = load()
+            return value if fields is None else copy(value, fields)
+        try:
+            hit, value = imap.lookup(str(self.filepath), key)
+        except TypeError:  # unhashable filter value
+            value = load()
+            return value if fields is None else copy(value, fields)
+        if not hit:
+            value = load()
+            imap.store(str(self.filepath), key, value)
+        return copy(value, fields)
+
+    def _backups(self) -> List[Path]:
+        """Existing backups, oldest first."""
+        if not self.backup_dir.exists():
+            return []
+        return sorted(self.backup_dir.glob(f'{self.name}_*.json'))
 
     def _backup(self):
-        """Create a timestamped backup of the collection file (keeps last N)."""
-        backup_dir = BACKUP_DIR / self.name
-        os.makedirs(backup_dir, exist_ok=True)
-        stamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-        dst = backup_dir / f'{self.name}_{stamp}.json'
+        """Snapshot the freshly written collection file (keeps last N).
+
+        Snapshots are taken after each write, so the newest good one always
+        matches the last committed state.
+        """
+        start = time.perf_counter()
+        os.makedirs(self.backup_dir, exist_ok=True)
+        stamp = datetime.now().strftime('%Y%m%d_%H%M%S_%f')
+        dst = self.backup_dir / f'{self.name}_{stamp}.json'
         try:
             shutil.copy2(self.filepath, dst)
         except FileNotFoundError:
             return
         # Prune old backups
-        backups = sorted(backup_dir.glob(f'{self.name}_*.json'))
+        backups = self._backups()
         while len(backups) > MAX_BACKUPS:
             backups.pop(0).unlink(missing_ok=True)
+        self.metrics.observe_backup(time.perf_counter() - start)
+
+    # ── Verification & Recovery ──────────────────
+
+    def verify(self) -> dict:
+        """Check the collection file and restore it from a backup if it is damaged.
+
+        Returns a recovery report entry describing what was found and done.
+        """
+        with self._write_locked('verify'):
+            return self._recover()
+
+    def _recover_locked(self) -> dict:
+        """_recover() for an operation that found the file damaged while reading it.
+
+        Restoring writes the file, so it needs the cross-process lock, and that
+        lock comes before the in-process one: a read drops its lock, recovers
+        under both, then takes its lock back. _recover() checks the file again
+        first, so a good file another worker wrote meanwhile is kept rather
+        than replaced by an older backup. Caller holds the in-process lock.
+        """
+        if fcntl is None or self._file_lock_owner == threading.get_ident():
+            return self._recover()  # a write: both locks are already held
+        self._lock.release()
+        try:
+            with self.file_lock(), self._lock:
+                return self._recover()
+        finally:
+            self._lock.acquire()
+
+    def _recover(self) -> dict:
+        """Verify the file and fall back to the newest good backup. Caller holds the lock."""
+        data, status = _load_verified(self.filepath)
+        report = {
+            'collection': self.name,
+            'status': status,
+            'action': 'none',
+            'source': None,
+            'records': len(data['records']) if status in ('ok', 'legacy') else None,
+        }
+        if status in ('ok', 'legacy'):
+            return report
+        if status == 'missing' and not self._backups():
+            self._write_raw({'auto_id': 0, 'records': []})
+            report.update(action='created', records=0)
+            return report
+
+        for backup in reversed(self._backups()):
+            backup_data, backup_status = _load_verified(backup)
+            if backup_status not in ('ok', 'legacy'):
+                logger.warning(f"Skipping damaged backup {backup.name}")
+                continue
+            if status == 'corrupt':
+                self._quarantine()
+            self._write_raw(backup_data)
+            report.update(action='restored', source=backup.name,
+                          records=len(backup_data['records']))
+            self._notify('reload', None, {'restored_from': backup.name})
+            logger.warning(f"Collection '{self.name}' was {status}; restored from {backup.name}")
+            return report
+
+        report['action'] = 'failed'
+        logger.error(f"Collection '{self.name}' is {status} and no good backup is available")
+        return report
+
+    def _quarantine(self):
+        """Move a damaged collection file aside instead of deleting it."""
+        corrupt_dir = self.data_dir / CORRUPT_DIR_NAME
+        os.makedirs(corrupt_dir, exist_ok=True)
+        stamp = datetime.now().strftime('%Y%m%d_%H%M%S_%f')
+        try:
+            shutil.copy2(self.filepath, corrupt_dir / f'{self.name}_{stamp}.json')
+        except FileNotFoundError:
+            pass
 
     # ── CRUD ─────────────────────────────────────
 
     def create(self, record: dict) -> dict:
         """Insert a new record, auto-assigning an integer ID."""
-        with self._lock:
+        with self._write_locked('create'):
             data = self._read_raw()
             data['auto_id'] += 1
             record = dict(record)  # don't mutate caller's dict
@@ -101,13 +564,14 @@ class JsonCollection:
             record.setdefault('created_at', now)
             record.setdefault('updated_at', now)
             data['records'].append(record)
-            self._backup()
             self._write_raw(data)
+            self._backup()
+            self._notify('create', record)
             return record
 
     def bulk_create(self, records: List[dict]) -> List[dict]:
         """Insert multiple records in a single write."""
-        with self._lock:
+        with self._write_locked('bulk_create'):
             data = self._read_raw()
             created = []
             now = datetime.now().isoformat()
@@ -119,42 +583,73 @@ class JsonCollection:
                 rec.setdefault('updated_at', now)
                 data['records'].append(rec)
                 created.append(rec)
-            self._backup()
             self._write_raw(data)
+            self._backup()
+            for rec in created:
+                self._notify('create', rec)
             return created
 
-    def get(self, record_id: int) -> Optional[dict]:
-        with self._lock:
-            data = self._read_raw()
-            for rec in data['records']:
-                if rec.get('id') == record_id:
-                    return rec
-            return None
-
-    def get_all(self) -> List[dict]:
-        with self._lock:
+    def get(self, record_id: int, fields=None) -> Optional[dict]:
+        """Record by ID; `fields` limits the returned keys (as on every read)."""
+        def load():
+            with self._locked('get'):
+                data = self._read_raw()
+                for rec in data['records']:
+                    if rec.get('id') == record_id:
+                        return rec
+                return None
+        return self._read_through(('get', record_id), load, _copy_record, fields)
+
+    def get_many(self, record_ids, fields=None) -> Dict[Any, dict]:
+        """Fetch several records by ID in a single read, keyed by ID."""
+        wanted = frozenset(record_ids)
+
+        def load():
+            with self._locked('get_many'):
+                data = self._read_raw()
+                return {r['id']: r for r in data['records'] if r.get('id') in wanted}
+        return self._read_through(('get_many', wanted), load, _copy_mapping, fields)
+
+    def get_all(self, fields=None) -> List[dict]:
+        def load():
+            with self._locked('get_all'):
+                data = self._read_raw()
+                return data['records']
+        return self._read_through(('all',), load, fields=fields)
+
+    def filter(self, fields=None, **kwargs) -> List[dict]:
+        """Filter records by exact field values (`fields` is the projection, not a filter)."""
+        def load():
+            with self._locked('filter'):
+                data = self._read_raw()
+                results = data['records']
+                for key, value in kwargs.items():
+                    results = [r for r in results if r.get(key) == value]
+                return results
+        return self._read_through(('filter', tuple(sorted(kwargs.items()))), load, fields=fields)
+
+    def filter_in(self, field: str, values, fields=None) -> List[dict]:
+        """Records whose `field` is one of `values`, in a single read."""
+        wanted = frozenset(values)
+
+        def load():
+            with self._locked('filter_in'):
+                data = self._read_raw()
+                return [r for r in data['records'] if r.get(field) in wanted]
+        return self._read_through(('filter_in', field, wanted), load, fields=fields)
+
+    def filter_fn(self, predicate: Callable[[dict], bool], fields=None) -> List[dict]:
+        """Filter records using a custom predicate function (applied to full records)."""
+        fields = _field_tuple(fields)
+        with self._locked('filter_fn'):
             data = self._read_raw()
-            return data['records']
-
-    def filter(self, **kwargs) -> List[dict]:
-        """Filter records by exact field values."""
-        with self._lock:
-            data = self._read_raw()
-            results = data['records']
-            for key, value in kwargs.items():
-                results = [r for r in results if r.get(key) == value]
-            return results
-
-    def filter_fn(self, predicate: Callable[[dict], bool]) -> List[dict]:
-        """Filter records using a custom predicate function."""
-        with self._lock:
-            data = self._read_raw()
-            return [r for r in data['records'] if predicate(r)]
+            return [r if fields is None else _copy(r, fields)
+                    for r in data['records'] if predicate(r)]
 
     def search(self, fields: List[str], query: str) -> List[dict]:
         """Partial case-insensitive text search across specified fields."""
         q = query.lower()
-        with self._lock:
+        with self._locked('search'):
             data = self._read_raw()
             results = []
             for rec in data['records']:
@@ -166,47 +661,55 @@ class JsonCollection:
             return results
 
     def update(self, record_id: int, updates: dict) -> Optional[dict]:
-        with self._lock:
+        with self._write_locked('update'):
             data = self._read_raw()
             for i, rec in enumerate(data['records']):
                 if rec.get('id') == record_id:
+                    previous = dict(rec)
                     updates['updated_at'] = datetime.now().isoformat()
                     data['records'][i].update(updates)
-                    self._backup()
                     self._write_raw(data)
+                    self._backup()
+                    self._notify('update', data['records'][i], previous)
                     return data['records'][i]
             return None
 
     def delete(self, record_id: int) -> bool:
-        with self._lock:
+        with self._write_locked('delete'):
             data = self._read_raw()
-            original_len = len(data['records'])
-            data['records'] = [r for r in data['records'] if r.get('id') != record_id]
-            if len(data['records']) < original_len:
-                self._backup()
+            removed = [r for r in data['records'] if r.get('id') == record_id]
+            if removed:
+                data['records'] = [r for r in data['records'] if r.get('id') != record_id]
                 self._write_raw(data)
+                self._backup()
+                for rec in removed:
+                    self._notify('delete', None, rec)
                 return True
             return False
 
     def bulk_delete(self, record_ids: List[int]) -> int:
         """Delete multiple records by ID. Returns count deleted."""
         ids_set = set(record_ids)
-        with self._lock:
+        with self._write_locked('bulk_delete'):
             data = self._read_raw()
-            original_len = len(data['records'])
-            data['records'] = [r for r in data['records'] if r.get('id') not in ids_set]
-            deleted = original_len - len(data['records'])
-            if deleted:
-                self._backup()
+            removed = [r for r in data['records'] if r.get('id') in ids_set]
+            if removed:
+                data['records'] = [r for r in data['records'] if r.get('id') not in ids_set]
                 self._write_raw(data)
-            return deleted
+                self._backup()
+                for rec in removed:
+                    self._notify('delete', None, rec)
+            return len(removed)
 
     def count(self, **kwargs) -> int:
         if kwargs:
             return len(self.filter(**kwargs))
-        with self._lock:
-            data = self._read_raw()
-            return len(data['records'])
+
+        def load():
+            with self._locked('count'):
+                data = self._read_raw()
+                return len(data['records'])
+        return self._read_through(('count',), load, copy=lambda n, fields=None: n)
 
     def exists(self, **kwargs) -> bool:
         return self.count(**kwargs) > 0
@@ -224,20 +727,87 @@ class JsonCollection:
         return records
 
 
-# ── Password Hashing ─────────────────────────────
-
-def hash_password(password: str) -> str:
-    salt = secrets.token_hex(16)
-    hashed = hashlib.sha256(f'{salt}{password}'.encode()).hexdigest()
-    return f'{salt}${hashed}'
-
-
-def verify_password(password: str, stored_hash: str) -> bool:
-    try:
-        salt, hashed = stored_hash.split('$', 1)
-        return hashlib.sha256(f'{salt}{password}'.encode()).hexdigest() == hashed
-    except (ValueError, AttributeError):
-        return False
+# ── Batched Joins ────────────────────────────────
+
+def prefetch(records: List[dict], field, collection: JsonCollection, as_=None,
+             transform: Optional[Callable[[Optional[dict], Any], Any]] = None,
+             fields=None) -> List[dict]:
+    """Attach related records referenced by `field` using one collection read.
+
+    `field` may be a single name or a tuple of names (e.g. ('patient', 'doctor'));
+    `as_` names the attribute(s) to set and defaults to the field name(s).
+    `transform(related, key)` maps each related record (None when missing) to
+    the attached value. `fields` projects the related records.
+
+        prefetch(records, 'patient', users_db, as_='patient_name', transform=full_name)
+    """
+    refs = (field,) if isinstance(field, str) else tuple(field)
+    targets = refs if as_ is None else ((as_,) if isinstance(as_, str) else tuple(as_))
+    keys = {r.get(f) for r in records for f in refs if r.get(f) is not None}
+    related = collection.get_many(keys, fields=fields) if keys else {}
+    for r in records:
+        for f, target in zip(refs, targets):
+            key = r.get(f)
+            rel = related.get(key)
+            r[target] = transform(rel, key) if transform else rel
+    return records
+
+
+def prefetch_children(records: List[dict], collection: JsonCollection, fk: str,
+                      as_: Optional[str] = None, key: str = 'id', fields=None) -> List[dict]:
+    """Attach child records whose `fk` points at each record's `key`, in one read.
+
+    `fields` projects the children (`fk` is always loaded for grouping).
+
+        prefetch_children(prescriptions, medications_db, fk='prescription_id', as_='medications')
+    """
+    target = as_ or collection.name
+    children: Dict[Any, List[dict]] = {}
+    keys = {r.get(key) for r in records}
+    if keys:
+        load = None if fields is None else set(_field_tuple(fields)) | {fk}
+        for child in collection.filter_in(fk, keys, fields=load):
+            children.setdefault(child.get(fk), []).append(child)
+    for r in records:
+        r[target] = children.get(r.get(key), [])
+    return records
+
+
+def project(records, fields):
+    """Trim a record or list of records to `fields` (None keeps everything).
+
+    Used after joins, once the keys the joins needed are no longer wanted.
+    """
+    fields = _field_tuple(fields)
+    if fields is None or records is None:
+        return records
+    if isinstance(records, dict):
+        return _copy(records, fields)
+    return _copy_records(records, fields)
+
+
+# ── Startup Verification ─────────────────────────
+
+def verify_collections(collections: Optional[List[JsonCollection]] = None,
+                       max_workers: int = 8) -> List[dict]:
+    """Verify every collection in parallel, restoring damaged ones from backup.
+
+    Returns the recovery report: one entry per collection.
+    """
+    if collections is None:
+        collections = list(_registry.values())
+    if not collections:
+        return []
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(collections))) as pool:
+        report = list(pool.map(lambda c: c.verify(), collections))
+
+    restored = [r['collection'] for r in report if r['action'] == 'restored']
+    failed = [r['collection'] for r in report if r['action'] == 'failed']
+    if restored:
+        logger.warning(f"Restored collections from backup: {', '.join(restored)}")
+    if failed:
+        logger.error(f"Unrecoverable collections: {', '.join(failed)}")
+    return report
 
 
 # ── Global Collection Instances ──────────────────
@@ -0,0 +1,259 @@
+"""
+Message store — persistent two-party conversations in a shared SQLite file.
+
+Messages are append-only rows keyed by (conversation, id): a conversation's
+history is one index range, so paging with a `before` cursor costs the same
+however long the history grows. Every participant has a row per
+conversation holding the peer, the last message, an unread counter and the
+id they have read up to (their read receipt); a per-user total makes the
+overall unread count a single lookup. Sending and reading each update these
+counters in the same transaction as the message itself.
+
+The file is shared by every worker process (WAL mode, one connection per
+thread), so messages survive restarts and are visible to all workers.
+"""
+
+import logging
+import os
+import sqlite3
+import threading
+from datetime import datetime
+from typing import Callable, List, Optional
+
+from .json_db import DATA_DIR
+
+logger = logging.getLogger(__name__)
+
+MESSAGES_DB_PATH = os.getenv('MESSAGES_DB_PATH', str(DATA_DIR / '_messages.sqlite3'))
+MESSAGE_PAGE_SIZE = 50
+MESSAGE_MAX_PAGE_SIZE = 200
+
+SCHEMA = (
+    'CREATE TABLE IF NOT EXISTS messages ('
+    ' id INTEGER PRIMARY KEY AUTOINCREMENT, conversation TEXT NOT NULL,'
+    ' sender INTEGER NOT NULL, recipient INTEGER NOT NULL, text TEXT NOT NULL,'
+    ' timestamp TEXT NOT NULL)',
+    'CREATE INDEX IF NOT EXISTS messages_by_conversation ON messages (conversation, id)',
+    'CREATE TABLE IF NOT EXISTS participants ('
+    ' user_id INTEGER NOT NULL, conversation TEXT NOT NULL, peer_id INTEGER NOT NULL,'
+    ' last_message_id INTEGER NOT NULL DEFAULT 0, unread INTEGER NOT NULL DEFAULT 0,'
+    ' last_read_id INTEGER NOT NULL DEFAULT 0, read_at TEXT,'
+    ' PRIMARY KEY (user_id, conversation))',
+    'CREATE INDEX IF NOT EXISTS participants_by_activity ON participants (user_id, last_message_id)',
+    'CREATE TABLE IF NOT EXISTS unread_totals ('
+    ' user_id INTEGER PRIMARY KEY, unread INTEGER NOT NULL DEFAULT 0)',
+)
+
+
+def conversation_key(a: int, b: int) -> str:
+    """Stable key for the conversation between two users."""
+    return f'{min(a, b)}_{max(a, b)}'
+
+
+def _message(row, peer_last_read: int) -> dict:
+    message_id, sender, recipient, text, timestamp = row
+    return {
+        'id': message_id, 'sender': sender, 'recipient': recipient, 'text': text,
+        'timestamp': timestamp, 'read': message_id <= peer_last_read,
+    }
+
+
+class MessageStore:
+    """Conversations, unread counters and read receipts for all users."""
+
+    def __init__(self, path: str = MESSAGES_DB_PATH):
+        self.path = str(path)
+        self._local = threading.local()
+        self._listeners: List[Callable[[str, dict], None]] = []
+        self._ready = False
+        self._init_lock = threading.Lock()
+
+    def add_listener(self, callback: Callable[[str, dict], None]):
+        """Call `callback(event, payload)` after a committed 'message' or 'read'."""
+        self._listeners.append(callback)
+
+    def _notify(self, event: str, payload: dict):
+        for callback in self._listeners:
+            try:
+                callback(event, payload)
+            except Exception:
+                logger.exception(f"Message store listener failed on {event}")
+
+    # ── Connections ──────────────────────────────
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, 'conn', None)
+        # Connections must not cross fork(); the prefork server starts workers that way
+        if conn is None or self._local.pid != os.getpid():
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            self._local.conn, self._local.pid = conn, os.getpid()
+        if not self._ready:
+            with self._init_lock:
+                if not self._ready:
+                    conn.execute('PRAGMA journal_mode=WAL')
+                    for statement in SCHEMA:
+                        conn.execute(statement)
+                    self._ready = True
+        return conn
+
+    def _transaction(self, fn):
+        conn = self._connect()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            result = fn(conn)
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+        return result
+
+    # ── Writing ──────────────────────────────────
+
+    def send(self, sender: int, recipient: int, text: str) -> dict:
+        """Append a message; bumps the recipient's unread counters."""
+        key = conversation_key(sender, recipient)
+        timestamp = datetime.utcnow().isoformat()
+
+        def write(conn):
+            message_id = conn.execute(
+                'INSERT INTO messages (conversation, sender, recipient, text, timestamp)'
+                ' VALUES (?, ?, ?, ?, ?)', (key, sender, recipient, text, timestamp),
+            ).lastrowid
+            conn.execute(
+                'INSERT INTO participants (user_id, conversation, peer_id, last_message_id)'
+                ' VALUES (?, ?, ?, ?) ON CONFLICT (user_id, conversation) DO UPDATE SET'
+                ' last_message_id = excluded.last_message_id', (sender, key, recipient, message_id),
+            )
+            conn.execute(
+                'INSERT INTO participants (user_id, conversation, peer_id, last_message_id, unread)'
+                ' VALUES (?, ?, ?, ?, 1) ON CONFLICT (user_id, conversation) DO UPDATE SET'
+                ' last_message_id = excluded.last_message_id, unread = unread + 1',
+                (recipient, key, sender, message_id),
+            )
+            conn.execute(
+                'INSERT INTO unread_totals (user_id, unread) VALUES (?, 1)'
+                ' ON CONFLICT (user_id) DO UPDATE SET unread = unread + 1', (recipient,),
+            )
+            peer_last_read = conn.execute(
+                'SELECT last_read_id FROM participants WHERE user_id = ? AND conversation = ?',
+                (recipient, key),
+            ).fetchone()[0]
+            return message_id, peer_last_read
+
+        message_id, peer_last_read = self._transaction(write)
+        message = _message((message_id, sender, recipient, text, timestamp), peer_last_read)
+        self._notify('message', message)
+        return message
+
+    def mark_read(self, user_id: int, message_id: int) -> Optional[dict]:
+        """Read receipt: `user_id` has read their conversation up to `message_id`.
+
+        Returns None when the message does not exist or was not sent to them.
+        """
+        read_at = datetime.utcnow().isoformat()
+
+        def write(conn):
+            row = conn.execute(
+                'SELECT conversation, sender FROM messages WHERE id = ? AND recipient = ?',
+                (message_id, user_id),
+            ).fetchone()
+            if row is None:
+                return None
+            key, sender = row
+            last_read_id, unread = conn.execute(
+                'SELECT last_read_id, unread FROM participants WHERE user_id = ? AND conversation = ?',
+                (user_id, key),
+            ).fetchone()
+            newly_read = 0
+            if message_id > last_read_id:
+                # Only the unread tail is scanned, never the whole history
+                newly_read = min(unread, conn.execute(
+                    'SELECT COUNT(*) FROM messages WHERE conversation = ? AND id > ? AND id <= ?'
+                    ' AND recipient = ?', (key, last_read_id, message_id, user_id),
+                ).fetchone()[0])
+                conn.execute(
+                    'UPDATE participants SET last_read_id = ?, unread = unread - ?, read_at = ?'
+                    ' WHERE user_id = ? AND conversation = ?',
+                    (message_id, newly_read, read_at, user_id, key),
+                )
+                conn.execute(
+                    'UPDATE unread_totals SET unread = MAX(0, unread - ?) WHERE user_id = ?',
+                    (newly_read, user_id),
+                )
+                last_read_id = message_id
+            return {
+                'id': message_id, 'conversation': key, 'reader': user_id, 'sender': sender,
+                'read': True, 'last_read_id': last_read_id, 'read_at': read_at,
+                'unread': unread - newly_read, 'newly_read': newly_read,
+            }
+
+        receipt = self._transaction(write)
+        if receipt is not None and receipt['newly_read']:
+            self._notify('read', receipt)
+        return receipt
+
+    # ── Reading ──────────────────────────────────
+
+    def history(self, user_id: int, peer_id: int, before: Optional[int] = None,
+                limit: int = MESSAGE_PAGE_SIZE) -> dict:
+        """One page of a conversation, oldest first, and the cursor for the page before it."""
+        key = conversation_key(user_id, peer_id)
+        limit = max(1, min(limit, MESSAGE_MAX_PAGE_SIZE))
+        conn = self._connect()
+        rows = conn.execute(
+            'SELECT id, sender, recipient, text, timestamp FROM messages'
+            ' WHERE conversation = ? AND id < ? ORDER BY id DESC LIMIT ?',
+            (key, before if before is not None else 2 ** 62, limit + 1),
+        ).fetchall()
+        receipts = dict(conn.execute(
+            'SELECT user_id, last_read_id FROM participants WHERE conversation = ?', (key,),
+        ).fetchall())
+        page = rows[:limit]
+        return {
+            'results': [_message(row, receipts.get(row[2], 0)) for row in reversed(page)],
+            'next': page[-1][0] if len(rows) > limit else None,
+            'peer_last_read_id': receipts.get(peer_id, 0),
+        }
+
+    def conversations(self, user_id: int, before: Optional[int] = None,
+                      limit: int = MESSAGE_PAGE_SIZE) -> dict:
+        """The user's conversations, most recent first, with unread counts."""
+        limit = max(1, min(limit, MESSAGE_MAX_PAGE_SIZE))
+        rows = self._connect().execute(
+            'SELECT p.peer_id, p.unread, p.last_read_id, p.read_at, p.last_message_id,'
+            ' m.sender, m.recipient, m.text, m.timestamp'
+            ' FROM participants p JOIN messages m ON m.id = p.last_message_id'
+            ' WHERE p.user_id = ? AND p.last_message_id < ?'
+            ' ORDER BY p.last_message_id DESC LIMIT ?',
+            (user_id, before if before is not None else 2 ** 62, limit + 1),
+        ).fetchall()
+        page = rows[:limit]
+        return {
+            'results': [{
+                'peer': peer, 'unread': unread, 'last_read_id': last_read_id, 'read_at': read_at,
+                'last_message': {'id': message_id, 'sender': sender, 'recipient': recipient,
+                                 'text': text, 'timestamp': timestamp},
+            } for peer, unread, last_read_id, read_at, message_id, sender, recipient, text, timestamp in page],
+            'next': page[-1][4] if len(rows) > limit else None,
+        }
+
+    def latest_id(self) -> int:
+        return self._connect().execute('SELECT COALESCE(MAX(id), 0) FROM messages').fetchone()[0]
+
+    def since(self, message_id: int, limit: int = 500) -> List[dict]:
+        """Messages with ids after `message_id`, oldest first (for tailing the store)."""
+        rows = self._connect().execute(
+            'SELECT id, sender, recipient, text, timestamp FROM messages WHERE id > ? ORDER BY id LIMIT ?',
+            (message_id, limit),
+        ).fetchall()
+        return [_message(row, 0) for row in rows]
+
+    def unread_count(self, user_id: int) -> int:
+        row = self._connect().execute(
+            'SELECT unread FROM unread_totals WHERE user_id = ?', (user_id,),
+        ).fetchone()
+        return row[0] if row else 0
+
+
+message_store = MessageStore()
@@ -0,0 +1,156 @@
+"""
+Lightweight storage metrics — counters and latency histograms per collection.
+
+Cheap enough to leave on in production: each observation is a bisect into a
+fixed bucket list plus a few integer adds under an uncontended lock.
+Rendered in the Prometheus text exposition format by render_prometheus().
+Counters are per process, so each prefork worker reports only its own traffic.
+"""
+
+import threading
+from bisect import bisect_left
+from typing import Dict, Tuple
+
+# Seconds; covers sub-millisecond reads up to multi-second full-file rewrites
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1,
+                   0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class Histogram:
+    """Fixed-bucket histogram (not thread-safe; callers hold a lock)."""
+
+    __slots__ = ('buckets', 'counts', 'sum', 'count')
+
+    def __init__(self, buckets: Tuple[float, ...] = LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+class CollectionMetrics:
+    """All metrics for one collection."""
+
+    def __init__(self, name: str):
+        self.name = name
+        self._lock = threading.Lock()
+        self.ops: Dict[str, int] = {}
+        self.op_latency: Dict[str, Histogram] = {}
+        self.lock_wait = Histogram()
+        self.lock_hold = Histogram()
+        self.parse = Histogram()
+        self.serialize = Histogram()
+        self.backup = Histogram()
+        self.bytes_read = 0
+        self.bytes_written = 0
+        self.file_size = 0
+
+    def observe_op(self, op: str, wait: float, hold: float):
+        with self._lock:
+            self.ops[op] = self.ops.get(op, 0) + 1
+            hist = self.op_latency.get(op)
+            if hist is None:
+                hist = self.op_latency[op] = Histogram()
+            hist.observe(wait + hold)
+            self.lock_wait.observe(wait)
+            self.lock_hold.observe(hold)
+
+    def observe_read(self, size: int, parse_seconds: float):
+        with self._lock:
+            self.bytes_read += size
+            self.file_size = size
+            self.parse.observe(parse_seconds)
+
+    def observe_write(self, size: int, serialize_seconds: float):
+        with self._lock:
+            self.bytes_written += size
+            self.file_size = size
+            self.serialize.observe(serialize_seconds)
+
+    def observe_backup(self, seconds: float):
+        with self._lock:
+            self.backup.observe(seconds)
+
+
+_registry: Dict[str, CollectionMetrics] = {}
+_registry_lock = threading.Lock()
+
+
+def collection_metrics(name: str) -> CollectionMetrics:
+    """Get or create the metrics for a collection name."""
+    metrics = _registry.get(name)
+    if metrics is None:
+        with _registry_lock:
+            metrics = _registry.setdefault(name, CollectionMetrics(name))
+    return metrics
+
+
+# ── Prometheus Exposition ────────────────────────
+
+def _labels(**labels) -> str:
+    return ','.join(f'{k}="{v}"' for k, v in labels.items())
+
+
+def _render_histogram(lines, name: str, hist: Histogram, labels: str):
+    cumulative = 0
+    for bound, n in zip(hist.buckets, hist.counts):
+        cumulative += n
+        lines.append(f'{name}_bucket{{{labels},le="{bound}"}} {cumulative}')
+    lines.append(f'{name}_bucket{{{labels},le="+Inf"}} {hist.count}')
+    lines.append(f'{name}_sum{{{labels}}} {hist.sum:.6f}')
+    lines.append(f'{name}_count{{{labels}}} {hist.count}')
+
+
+HISTOGRAMS = (
+    ('json_db_lock_wait_seconds', 'lock_wait', 'Time spent waiting to acquire the collection lock.'),
+    ('json_db_lock_hold_seconds', 'lock_hold', 'Time the collection lock was held per operation.'),
+    ('json_db_parse_seconds', 'parse', 'Time spent parsing the collection file.'),
+    ('json_db_serialize_seconds', 'serialize', 'Time spent serializing the collection file.'),
+    ('json_db_backup_seconds', 'backup', 'Time spent writing backups.'),
+)
+COUNTERS = (
+    ('json_db_read_bytes_total', 'counter', 'bytes_read', 'Bytes read from collection files.'),
+    ('json_db_written_bytes_total', 'counter', 'bytes_written', 'Bytes written to collection files.'),
+    ('json_db_file_size_bytes', 'gauge', 'file_size', 'Size of the collection file at last access.'),
+)
+
+
+def render_prometheus() -> str:
+    """Render every collection's metrics in Prometheus text format."""
+    with _registry_lock:
+        collections = sorted(_registry.values(), key=lambda m: m.name)
+    lines = []
+
+    lines.append('# HELP json_db_operations_total Collection operations performed.')
+    lines.append('# TYPE json_db_operations_total counter')
+    for m in collections:
+        with m._lock:
+            for op, n in sorted(m.ops.items()):
+                lines.append(f'json_db_operations_total{{{_labels(collection=m.name, op=op)}}} {n}')
+
+    lines.append('# HELP json_db_operation_seconds Operation latency including lock wait.')
+    lines.append('# TYPE json_db_operation_seconds histogram')
+    for m in collections:
+        with m._lock:
+            for op, hist in sorted(m.op_latency.items()):
+                _render_histogram(lines, 'json_db_operation_seconds', hist, _labels(collection=m.name, op=op))
+
+    for metric, attr, help_text in HISTOGRAMS:
+        lines.append(f'# HELP {metric} {help_text}')
+        lines.append(f'# TYPE {metric} histogram')
+        for m in collections:
+            with m._lock:
+                _render_histogram(lines, metric, getattr(m, attr), _labels(collection=m.name))
+
+    for metric, kind, attr, help_text in COUNTERS:
+        lines.append(f'# HELP {metric} {help_text}')
+        lines.append(f'# TYPE {metric} {kind}')
+        for m in collections:
+            lines.append(f'{metric}{{{_labels(collection=m.name)}}} {getattr(m, attr)}')
+
+    return '\n'.join(lines) + '\n'
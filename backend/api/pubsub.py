@@ -0,0 +1,125 @@
+"""
+In-process pub/sub — fan-out of per-user events to open connections.
+
+Each connection holds a Subscription with a bounded queue. Publishing never
+blocks: when a slow client's queue is full the event is dropped and the
+subscription is flagged, so the stream can tell the client to refetch
+instead of growing without bound. Idle subscriptions cost one queue and
+one dict entry.
+"""
+
+import queue
+import threading
+from collections import defaultdict
+from typing import Dict, Optional, Set
+
+_CLOSED = object()
+
+
+class BrokerFull(Exception):
+    """The broker already holds max_total subscriptions."""
+
+
+class Subscription:
+    """One connection's view of the events addressed to a user."""
+
+    def __init__(self, user_id, maxsize: int):
+        self.user_id = user_id
+        self._queue = queue.Queue(maxsize)
+        self.dropped = 0
+        self.closed = False
+
+    def put(self, item) -> bool:
+        try:
+            self._queue.put_nowait(item)
+            return True
+        except queue.Full:
+            self.dropped += 1
+            return False
+
+    def get(self, timeout: float):
+        """Next (event, data), None on timeout, or raises EOFError once closed."""
+        try:
+            item = self._queue.get(timeout=timeout)
+        except queue.Empty:
+            if self.closed:
+                raise EOFError
+            return None
+        if item is _CLOSED:
+            raise EOFError
+        return item
+
+    def take_dropped(self) -> int:
+        """Events lost since the last call."""
+        dropped, self.dropped = self.dropped, 0
+        return dropped
+
+    def close(self):
+        self.closed = True
+        try:
+            self._queue.put_nowait(_CLOSED)
+        except queue.Full:
+            # Make room: the reader only needs to see that it is closed
+            try:
+                self._queue.get_nowait()
+                self._queue.put_nowait(_CLOSED)
+            except (queue.Empty, queue.Full):
+                pass  # readers also check `closed`
+
+
+class Broker:
+    """Routes events to every subscription of the addressed users."""
+
+    def __init__(self, queue_size: int = 100, max_per_user: int = 10, max_total: int = 0):
+        self.queue_size = queue_size
+        self.max_per_user = max_per_user
+        self.max_total = max_total  # 0 = no limit
+        self._count = 0
+        self._lock = threading.Lock()
+        self._subscriptions: Dict[object, Set[Subscription]] = defaultdict(set)
+
+    def subscribe(self, user_id) -> Optional[Subscription]:
+        """A new subscription, or None when the user already has max_per_user.
+
+        Raises BrokerFull when max_total subscriptions are open altogether.
+        """
+        with self._lock:
+            if self.max_total and self._count >= self.max_total:
+                raise BrokerFull
+            existing = self._subscriptions[user_id]
+            if len(existing) >= self.max_per_user:
+                return None
+            subscription = Subscription(user_id, self.queue_size)
+            existing.add(subscription)
+            self._count += 1
+            return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        with self._lock:
+            existing = self._subscriptions.get(subscription.user_id)
+            if existing is not None and subscription in existing:
+                existing.remove(subscription)
+                self._count -= 1
+                if not existing:
+                    del self._subscriptions[subscription.user_id]
+
+    def publish(self, user_id, event: str, data) -> int:
+        """Queue (event, data) for every subscription of `user_id`; returns how many got it."""
+        with self._lock:
+            targets = list(self._subscriptions.get(user_id, ()))
+        return sum(1 for subscription in targets if subscription.put((event, data)))
+
+    def users(self) -> Set:
+        with self._lock:
+            return set(self._subscriptions)
+
+    def close_all(self):
+        """Close every subscription (e.g. when the worker is shutting down)."""
+        with self._lock:
+            targets = [s for subs in self._subscriptions.values() for s in subs]
+        for subscription in targets:
+            subscription.close()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._count
@@ -0,0 +1,135 @@
+"""
+Request timing spans — where a request's time went, per named span.
+
+Code that does attributable work (storage operations, user lookups, Gemini
+calls, SMTP sends) wraps it in span('name') or reports a duration it has
+already measured with record('name', seconds). Spans accumulate into the
+RequestTiming of the current context; outside a request they cost one
+ContextVar lookup and record nothing. Spans may nest or overlap, so their
+durations are not meant to add up to the request total.
+
+Finished requests are folded into per-route aggregates (RouteTimings) for
+a debug endpoint.
+"""
+
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Optional
+
+_current: ContextVar[Optional['RequestTiming']] = ContextVar('request_timing', default=None)
+
+
+class RequestTiming:
+    """Span totals for one request. Thread-safe: batch sub-requests share one."""
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.spans: Dict[str, list] = {}  # name -> [seconds, calls]
+        self._lock = threading.Lock()
+
+    def add(self, name: str, seconds: float):
+        with self._lock:
+            entry = self.spans.get(name)
+            if entry is None:
+                self.spans[name] = [seconds, 1]
+            else:
+                entry[0] += seconds
+                entry[1] += 1
+
+    def elapsed(self) -> float:
+        return time.perf_counter() - self.start
+
+    def snapshot(self) -> Dict[str, tuple]:
+        with self._lock:
+            return {name: (seconds, calls) for name, (seconds, calls) in self.spans.items()}
+
+
+def begin():
+    """Start timing the current context; returns the token for end()."""
+    return _current.set(RequestTiming())
+
+
+def end(token):
+    _current.reset(token)
+
+
+def current() -> Optional[RequestTiming]:
+    return _current.get()
+
+
+def record(name: str, seconds: float):
+    """Add an already-measured duration to the current request, if any."""
+    timing = _current.get()
+    if timing is not None:
+        timing.add(name, seconds)
+
+
+@contextmanager
+def span(name: str):
+    """Time the enclosed block as `name` in the current request."""
+    timing = _current.get()
+    if timing is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        timing.add(name, time.perf_counter() - start)
+
+
+# ── Per-route aggregates ─────────────────────────
+
+class RouteTimings:
+    """Totals per route and span across all finished requests."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._routes: Dict[str, dict] = {}
+
+    def observe(self, route: str, total: float, spans: Dict[str, tuple]):
+        with self._lock:
+            stats = self._routes.get(route)
+            if stats is None:
+                stats = self._routes[route] = {'count': 0, 'total': 0.0, 'max': 0.0, 'spans': {}}
+            stats['count'] += 1
+            stats['total'] += total
+            stats['max'] = max(stats['max'], total)
+            for name, (seconds, calls) in spans.items():
+                entry = stats['spans'].setdefault(name, [0.0, 0])
+                entry[0] += seconds
+                entry[1] += calls
+
+    def summary(self) -> list:
+        """Routes by total time, with average milliseconds per request for each span."""
+        with self._lock:
+            routes = [(route, dict(stats, spans=dict(stats['spans']))) for route, stats in self._routes.items()]
+        result = []
+        for route, stats in sorted(routes, key=lambda r: r[1]['total'], reverse=True):
+            count = stats['count']
+            result.append({
+                'route': route,
+                'count': count,
+                'avg_ms': round(stats['total'] / count * 1000, 3),
+                'max_ms': round(stats['max'] * 1000, 3),
+                'total_ms': round(stats['total'] * 1000, 3),
+                'spans': {
+                    name: {
+                        'avg_ms': round(seconds / count * 1000, 3),
+                        'calls_per_request': round(calls / count, 2),
+                        'share': round(seconds / stats['total'], 3) if stats['total'] else 0,
+                    }
+                    for name, (seconds, calls) in sorted(
+                        stats['spans'].items(), key=lambda s: s[1][0], reverse=True)
+                },
+            })
+        return result
+
+    def reset(self):
+        with self._lock:
+            self._routes.clear()
+
+
+route_timings = RouteTimings()
@@ -4,7 +4,7 @@ Flask Application — Main entry point for the Healthcare backend.
 
 import os
 import sys
-import json
+import hmac
 import logging
 from datetime import datetime
 from dotenv import load_dotenv
@@ -12,7 +12,7 @@ from dotenv import load_dotenv
 # Load .env before anything else
 load_dotenv()
 
-from flask import Flask, jsonify, request, g
+from flask import Flask, Response, jsonify, request, g, has_app_context
 from flask_cors import CORS
 from werkzeug.exceptions import HTTPException
 
@@ -21,25 +21,32 @@ backend_dir = os.path.dirname(os.path.abspath(__file__))
 sys.path.insert(0, backend_dir)
 
 # Import from api package
-from api.json_db import users_db, user_profiles_db
+from api.json_db import users_db, user_profiles_db, verify_collections
+from api.metrics import render_prometheus
+from api.identity_map import IdentityMap, set_identity_map_provider
 
-from auth import auth_bp
+from auth import auth_bp, admin_required
 from views import views_bp
-
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-)
+from batch import batch_bp
+from profiler import profiler_bp
+from dashboard_service import start_dashboard_refresher
+from compression import init_compression
+from json_provider import init_json
+from access_log import configure_logging, init_access_log
+from server_timing import init_server_timing
+from api.timing import route_timings
+
+# Log records are written by a background listener, off the request threads
+configure_logging()
 logger = logging.getLogger(__name__)
 
+# Static bearer token for Prometheus scrapers; without it /api/metrics is admin-only
+METRICS_TOKEN = os.getenv('METRICS_TOKEN', '')
+
 
-class DateTimeEncoder(json.JSONEncoder):
-    """Custom JSON encoder for datetime objects."""
-    def default(self, obj):
-        if isinstance(obj, datetime):
-            return obj.isoformat()
-        return super().default(obj)
+def _request_identity_map():
+    """Identity map of the current request, if any."""
+    return g.get('identity_map') if has_app_context() else None
 
 
 def create_app():
@@ -48,7 +55,11 @@ def create_app():
     # --- Configuration -------------------------------------------------
     app.config['SECRET_KEY'] = os.getenv('SECRET_KEY', os.urandom(24).hex())
     app.config['DEBUG'] = os.getenv('DEBUG', 'True') == 'True'
-    app.json_encoder = DateTimeEncoder
+    # orjson-backed JSON for jsonify() and request.get_json() when installed
+    init_json(app)
+
+    # Span timings for the Server-Timing header; first, so it times the other hooks
+    init_server_timing(app)
 
     # --- CORS ----------------------------------------------------------
     origins_str = os.getenv('CORS_ALLOWED_ORIGINS', 'http://localhost:5173,http://localhost:3000')
@@ -59,7 +70,8 @@ def create_app():
         resources={r"/api/*": {"origins": origins}},
         supports_credentials=True,
         allow_headers=['Content-Type', 'Authorization', 'Accept', 'Access-Control-Allow-Headers'],
-        expose_headers=['Content-Type', 'Authorization'],
+        expose_headers=['Content-Type', 'Authorization', 'ETag', 'Last-Modified',
+                        'Retry-After', 'X-RateLimit-Limit', 'X-RateLimit-Remaining', 'Server-Timing'],
         methods=['GET', 'POST', 'PUT', 'PATCH', 'DELETE', 'OPTIONS'],
         max_age=600
     )
@@ -71,23 +83,33 @@ def create_app():
     _ = users_db
     _ = user_profiles_db
 
-    # --- Request/Response Logging Middleware ----------------------------
+    # Verify checksums and restore damaged collections before serving
+    report = verify_collections()
+    app.config['STORAGE_RECOVERY_REPORT'] = report
+    logger.info(f"Verified {len(report)} collections")
+
+    # Expire time-based dashboard transitions in the background
+    start_dashboard_refresher()
+
+    # --- Request-scoped identity map for storage reads ------------------
+    set_identity_map_provider(_request_identity_map)
+
     @app.before_request
-    def before_request_logging():
-        g.start_time = datetime.utcnow()
-        if request.method != 'OPTIONS':
-            logger.info(f"{request.method} {request.path} - Remote: {request.remote_addr}")
-
-    @app.after_request
-    def after_request_logging(response):
-        if request.method != 'OPTIONS':
-            elapsed = (datetime.utcnow() - g.start_time).total_seconds() * 1000
-            logger.info(f"{request.method} {request.path} - Status: {response.status_code} - Time: {elapsed:.2f}ms")
-        return response
+    def open_identity_map():
+        g.identity_map = IdentityMap()
+
+    # --- Access log (one structured line per request, sampled) ---------
+    # Registered before compression so it runs last and sees the final size
+    init_access_log(app)
 
     # --- Register Blueprints (all under /api/) -------------------------
     app.register_blueprint(auth_bp, url_prefix='/api')
     app.register_blueprint(views_bp, url_prefix='/api')
+    app.register_blueprint(batch_bp, url_prefix='/api')
+    app.register_blueprint(profiler_bp, url_prefix='/api')
+
+    # --- Response compression (gzip, brotli when installed) -------------
+    init_compression(app)
 
     # --- Error handlers ------------------------------------------------
     @app.errorhandler(400)
@@ -147,9 +169,39 @@ def create_app():
             'status': 'ok',
             'service': 'HealthGuard API (Flask)',
             'timestamp': datetime.utcnow().isoformat(),
-            'environment': os.getenv('FLASK_ENV', 'production')
+            'environment': os.getenv('FLASK_ENV', 'production'),
+            'storage': {
+                'restored': [r['collection'] for r in app.config['STORAGE_RECOVERY_REPORT']
+                             if r['action'] == 'restored'],
+                'failed': [r['collection'] for r in app.config['STORAGE_RECOVERY_REPORT']
+                           if r['action'] == 'failed'],
+            },
         }), 200
 
+    # --- Storage metrics (Prometheus text format) ----------------------
+    # Counters live in each process: under the prefork server a scrape sees
+    # only the worker that answered it (identified by X-Worker-Pid).
+    def _render_metrics():
+        response = Response(render_prometheus(), mimetype='text/plain; version=0.0.4')
+        response.headers['X-Worker-Pid'] = str(os.getpid())
+        return response
+
+    @app.route('/api/metrics', methods=['GET'])
+    def metrics():
+        supplied = request.headers.get('Authorization', '')
+        if METRICS_TOKEN and hmac.compare_digest(supplied.encode(), f'Bearer {METRICS_TOKEN}'.encode()):
+            return _render_metrics()
+        return admin_required(_render_metrics)()
+
+    # --- Per-route span breakdown (platform admins) --------------------
+    @app.route('/api/debug/timing/', methods=['GET', 'DELETE'])
+    @admin_required
+    def debug_timing():
+        if request.method == 'DELETE':
+            route_timings.reset()
+            return jsonify({'reset': True})
+        return jsonify({'pid': os.getpid(), 'routes': route_timings.summary()})
+
     # --- Root endpoint for frontend debugging ---
     @app.route('/api/', methods=['GET'])
     def api_root():
@@ -161,15 +213,21 @@ def create_app():
                 'profiles': '/api/profiles/me/',
                 'medical_records': '/api/medical-records/',
                 'prescriptions': '/api/prescriptions/',
-                'appointments': '/api/appointments/',
+                'appointments': '/api/appointments/, /api/appointments/schedule/, /api/appointments/slots/',
                 'health_metrics': '/api/health-metrics/',
                 'diet_plans': '/api/diet-plans/',
                 'medicine_reminders': '/api/medicine-reminders/',
                 'ai_consultations': '/api/ai-consultations/',
                 'emergency_contacts': '/api/emergency-contacts/',
-                'doctor_reviews': '/api/doctor-reviews/',
+                'doctor_reviews': '/api/doctor-reviews/, /api/doctor-reviews/leaderboard/, /api/doctor-reviews/summary/<doctor_id>/',
                 'health_education': '/api/health-education/',
-                'dashboard_stats': '/api/dashboard/stats/'
+                'dashboard_stats': '/api/dashboard/stats/',
+                'batch': '/api/batch/',
+                'sync': '/api/sync/',
+                'events': '/api/events/',
+                'metrics': '/api/metrics',
+                'debug_timing': '/api/debug/timing/',
+                'debug_profile': '/api/debug/profile/, /api/debug/profile/requests/'
             }
         }), 200
 
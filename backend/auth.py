@@ -8,14 +8,20 @@ import datetime
 import functools
 import logging
 import secrets
+import time
 from flask import Blueprint, request, jsonify, g
 
 # Use the api/json_db module
 import sys
 import os
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-from api.json_db import users_db, user_profiles_db, clinics_db, JsonCollection, hash_password, verify_password
+from api.json_db import users_db, user_profiles_db, clinics_db, JsonCollection
+from api.cache import LRUCache
 from subscription_service import create_subscription
+from rate_limit import rate_limit
+from password_service import (
+    HashingBusyError, hash_password, needs_rehash, password_hasher, verify_password,
+)
 
 logger = logging.getLogger(__name__)
 
@@ -25,9 +31,24 @@ auth_bp = Blueprint('auth', __name__)
 JWT_SECRET = os.getenv('JWT_SECRET_KEY', secrets.token_hex(32))
 JWT_ALGORITHM = 'HS256'
 JWT_EXPIRATION_HOURS = int(os.getenv('JWT_EXPIRATION_HOURS', '24'))
-
-# Rate limiting storage (simple in-memory for demo)
-login_attempts = {}
+# HttpOnly cookie, scoped to /api/events/, carrying the JWT for EventSource
+STREAM_COOKIE = 'events_token'
+
+# Login attempts allowed per username within the sliding window
+LOGIN_RATE_LIMIT = int(os.getenv('LOGIN_RATE_LIMIT', '5'))
+LOGIN_RATE_WINDOW = int(os.getenv('LOGIN_RATE_WINDOW', '300'))
+
+# Resolved principals (user + profile) keyed by token. Entries are dropped when
+# the user's users/user_profiles records change. Lookups stat both files, so a
+# write by another server worker is seen at once, but only as a 'reload' that
+# drops every cached principal: under the prefork server each registration or
+# profile edit in one worker costs the others a token decode and two reads per
+# signed-in user on their next requests.
+AUTH_CACHE_SIZE = int(os.getenv('AUTH_CACHE_SIZE', '4096'))
+AUTH_CACHE_TTL = float(os.getenv('AUTH_CACHE_TTL', '60'))
+_principal_cache = LRUCache(max_entries=AUTH_CACHE_SIZE, ttl=AUTH_CACHE_TTL)
+_principal_generations = {}
+_all_generation = [0]
 
 
 # ── Helpers ──────────────────────────────────────
@@ -71,40 +92,109 @@ def decode_token(token: str) -> dict:
         return None
 
 
-def check_rate_limit(identifier: str, max_attempts: int = 5, window_seconds: int = 300) -> tuple:
-    """Simple rate limiting check. Returns (allowed, remaining_attempts, reset_time)"""
-    now = datetime.datetime.utcnow()
-    
-    if identifier not in login_attempts:
-        login_attempts[identifier] = []
-    
-    # Remove old attempts
-    login_attempts[identifier] = [
-        t for t in login_attempts[identifier] 
-        if (now - t).total_seconds() < window_seconds
-    ]
-    
-    attempts = len(login_attempts[identifier])
-    remaining = max_attempts - attempts
-    
-    if attempts >= max_attempts:
-        reset_time = window_seconds - int((now - login_attempts[identifier][0]).total_seconds())
-        return False, 0, reset_time
-    
-    return True, remaining, window_seconds
+def _hashing_busy():
+    """503 for requests turned away by the password hashing pool."""
+    response = jsonify({
+        'error': 'Service busy',
+        'detail': 'Too many sign-ins in progress. Please try again shortly.'
+    })
+    response.headers['Retry-After'] = '1'
+    return response, 503
+
+
+def _login_identifier() -> str:
+    """Rate-limit key for login attempts: the submitted username or email."""
+    data = request.get_json(silent=True) or {}
+    return str(data.get('username', '')).strip().lower()
+
+
+# ── Principal Cache ──────────────────────────────
+
+def _generation(user_id) -> tuple:
+    return _all_generation[0], _principal_generations.get(user_id, 0)
+
+
+def invalidate_principal(user_id=None):
+    """Drop cached principals for one user, or for everyone when user_id is None."""
+    if user_id is None:
+        _all_generation[0] += 1
+        _principal_cache.clear()
+    else:
+        _principal_generations[user_id] = _principal_generations.get(user_id, 0) + 1
+
+
+def _on_user_change(event, record, previous):
+    if event == 'reload':
+        invalidate_principal()
+        return
+    invalidate_principal((record or previous).get('id'))
+
+
+def _on_profile_change(event, record, previous):
+    if event == 'reload':
+        invalidate_principal()
+        return
+    for rec in (record, previous):
+        if rec:
+            invalidate_principal(rec.get('user_id'))
+
+
+users_db.add_listener(_on_user_change)
+user_profiles_db.add_listener(_on_profile_change)
+
+
+def _resolve_principal(token: str) -> tuple:
+    """Return (user dict with profile, None) for a token, or (None, error detail).
+
+    A cached principal skips JWT decoding and both collection reads; it is
+    only used while the token is unexpired and the user's records unchanged.
+    """
+    # A stat of each file surfaces writes by other workers as a 'reload'
+    users_db.version_of()
+    user_profiles_db.version_of()
+    cached = _principal_cache.get(token)
+    if cached is not None:
+        user_id, expires_at, generation, user_data = cached
+        if expires_at > time.time() and generation == _generation(user_id):
+            return _copy_principal(user_data), None
+        _principal_cache.pop(token)
+
+    payload = decode_token(token)
+    if payload is None:
+        return None, 'Invalid or expired token'
+
+    user_id = payload['user_id']
+    generation = _generation(user_id)
+    user_data = users_db.get(user_id)
+    if not user_data:
+        return None, 'User not found'
+
+    # Attach profile
+    profiles = user_profiles_db.filter(user_id=user_data['id'])
+    if profiles:
+        user_data['profile'] = profiles[0]
 
+    _principal_cache.set(token, (user_id, payload.get('exp', 0), generation, user_data))
+    return _copy_principal(user_data), None
 
-def record_attempt(identifier: str):
-    """Record a login attempt"""
-    if identifier not in login_attempts:
-        login_attempts[identifier] = []
-    login_attempts[identifier].append(datetime.datetime.utcnow())
+
+def _copy_principal(user_data: dict) -> dict:
+    data = dict(user_data)
+    if 'profile' in data:
+        data['profile'] = dict(data['profile'])
+    return data
 
 
 def login_required(f):
     """Decorator that validates JWT and sets g.user."""
     @functools.wraps(f)
     def wrapper(*args, **kwargs):
+        # Sub-requests of an authenticated /api/batch/ call reuse its principal
+        principal = g.get('batch_principal')
+        if principal is not None:
+            g.user = principal
+            return f(*args, **kwargs)
+
         auth_header = request.headers.get('Authorization', '')
         if not auth_header.startswith('Bearer '):
             logger.warning(f"Missing or invalid authorization header from {request.remote_addr}")
@@ -114,32 +204,58 @@ def login_required(f):
             }), 401
 
         token = auth_header[7:]
-        payload = decode_token(token)
-        if payload is None:
-            logger.warning(f"Invalid or expired token from {request.remote_addr}")
+        user_data, error = _resolve_principal(token)
+        if user_data is None:
+            logger.warning(f"{error} for token from {request.remote_addr}")
             return jsonify({
                 'error': 'Unauthorized',
-                'detail': 'Invalid or expired token'
+                'detail': error
             }), 401
 
-        user_data = users_db.get(payload['user_id'])
-        if not user_data:
-            logger.warning(f"User not found for token from {request.remote_addr}")
+        g.user = SimpleUser(user_data)
+        return f(*args, **kwargs)
+    return wrapper
+
+
+def stream_login_required(f):
+    """login_required that also accepts the STREAM_COOKIE, since EventSource cannot set headers.
+
+    The token never goes in the URL, where server and proxy access logs would keep it.
+    """
+    with_header = login_required(f)
+
+    @functools.wraps(f)
+    def wrapper(*args, **kwargs):
+        token = request.cookies.get(STREAM_COOKIE)
+        if not token or request.headers.get('Authorization'):
+            return with_header(*args, **kwargs)
+        user_data, error = _resolve_principal(token)
+        if user_data is None:
+            logger.warning(f"{error} for stream token from {request.remote_addr}")
             return jsonify({
                 'error': 'Unauthorized',
-                'detail': 'User not found'
+                'detail': error
             }), 401
-
-        # Attach profile
-        profiles = user_profiles_db.filter(user_id=user_data['id'])
-        if profiles:
-            user_data['profile'] = profiles[0]
-
         g.user = SimpleUser(user_data)
         return f(*args, **kwargs)
     return wrapper
 
 
+def admin_required(f):
+    """login_required, restricted to platform admins (user_profiles.user_type)."""
+    @functools.wraps(f)
+    def wrapper(*args, **kwargs):
+        profile = g.user._raw.get('profile') or {}
+        if profile.get('user_type') != 'platform_admin':
+            logger.warning(f"Non-admin user {g.user.id} denied access to {request.path}")
+            return jsonify({
+                'error': 'Forbidden',
+                'detail': 'Platform admin access required'
+            }), 403
+        return f(*args, **kwargs)
+    return login_required(wrapper)
+
+
 # ── Routes ───────────────────────────────────────
 
 @auth_bp.route('/auth/register/', methods=['POST'])
@@ -235,6 +351,8 @@ def register():
             }
         }), 201
     
+    except HashingBusyError:
+        return _hashing_busy()
     except Exception as e:
         logger.error(f"Registration error: {str(e)}")
         return jsonify({
@@ -278,7 +396,10 @@ def register_clinic():
         
         if users_db.exists(email=clinic_email):
             return jsonify({'clinic_email': 'An account with this email already exists.'}), 400
-        
+
+        # Hash first so a busy hashing pool cannot leave a clinic without an admin
+        admin_password_hash = hash_password(admin_password)
+
         # Create clinic record
         clinic = clinics_db.create({
             'name': clinic_name,
@@ -295,7 +416,7 @@ def register_clinic():
         admin_user = users_db.create({
             'username': clinic_name.lower().replace(' ', '_') + '_admin',
             'email': clinic_email,
-            'password': hash_password(admin_password),
+            'password': admin_password_hash,
             'first_name': 'Clinic',
             'last_name': 'Admin',
             'is_active': True,
@@ -324,6 +445,8 @@ def register_clinic():
             'subscription': subscription,
         }), 201
     
+    except HashingBusyError:
+        return _hashing_busy()
     except Exception as e:
         logger.error(f"Clinic registration error: {str(e)}")
         return jsonify({
@@ -333,6 +456,8 @@ def register_clinic():
 
 
 @auth_bp.route('/auth/login/', methods=['POST'])
+@rate_limit(LOGIN_RATE_LIMIT, LOGIN_RATE_WINDOW, key=_login_identifier, scope='login',
+            error='Too many login attempts')
 def login():
     """Login user with username/email and password."""
     try:
@@ -340,14 +465,6 @@ def login():
         username = data.get('username', '').strip().lower()
         password = data.get('password', '')
 
-        # Rate limiting
-        allowed, remaining, reset_time = check_rate_limit(username)
-        if not allowed:
-            return jsonify({
-                'error': 'Too many login attempts',
-                'detail': f'Please try again in {reset_time} seconds.'
-            }), 429
-
         if not username or not password:
             return jsonify({
                 'error': 'Invalid input',
@@ -360,7 +477,6 @@ def login():
             user = users_db.first(email=username)
         
         if not user:
-            record_attempt(username)
             logger.warning(f"Login failed: user not found - {username}")
             return jsonify({
                 'error': 'Unauthorized',
@@ -372,7 +488,6 @@ def login():
         password_valid = verify_password(password, stored_password)
         
         if not password_valid:
-            record_attempt(username)
             logger.warning(f"Login failed: invalid password - {username}")
             return jsonify({
                 'error': 'Unauthorized',
@@ -387,8 +502,11 @@ def login():
                 'detail': 'Account is disabled.'
             }), 401
 
-        # Record successful login
-        record_attempt(username)
+        # Upgrade legacy SHA-256 / outdated KDF hashes in the background
+        if needs_rehash(stored_password):
+            user_id = user['id']
+            password_hasher.rehash_later(
+                password, lambda new_hash: users_db.update(user_id, {'password': new_hash}))
 
         # Get user profile for user_type
         profiles = user_profiles_db.filter(user_id=user['id'])
@@ -409,6 +527,8 @@ def login():
             }
         }), 200
     
+    except HashingBusyError:
+        return _hashing_busy()
     except Exception as e:
         logger.error(f"Login error: {str(e)}")
         return jsonify({
@@ -423,8 +543,8 @@ def me():
     """Get current authenticated user info."""
     try:
         user = g.user
-        profiles = user_profiles_db.filter(user_id=user.id)
-        profile = profiles[0] if profiles else {}
+        # Profile was resolved (and cached) by login_required
+        profile = user._raw.get('profile') or {}
 
         return jsonify({
             'id': user.id,
@@ -0,0 +1,165 @@
+"""
+Batch API — several sub-requests in one HTTP round trip.
+
+POST /api/batch/ with
+    {"requests": [{"id": "stats", "method": "GET", "path": "/api/dashboard/stats/"},
+                  {"method": "POST", "path": "/api/health-metrics/", "body": {...}}],
+     "parallel": true}
+returns an array of {"id", "status", "headers", "body"} in request order.
+
+The batch is authenticated once; sub-requests run in-process against the same
+view functions, reusing the caller's principal and the request's identity map.
+Request hooks (logging, compression, CORS) apply to the outer request only.
+With "parallel", each run of consecutive GETs is dispatched concurrently;
+writes stay sequential and act as barriers, so results match serial order.
+A parallel read not finished within BATCH_TIMEOUT seconds is reported as a
+504 item (its thread still runs to completion in the background).
+Streaming endpoints such as /api/events/ cannot be batched: they are
+refused up front, and any streamed response is closed and reported as 400.
+"""
+
+import contextvars
+import logging
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError
+
+from flask import Blueprint, current_app, g, jsonify, request
+
+from auth import login_required
+
+logger = logging.getLogger(__name__)
+
+batch_bp = Blueprint('batch', __name__)
+
+BATCH_MAX_REQUESTS = int(os.getenv('BATCH_MAX_REQUESTS', '20'))
+BATCH_WORKERS = int(os.getenv('BATCH_WORKERS', '4'))
+BATCH_TIMEOUT = float(os.getenv('BATCH_TIMEOUT', '30'))
+ALLOWED_METHODS = {'GET', 'POST', 'PUT', 'PATCH', 'DELETE'}
+# Sub-request headers passed through; everything else comes from the batch itself
+FORWARDED_HEADERS = ('If-None-Match', 'Accept-Language')
+# Response headers worth returning to the client
+EXPOSED_HEADERS = ('ETag', 'Last-Modified', 'Location')
+# Endpoints whose responses never end; a sub-request to them would hang the batch
+STREAMING_PREFIXES = ('/api/events',)
+
+_executor = ThreadPoolExecutor(max_workers=BATCH_WORKERS, thread_name_prefix='batch')
+
+
+def _validate(items):
+    """Return an error message for a malformed batch, or None."""
+    if not isinstance(items, list) or not items:
+        return 'requests must be a non-empty list'
+    if len(items) > BATCH_MAX_REQUESTS:
+        return f'At most {BATCH_MAX_REQUESTS} requests per batch'
+    for i, item in enumerate(items):
+        if not isinstance(item, dict):
+            return f'requests[{i}] must be an object'
+        method = str(item.get('method', 'GET')).upper()
+        path = item.get('path')
+        if method not in ALLOWED_METHODS:
+            return f'requests[{i}]: unsupported method {method}'
+        if not isinstance(path, str) or not path.startswith('/api/'):
+            return f'requests[{i}]: path must start with /api/'
+        if path.split('?', 1)[0].rstrip('/') == '/api/batch':
+            return f'requests[{i}]: batches cannot be nested'
+        if path.startswith(STREAMING_PREFIXES):
+            return f'requests[{i}]: event streams cannot be batched'
+    return None
+
+
+def _error(item, status: int, error: str, detail: str) -> dict:
+    return {'id': item.get('id'), 'status': status, 'headers': {},
+            'body': {'error': error, 'detail': detail}}
+
+
+def _dispatch(app, item, environ_base, authorization):
+    """Run one sub-request through the app's routing and error handlers."""
+    method = str(item.get('method', 'GET')).upper()
+    headers = {k: v for k, v in (item.get('headers') or {}).items() if k in FORWARDED_HEADERS}
+    if authorization:
+        headers['Authorization'] = authorization
+    kwargs = {'json': item['body']} if item.get('body') is not None else {}
+
+    with app.test_request_context(item['path'], method=method, headers=headers,
+                                  environ_base=environ_base, **kwargs):
+        try:
+            rv = app.dispatch_request()
+        except Exception as e:
+            rv = app.handle_user_exception(e)
+        response = app.make_response(rv)
+
+    if response.is_streamed or response.mimetype == 'text/event-stream':
+        # Reading the body could block forever; closing runs the generator's cleanup
+        response.close()
+        return _error(item, 400, 'Bad Request', 'Streaming responses cannot be batched')
+    if response.status_code in (204, 304) or not response.get_data():
+        body = None
+    elif response.is_json:
+        body = response.get_json()
+    else:
+        body = response.get_data(as_text=True)
+    return {
+        'id': item.get('id'),
+        'status': response.status_code,
+        'headers': {k: response.headers[k] for k in EXPOSED_HEADERS if k in response.headers},
+        'body': body,
+    }
+
+
+def _run_parallel(app, items, environ_base, authorization):
+    results = [None] * len(items)
+    i = 0
+    while i < len(items):
+        if str(items[i].get('method', 'GET')).upper() != 'GET':
+            results[i] = _dispatch(app, items[i], environ_base, authorization)
+            i += 1
+            continue
+        # A run of consecutive reads; each task gets its own copy of the
+        # context so it shares this request's app context (and g) safely
+        j = i
+        while j < len(items) and str(items[j].get('method', 'GET')).upper() == 'GET':
+            j += 1
+        futures = [
+            (k, _executor.submit(contextvars.copy_context().run, _dispatch,
+                                 app, items[k], environ_base, authorization))
+            for k in range(i, j)
+        ]
+        deadline = time.monotonic() + BATCH_TIMEOUT
+        for k, future in futures:
+            try:
+                results[k] = future.result(timeout=max(0.0, deadline - time.monotonic()))
+            except TimeoutError:
+                future.cancel()
+                logger.warning(f"Batch sub-request {items[k].get('path')} timed out")
+                results[k] = _error(items[k], 504, 'Gateway Timeout',
+                                    f'No response within {BATCH_TIMEOUT:g}s')
+        i = j
+    return results
+
+
+@batch_bp.route('/batch/', methods=['POST'])
+@login_required
+def batch():
+    data = request.get_json(silent=True) or {}
+    items = data.get('requests')
+    error = _validate(items)
+    if error:
+        return jsonify({'error': 'Invalid batch', 'detail': error}), 400
+
+    app = current_app._get_current_object()
+    environ_base = {'REMOTE_ADDR': request.remote_addr}
+    authorization = request.headers.get('Authorization')
+
+    # login_required in sub-requests picks this up instead of re-validating
+    g.batch_principal = g.user
+    try:
+        if data.get('parallel'):
+            results = _run_parallel(app, items, environ_base, authorization)
+        else:
+            results = [_dispatch(app, item, environ_base, authorization) for item in items]
+    finally:
+        g.pop('batch_principal', None)
+
+    logger.info(f"Batch of {len(items)} requests for user {g.user.id}")
+    return jsonify(results), 200
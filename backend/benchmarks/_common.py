@@ -0,0 +1,97 @@
+"""
+Shared helpers for benchmark scripts — timing summaries, RSS and baseline comparison.
+"""
+
+import json
+import os
+import platform
+import resource
+import sys
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+BASELINE_DIR = Path(__file__).resolve().parent / 'baselines'
+
+# Make `api.json_db` and the other backend modules importable from scripts
+if str(BACKEND_DIR) not in sys.path:
+    sys.path.insert(0, str(BACKEND_DIR))
+
+
+def percentile(sorted_values: List[float], pct: float) -> float:
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    k = max(0, min(len(sorted_values) - 1, int(round(pct / 100 * len(sorted_values))) - 1))
+    return sorted_values[k]
+
+
+def summarize(latencies: List[float], wall_seconds: float = None) -> dict:
+    """Summarize per-call latencies (seconds) as ops/sec and p50/p99 in ms."""
+    lat = sorted(latencies)
+    total = wall_seconds if wall_seconds is not None else sum(lat)
+    return {
+        'iterations': len(lat),
+        'ops_per_sec': round(len(lat) / total, 2) if total > 0 else 0.0,
+        'p50_ms': round(percentile(lat, 50) * 1000, 3),
+        'p99_ms': round(percentile(lat, 99) * 1000, 3),
+    }
+
+
+def peak_rss_mb() -> float:
+    """Peak resident set size of this process in MB."""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports KB, macOS reports bytes
+    divisor = 1024 * 1024 if sys.platform == 'darwin' else 1024
+    return round(peak / divisor, 1)
+
+
+def environment() -> dict:
+    return {
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpus': os.cpu_count(),
+        'timestamp': datetime.now().isoformat(),
+    }
+
+
+def save_results(results: dict, path: Path):
+    path = Path(path)
+    os.makedirs(path.parent, exist_ok=True)
+    with open(path, 'w') as f:
+        json.dump(results, f, indent=2)
+    print(f"Results written to {path}")
+
+
+def compare_results(current: Dict[str, dict], baseline: Dict[str, dict], threshold: float) -> List[str]:
+    """Compare {case: {op: summary}} maps and return regression descriptions.
+
+    A regression is ops/sec falling, or p99 latency rising, by more than
+    `threshold` (a fraction, e.g. 0.10 for 10%).
+    """
+    regressions = []
+    for case, ops in current.items():
+        base_ops = baseline.get(case, {})
+        for op, stats in ops.items():
+            base = base_ops.get(op)
+            if not isinstance(stats, dict) or not isinstance(base, dict):
+                continue
+            if base.get('ops_per_sec') and stats['ops_per_sec'] < base['ops_per_sec'] * (1 - threshold):
+                regressions.append(
+                    f"{case}/{op}: ops/sec {base['ops_per_sec']} -> {stats['ops_per_sec']}"
+                )
+            if base.get('p99_ms') and stats['p99_ms'] > base['p99_ms'] * (1 + threshold):
+                regressions.append(
+                    f"{case}/{op}: p99 {base['p99_ms']}ms -> {stats['p99_ms']}ms"
+                )
+    return regressions
+
+
+def print_table(title: str, rows: Dict[str, dict]):
+    print(f"\n{title}")
+    print(f"  {'operation':<20}{'iters':>8}{'ops/sec':>14}{'p50 ms':>12}{'p99 ms':>12}")
+    for op, s in rows.items():
+        if not isinstance(s, dict):
+            continue
+        print(f"  {op:<20}{s['iterations']:>8}{s['ops_per_sec']:>14.1f}{s['p50_ms']:>12.3f}{s['p99_ms']:>12.3f}")
@@ -0,0 +1,187 @@
+"""
+Microbenchmarks for the json_db storage engine.
+
+Measures every JsonCollection operation at several collection sizes, both
+single-threaded and as a multi-threaded read/write mix, and reports ops/sec,
+p50/p99 latency and peak RSS. Each size runs in a fresh process so RSS
+numbers are not polluted by earlier sizes.
+
+Usage (from backend/):
+    python -m benchmarks.bench_json_db                        # 1k and 10k records
+    python -m benchmarks.bench_json_db --sizes 1000,100000,1000000
+    python -m benchmarks.bench_json_db --save-baseline        # write baselines/json_db.json
+    python -m benchmarks.bench_json_db --compare benchmarks/baselines/json_db.json
+"""
+
+import argparse
+import json
+import multiprocessing
+import random
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+try:
+    from benchmarks._common import (
+        BASELINE_DIR, compare_results, environment, peak_rss_mb, print_table,
+        save_results, summarize,
+    )
+except ImportError:
+    from _common import (
+        BASELINE_DIR, compare_results, environment, peak_rss_mb, print_table,
+        save_results, summarize,
+    )
+
+OPERATIONS = ('create', 'bulk_create', 'get', 'filter', 'filter_fn', 'search',
+              'update', 'delete', 'order_by')
+METRIC_TYPES = ('blood_pressure', 'heart_rate', 'weight', 'blood_sugar', 'temperature')
+NOTES = ('after breakfast', 'felt dizzy', 'morning reading', 'post workout', '')
+
+
+def make_record(rng: random.Random, n_users: int) -> dict:
+    """A record shaped like a health_metrics entry."""
+    return {
+        'user': rng.randint(1, n_users),
+        'metric_type': rng.choice(METRIC_TYPES),
+        'value': str(round(rng.uniform(50, 180), 1)),
+        'unit': 'mmHg',
+        'notes': rng.choice(NOTES),
+        'recorded_at': f'2025-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}T08:00:00',
+    }
+
+
+def iterations_for(size: int, scale: int) -> int:
+    """Every operation is O(collection size), so do fewer iterations at larger sizes."""
+    return max(5, min(500, scale // size))
+
+
+def _timed(fn, iterations: int) -> list:
+    latencies = []
+    for i in range(iterations):
+        start = time.perf_counter()
+        fn(i)
+        latencies.append(time.perf_counter() - start)
+    return latencies
+
+
+def run_size(size: int, threads: int, scale: int, seed: int) -> dict:
+    """Benchmark one collection size. Runs in a child process."""
+    from api.json_db import JsonCollection
+
+    rng = random.Random(seed)
+    n_users = max(1, size // 20)
+    tmp = Path(tempfile.mkdtemp(prefix='json_db_bench_'))
+    try:
+        col = JsonCollection('bench', tmp)
+        col.bulk_create([make_record(rng, n_users) for _ in range(size)])
+        iters = iterations_for(size, scale)
+        results = {}
+
+        results['create'] = summarize(_timed(lambda i: col.create(make_record(rng, n_users)), iters))
+        batch = [make_record(rng, n_users) for _ in range(100)]
+        results['bulk_create'] = summarize(_timed(lambda i: col.bulk_create(batch), max(3, iters // 10)))
+
+        ids = [rng.randint(1, size) for _ in range(iters)]
+        results['get'] = summarize(_timed(lambda i: col.get(ids[i]), iters))
+        users = [rng.randint(1, n_users) for _ in range(iters)]
+        results['filter'] = summarize(_timed(lambda i: col.filter(user=users[i]), iters))
+        results['filter_fn'] = summarize(_timed(
+            lambda i: col.filter_fn(lambda r: r.get('user') == users[i] and r.get('recorded_at', '') >= '2025-06'),
+            iters,
+        ))
+        results['search'] = summarize(_timed(lambda i: col.search(['notes', 'metric_type'], 'dizzy'), iters))
+        results['update'] = summarize(_timed(lambda i: col.update(ids[i], {'notes': 'updated'}), iters))
+        delete_ids = rng.sample(range(1, size + 1), min(iters, size))
+        results['delete'] = summarize(_timed(lambda i: col.delete(delete_ids[i]), len(delete_ids)))
+        results['order_by'] = summarize(_timed(lambda i: col.order_by('recorded_at', reverse=True), iters))
+
+        if threads > 1:
+            results['mixed_mt'] = run_mixed(col, threads, iters, n_users, size, seed)
+
+        results['peak_rss_mb'] = peak_rss_mb()
+        return results
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+
+def run_mixed(col, threads: int, iters: int, n_users: int, size: int, seed: int) -> dict:
+    """Concurrent mix: 70% reads (get/filter), 20% updates, 10% creates."""
+    latencies = []
+    lat_lock = threading.Lock()
+
+    def worker(worker_id: int):
+        rng = random.Random(seed + worker_id)
+        local = []
+        for _ in range(iters):
+            roll = rng.random()
+            start = time.perf_counter()
+            if roll < 0.35:
+                col.get(rng.randint(1, size))
+            elif roll < 0.7:
+                col.filter(user=rng.randint(1, n_users))
+            elif roll < 0.9:
+                col.update(rng.randint(1, size), {'notes': 'mt'})
+            else:
+                col.create(make_record(rng, n_users))
+            local.append(time.perf_counter() - start)
+        with lat_lock:
+            latencies.extend(local)
+
+    pool = [threading.Thread(target=worker, args=(w,)) for w in range(threads)]
+    wall_start = time.perf_counter()
+    for t in pool:
+        t.start()
+    for t in pool:
+        t.join()
+    return summarize(latencies, time.perf_counter() - wall_start)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark the json_db storage engine')
+    parser.add_argument('--sizes', default='1000,10000',
+                        help='Comma-separated collection sizes (e.g. 1000,10000,100000,1000000)')
+    parser.add_argument('--threads', type=int, default=4, help='Threads for the mixed workload (1 disables it)')
+    parser.add_argument('--scale', type=int, default=500_000,
+                        help='Iteration budget; iterations per op = scale / size, clamped to [5, 500]')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--output', help='Write results JSON to this path')
+    parser.add_argument('--save-baseline', action='store_true',
+                        help=f'Write results to {BASELINE_DIR / "json_db.json"}')
+    parser.add_argument('--compare', help='Baseline JSON to compare against')
+    parser.add_argument('--threshold', type=float, default=0.10,
+                        help='Allowed relative slowdown before flagging a regression')
+    args = parser.parse_args(argv)
+
+    sizes = [int(s) for s in args.sizes.split(',') if s.strip()]
+    ctx = multiprocessing.get_context('spawn')
+    by_size = {}
+    for size in sizes:
+        print(f"Benchmarking {size:,} records...", flush=True)
+        with ctx.Pool(1) as pool:
+            by_size[str(size)] = pool.apply(run_size, (size, args.threads, args.scale, args.seed))
+        print_table(f"{size:,} records (peak RSS {by_size[str(size)]['peak_rss_mb']} MB)", by_size[str(size)])
+
+    results = {'benchmark': 'json_db', 'environment': environment(), 'results': by_size}
+    if args.output:
+        save_results(results, Path(args.output))
+    if args.save_baseline:
+        save_results(results, BASELINE_DIR / 'json_db.json')
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        regressions = compare_results(by_size, baseline.get('results', {}), args.threshold)
+        if regressions:
+            print(f"\n{len(regressions)} regression(s) beyond {args.threshold:.0%}:")
+            for line in regressions:
+                print(f"  REGRESSION {line}")
+            return 1
+        print(f"\nNo regressions beyond {args.threshold:.0%} against {args.compare}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,168 @@
+"""
+Serialization benchmark for the Flask JSON provider.
+
+Builds payloads shaped like the largest list endpoints (health metrics, AI
+consultation history, prescriptions with medications, medical records) and
+times Flask's stdlib DefaultJSONProvider against json_provider.FastJSONProvider
+for compact responses, pretty (debug) responses and request parsing.
+
+Usage (from backend/):
+    python -m benchmarks.bench_json_provider
+    python -m benchmarks.bench_json_provider --rows 1000,10000 --iterations 50
+    python -m benchmarks.bench_json_provider --save-baseline
+"""
+
+import argparse
+import json
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+try:
+    from benchmarks._common import (
+        BASELINE_DIR, compare_results, environment, print_table, save_results, summarize,
+    )
+except ImportError:
+    from _common import (
+        BASELINE_DIR, compare_results, environment, print_table, save_results, summarize,
+    )
+
+from flask import Flask
+from flask.json.provider import DefaultJSONProvider
+
+from json_provider import FastJSONProvider, orjson
+
+LOREM = ('Patient reports intermittent headaches and mild fatigue over the past two weeks. '
+         'Advised hydration, regular sleep and a follow-up if symptoms persist. ')
+
+
+def _user(rng):
+    uid = rng.randint(1, 500)
+    return {'id': uid, 'username': f'user{uid}', 'first_name': 'Test', 'last_name': f'User{uid}',
+            'email': f'user{uid}@example.com', 'user_type': 'patient'}
+
+
+def _stamp(rng):
+    return (datetime(2025, 1, 1) + timedelta(minutes=rng.randint(0, 525_600))).isoformat()
+
+
+def health_metrics(rng, n):
+    return [{'id': i, 'user': rng.randint(1, 500), 'metric_type': 'blood_pressure',
+             'value': f'{rng.randint(100, 160)}/{rng.randint(60, 100)}', 'unit': 'mmHg',
+             'notes': 'morning reading', 'recorded_at': _stamp(rng), 'created_at': _stamp(rng)}
+            for i in range(1, n + 1)]
+
+
+def ai_consultations(rng, n):
+    return [{'id': i, 'patient': rng.randint(1, 500), 'symptoms': LOREM[:120],
+             'ai_response': LOREM * 6, 'severity_assessment': 'moderate',
+             'recommended_specialist': 'General Physician', 'created_at': _stamp(rng)}
+            for i in range(1, n + 1)]
+
+
+def prescriptions(rng, n):
+    return [{'id': i, 'patient': rng.randint(1, 500), 'doctor': rng.randint(1, 50),
+             'diagnosis': 'Hypertension', 'notes': LOREM[:80], 'valid_until': '2026-01-01',
+             'created_at': _stamp(rng), 'patient_info': _user(rng), 'doctor_info': _user(rng),
+             'medications': [{'id': i * 10 + k, 'prescription': i, 'name': f'Drug {k}',
+                              'dosage': '500mg', 'frequency': 'twice daily', 'duration': '7 days'}
+                             for k in range(3)]}
+            for i in range(1, n + 1)]
+
+
+def medical_records(rng, n):
+    return [{'id': i, 'patient': rng.randint(1, 500), 'doctor': rng.randint(1, 50),
+             'record_type': 'lab_report', 'title': 'Blood panel', 'description': LOREM * 2,
+             'diagnosis': 'Within normal limits', 'record_date': _stamp(rng)[:10],
+             'created_at': datetime(2025, 6, 1, 9, 30), 'patient_info': _user(rng)}
+            for i in range(1, n + 1)]
+
+
+PAYLOADS = {
+    'health_metrics': health_metrics,
+    'ai_consultations': ai_consultations,
+    'prescriptions': prescriptions,
+    'medical_records': medical_records,
+}
+
+
+def _timed(fn, iterations: int) -> list:
+    latencies = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        fn()
+        latencies.append(time.perf_counter() - start)
+    return latencies
+
+
+def run_payload(app, providers: dict, payload, iterations: int) -> dict:
+    """Time response() (compact and pretty) and loads() for each provider."""
+    results = {}
+    body = json.dumps(payload, default=str).encode()
+    with app.app_context():
+        for label, provider in providers.items():
+            provider.compact = True
+            results[f'{label}:response'] = summarize(_timed(lambda: provider.response(payload), iterations))
+            provider.compact = False
+            results[f'{label}:response_pretty'] = summarize(_timed(lambda: provider.response(payload), iterations))
+            provider.compact = None
+            results[f'{label}:loads'] = summarize(_timed(lambda: provider.loads(body), iterations))
+    results['body_kb'] = round(len(body) / 1024, 1)
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark the Flask JSON provider')
+    parser.add_argument('--rows', default='1000,10000', help='Comma-separated list sizes')
+    parser.add_argument('--iterations', type=int, default=30)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--output', help='Write results JSON to this path')
+    parser.add_argument('--save-baseline', action='store_true',
+                        help=f'Write results to {BASELINE_DIR / "json_provider.json"}')
+    parser.add_argument('--compare', help='Baseline JSON to compare against')
+    parser.add_argument('--threshold', type=float, default=0.10,
+                        help='Allowed relative slowdown before flagging a regression')
+    args = parser.parse_args(argv)
+
+    if orjson is None:
+        print("orjson is not installed; FastJSONProvider will use the stdlib fallback")
+
+    app = Flask(__name__)
+    providers = {'stdlib': DefaultJSONProvider(app), 'fast': FastJSONProvider(app)}
+    rng = random.Random(args.seed)
+
+    by_case = {}
+    for rows in [int(r) for r in args.rows.split(',') if r.strip()]:
+        for name, build in PAYLOADS.items():
+            case = f'{name}/{rows}'
+            by_case[case] = run_payload(app, providers, build(rng, rows), args.iterations)
+            print_table(f"{case} ({by_case[case]['body_kb']} KB)", by_case[case])
+
+    results = {
+        'benchmark': 'json_provider',
+        'backend': 'orjson' if orjson is not None else 'json',
+        'environment': environment(),
+        'results': by_case,
+    }
+    if args.output:
+        save_results(results, Path(args.output))
+    if args.save_baseline:
+        save_results(results, BASELINE_DIR / 'json_provider.json')
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        regressions = compare_results(by_case, baseline.get('results', {}), args.threshold)
+        if regressions:
+            print(f"\n{len(regressions)} regression(s) beyond {args.threshold:.0%}:")
+            for line in regressions:
+                print(f"  REGRESSION {line}")
+            return 1
+        print(f"\nNo regressions beyond {args.threshold:.0%} against {args.compare}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,157 @@
+"""
+Login throughput benchmark for the password hashing service.
+
+Creates a throwaway data directory with --users accounts hashed with each
+KDF, then drives POST /api/auth/login/ from --concurrency threads through
+the Flask test client. Reports logins/sec, logins/sec per hashing core and
+p50/p99 latency. Each case runs in a fresh process so KDF settings (read
+at import) do not leak between cases.
+
+Usage (from backend/):
+    python -m benchmarks.bench_login
+    python -m benchmarks.bench_login --kdfs scrypt --workers 0,2,4 --concurrency 16
+    python -m benchmarks.bench_login --save-baseline
+"""
+
+import argparse
+import json
+import logging
+import multiprocessing
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+try:
+    from benchmarks._common import (
+        BACKEND_DIR, BASELINE_DIR, compare_results, environment, print_table,
+        save_results, summarize,
+    )
+except ImportError:
+    from _common import (
+        BACKEND_DIR, BASELINE_DIR, compare_results, environment, print_table,
+        save_results, summarize,
+    )
+
+PASSWORD = 'benchmark-password'
+
+
+def run_case(kdf: str, workers: int, users: int, concurrency: int, logins: int) -> dict:
+    """One KDF/pool-size combination. Runs in a child process."""
+    tmp = tempfile.mkdtemp(prefix='bench_login_')
+    os.environ.update({
+        'JSON_DB_DIR': tmp,
+        'PASSWORD_KDF': kdf,
+        'HASH_WORKERS': str(workers),
+        'HASH_MAX_PENDING': str(max(concurrency, 1) * 2),
+        'LOGIN_RATE_LIMIT': str(10 ** 9),
+    })
+    sys.path.insert(0, str(BACKEND_DIR))
+    try:
+        from api.json_db import users_db, user_profiles_db
+        from password_service import compute_hash, password_hasher
+        from app import create_app
+
+        stored = compute_hash(PASSWORD, kdf)
+        created = users_db.bulk_create([{
+            'username': f'user{i}', 'email': f'user{i}@example.com', 'password': stored,
+            'first_name': 'Bench', 'last_name': str(i), 'is_active': True,
+        } for i in range(users)])
+        user_profiles_db.bulk_create([{'user_id': u['id'], 'user_type': 'patient'} for u in created])
+
+        app = create_app()
+        logging.getLogger().setLevel(logging.WARNING)
+        password_hasher.warm()
+
+        latencies, statuses = [], {}
+        lock = threading.Lock()
+        per_thread = max(1, logins // concurrency)
+
+        def worker(n):
+            client = app.test_client()
+            local, codes = [], {}
+            for i in range(per_thread):
+                body = {'username': f'user{(n * per_thread + i) % users}', 'password': PASSWORD}
+                start = time.perf_counter()
+                status = client.post('/api/auth/login/', json=body).status_code
+                local.append(time.perf_counter() - start)
+                codes[status] = codes.get(status, 0) + 1
+            with lock:
+                latencies.extend(local)
+                for code, count in codes.items():
+                    statuses[code] = statuses.get(code, 0) + count
+
+        threads = [threading.Thread(target=worker, args=(n,)) for n in range(concurrency)]
+        wall = time.perf_counter()
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        wall = time.perf_counter() - wall
+
+        summary = summarize(latencies, wall)
+        cores = max(1, min(workers, os.cpu_count() or 1))
+        summary['per_core'] = round(summary['ops_per_sec'] / cores, 2)
+        summary['statuses'] = {str(k): v for k, v in sorted(statuses.items())}
+        password_hasher.shutdown()
+        return summary
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark login throughput per KDF and pool size')
+    parser.add_argument('--kdfs', default='scrypt,pbkdf2_sha256')
+    parser.add_argument('--workers', default='0,2',
+                        help='Comma-separated HASH_WORKERS values (0 = hash inline on request threads)')
+    parser.add_argument('--users', type=int, default=50)
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--logins', type=int, default=200)
+    parser.add_argument('--output', help='Write results JSON to this path')
+    parser.add_argument('--save-baseline', action='store_true',
+                        help=f'Write results to {BASELINE_DIR / "login.json"}')
+    parser.add_argument('--compare', help='Baseline JSON to compare against')
+    parser.add_argument('--threshold', type=float, default=0.10,
+                        help='Allowed relative slowdown before flagging a regression')
+    args = parser.parse_args(argv)
+
+    ctx = multiprocessing.get_context('spawn')
+    by_kdf = {}
+    for kdf in [k for k in args.kdfs.split(',') if k.strip()]:
+        rows = {}
+        for workers in [int(w) for w in args.workers.split(',') if w.strip()]:
+            print(f"Benchmarking {kdf} with {workers} hashing workers...", flush=True)
+            # Not multiprocessing.Pool: its daemonic workers cannot start the hashing pool
+            with ProcessPoolExecutor(max_workers=1, mp_context=ctx) as pool:
+                rows[f'workers={workers}'] = pool.submit(
+                    run_case, kdf, workers, args.users, args.concurrency, args.logins).result()
+        by_kdf[kdf] = rows
+        print_table(f"{kdf} logins (concurrency {args.concurrency})", rows)
+        for label, row in rows.items():
+            print(f"  {label}: {row['per_core']} logins/sec per hashing core, statuses {row['statuses']}")
+
+    results = {'benchmark': 'login', 'environment': environment(), 'results': by_kdf}
+    if args.output:
+        save_results(results, Path(args.output))
+    if args.save_baseline:
+        save_results(results, BASELINE_DIR / 'login.json')
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        regressions = compare_results(by_kdf, baseline.get('results', {}), args.threshold)
+        if regressions:
+            print(f"\n{len(regressions)} regression(s) beyond {args.threshold:.0%}:")
+            for line in regressions:
+                print(f"  REGRESSION {line}")
+            return 1
+        print(f"\nNo regressions beyond {args.threshold:.0%} against {args.compare}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
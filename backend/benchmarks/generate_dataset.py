@@ -0,0 +1,266 @@
+"""
+Synthetic dataset generator for load testing.
+
+Writes clinics, doctors and patients with years of health metrics,
+appointments, prescriptions + medications, reminders, medical records, AI
+consultations and doctor reviews straight into the JSON collections.
+
+Every generated account uses the password given by --password (default
+'loadtest123'); patients are patient1..patientN, doctors doctor1..doctorN.
+
+Usage (from backend/):
+    JSON_DB_DIR=/tmp/hg-load python -m benchmarks.generate_dataset --patients 5000 --doctors 300
+"""
+
+import argparse
+import random
+import sys
+from datetime import datetime, timedelta
+from pathlib import Path
+
+try:
+    from benchmarks import _common  # noqa: F401  (puts backend/ on sys.path)
+except ImportError:
+    import _common  # noqa: F401
+
+from api.json_db import DATA_DIR, JsonCollection
+from password_service import compute_hash
+
+COLLECTIONS = (
+    'users', 'user_profiles', 'clinics', 'health_metrics', 'appointments',
+    'prescriptions', 'medications', 'medicine_reminders', 'medical_records',
+    'ai_consultations', 'doctor_reviews',
+)
+
+FIRST_NAMES = ('Aarav', 'Sita', 'Ram', 'Gita', 'Hari', 'Maya', 'Bikash', 'Anita', 'Suman', 'Priya')
+LAST_NAMES = ('Sharma', 'Thapa', 'Gurung', 'Rai', 'Shrestha', 'Karki', 'Adhikari', 'Tamang')
+CITIES = ('Kathmandu', 'Pokhara', 'Lalitpur', 'Biratnagar', 'Dharan', 'Butwal')
+SPECIALIZATIONS = ('General Medicine', 'Cardiology', 'Dermatology', 'Pediatrics',
+                   'Orthopedics', 'Endocrinology', 'Neurology')
+METRICS = {
+    'blood_pressure': ('mmHg', lambda r: f'{r.randint(100, 150)}/{r.randint(60, 95)}'),
+    'heart_rate': ('bpm', lambda r: str(r.randint(55, 110))),
+    'weight': ('kg', lambda r: str(round(r.uniform(45, 110), 1))),
+    'blood_sugar': ('mg/dL', lambda r: str(r.randint(70, 220))),
+    'temperature': ('°C', lambda r: str(round(r.uniform(36.0, 39.5), 1))),
+}
+DIAGNOSES = ('Hypertension', 'Type 2 diabetes', 'Seasonal allergy', 'Migraine',
+             'Upper respiratory infection', 'Gastritis', 'Vitamin D deficiency')
+DRUGS = (('Amlodipine', '5mg'), ('Metformin', '500mg'), ('Cetirizine', '10mg'),
+         ('Paracetamol', '500mg'), ('Omeprazole', '20mg'), ('Atorvastatin', '10mg'))
+SYMPTOMS = ('headache and mild fever for two days', 'persistent dry cough at night',
+            'dizziness when standing up quickly', 'stomach pain after meals',
+            'fatigue and shortness of breath on stairs')
+AI_PARAGRAPH = (
+    'Based on the symptoms you describe, this is most often caused by a common, '
+    'self-limiting condition. Rest, stay hydrated and monitor your temperature. '
+    'Seek medical care promptly if symptoms worsen or new symptoms appear. '
+)
+
+
+def _name(rng):
+    return rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES)
+
+
+def _ts(dt: datetime) -> str:
+    return dt.replace(microsecond=0).isoformat()
+
+
+def generate(data_dir: Path, patients: int, doctors: int, clinics: int, years: float,
+             password: str, seed: int) -> dict:
+    rng = random.Random(seed)
+    now = datetime.now()
+    history_days = int(years * 365)
+    cols = {name: JsonCollection(name, data_dir) for name in COLLECTIONS}
+    # One hash is enough: the salt travels with it, so every account shares the password.
+    password_hash = compute_hash(password)
+
+    clinic_rows = cols['clinics'].bulk_create([{
+        'name': f'{rng.choice(CITIES)} Health Clinic {i}',
+        'email': f'clinic{i}@example.com',
+        'location': rng.choice(CITIES),
+        'phone': f'98{rng.randint(10000000, 99999999)}',
+        'status': 'active',
+    } for i in range(1, clinics + 1)])
+
+    def make_users(prefix, count):
+        rows = []
+        for i in range(1, count + 1):
+            first, last = _name(rng)
+            rows.append({
+                'username': f'{prefix}{i}',
+                'email': f'{prefix}{i}@example.com',
+                'password': password_hash,
+                'first_name': first,
+                'last_name': last,
+                'is_active': True,
+                'is_verified': True,
+            })
+        return cols['users'].bulk_create(rows)
+
+    doctor_users = make_users('doctor', doctors)
+    patient_users = make_users('patient', patients)
+    doctor_ids = [u['id'] for u in doctor_users]
+
+    profiles = []
+    for u in doctor_users:
+        profiles.append({
+            'user_id': u['id'],
+            'user_type': 'doctor',
+            'phone': f'98{rng.randint(10000000, 99999999)}',
+            'specialization': rng.choice(SPECIALIZATIONS),
+            'license_number': f'NMC-{rng.randint(1000, 99999)}',
+            'years_of_experience': rng.randint(1, 30),
+            'consultation_fee': rng.choice((500, 800, 1000, 1500)),
+            'clinic_id': rng.choice(clinic_rows)['id'] if clinic_rows else None,
+            'is_verified': True,
+        })
+    for u in patient_users:
+        profiles.append({
+            'user_id': u['id'],
+            'user_type': 'patient',
+            'phone': f'98{rng.randint(10000000, 99999999)}',
+            'date_of_birth': f'{rng.randint(1945, 2006)}-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}',
+            'gender': rng.choice(('male', 'female')),
+            'location': rng.choice(CITIES),
+            'blood_group': rng.choice(('A+', 'B+', 'O+', 'AB+', 'O-')),
+            'is_verified': True,
+        })
+    cols['user_profiles'].bulk_create(profiles)
+
+    metrics, appointments, prescriptions, reminders = [], [], [], []
+    records, consultations, reviews = [], [], []
+    for u in patient_users:
+        pid = u['id']
+        tracked = rng.sample(list(METRICS), k=rng.randint(1, 3))
+        # Roughly weekly readings per tracked metric over the history window
+        for metric_type in tracked:
+            unit, value = METRICS[metric_type]
+            for day in range(0, history_days, rng.randint(5, 9)):
+                metrics.append({
+                    'user': pid,
+                    'metric_type': metric_type,
+                    'value': value(rng),
+                    'unit': unit,
+                    'notes': '',
+                    'recorded_at': _ts(now - timedelta(days=history_days - day, hours=rng.randint(0, 12))),
+                })
+        for _ in range(rng.randint(2, 4 + int(years * 4))):
+            offset = rng.randint(-history_days, 30)
+            when = (now + timedelta(days=offset)).replace(hour=rng.randint(9, 16), minute=rng.choice((0, 30)))
+            appointments.append({
+                'patient': pid,
+                'doctor': rng.choice(doctor_ids),
+                'appointment_date': _ts(when),
+                'duration': rng.choice((15, 30, 45)),
+                'status': 'completed' if offset < 0 else rng.choice(('scheduled', 'confirmed')),
+                'reason': rng.choice(SYMPTOMS),
+            })
+        for _ in range(rng.randint(0, 2 + int(years))):
+            issued = now - timedelta(days=rng.randint(0, history_days))
+            prescriptions.append({
+                'patient': pid,
+                'doctor': rng.choice(doctor_ids),
+                'diagnosis': rng.choice(DIAGNOSES),
+                'notes': 'Follow up in four weeks.',
+                'prescription_date': _ts(issued),
+                'valid_until': (issued + timedelta(days=rng.choice((30, 90, 180)))).date().isoformat(),
+            })
+        for _ in range(rng.randint(0, 2)):
+            drug, dose = rng.choice(DRUGS)
+            start = now - timedelta(days=rng.randint(0, 120))
+            reminders.append({
+                'user': pid,
+                'medication': drug,
+                'dosage': dose,
+                'frequency': 'daily',
+                'start_date': start.date().isoformat(),
+                'end_date': (start + timedelta(days=rng.choice((14, 30, 90)))).date().isoformat(),
+                'reminder_times': ['08:00', '20:00'],
+                'is_active': True,
+                'notes': '',
+            })
+        for _ in range(rng.randint(1, 3)):
+            diagnosis = rng.choice(DIAGNOSES)
+            records.append({
+                'patient': pid,
+                'recorded_by': rng.choice(doctor_ids),
+                'title': f'{diagnosis} review',
+                'description': f'Patient seen for {diagnosis.lower()}. ' * rng.randint(3, 10),
+                'diagnosis': diagnosis,
+                'symptoms': rng.choice(SYMPTOMS),
+                'record_date': _ts(now - timedelta(days=rng.randint(0, history_days))),
+            })
+        for _ in range(rng.randint(0, 3 + int(years * 2))):
+            consultations.append({
+                'patient': pid,
+                'symptoms': rng.choice(SYMPTOMS),
+                'patient_message': 'Should I be worried?',
+                'ai_response': AI_PARAGRAPH * rng.randint(4, 12),
+                'confidence_score': rng.choice((0.65, 0.75, 0.85)),
+                'created_at': _ts(now - timedelta(days=rng.randint(0, history_days))),
+            })
+        if rng.random() < 0.4:
+            reviews.append({
+                'patient': pid,
+                'doctor': rng.choice(doctor_ids),
+                'rating': rng.choices((1, 2, 3, 4, 5), weights=(1, 1, 3, 6, 9))[0],
+                'review': 'Very helpful consultation.',
+            })
+
+    prescription_rows = cols['prescriptions'].bulk_create(prescriptions)
+    medications = []
+    for p in prescription_rows:
+        for drug, dose in rng.sample(DRUGS, k=rng.randint(1, 3)):
+            medications.append({
+                'prescription_id': p['id'],
+                'name': drug,
+                'dosage': dose,
+                'frequency': rng.choice(('once daily', 'twice daily', 'as needed')),
+                'duration': rng.choice(('7 days', '30 days', '90 days')),
+                'instructions': 'Take after food.',
+            })
+
+    cols['health_metrics'].bulk_create(metrics)
+    cols['appointments'].bulk_create(appointments)
+    cols['medications'].bulk_create(medications)
+    cols['medicine_reminders'].bulk_create(reminders)
+    cols['medical_records'].bulk_create(records)
+    cols['ai_consultations'].bulk_create(consultations)
+    cols['doctor_reviews'].bulk_create(reviews)
+
+    return {name: col.count() for name, col in cols.items()}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Generate a synthetic HealthGuard dataset')
+    parser.add_argument('--data-dir', default=str(DATA_DIR),
+                        help='Target data directory (defaults to JSON_DB_DIR or backend/data)')
+    parser.add_argument('--patients', type=int, default=2000)
+    parser.add_argument('--doctors', type=int, default=150)
+    parser.add_argument('--clinics', type=int, default=40)
+    parser.add_argument('--years', type=float, default=2.0, help='Years of history per patient')
+    parser.add_argument('--password', default='loadtest123', help='Password for every generated account')
+    parser.add_argument('--seed', type=int, default=7)
+    parser.add_argument('--force', action='store_true',
+                        help='Generate even if the target collections already contain records')
+    args = parser.parse_args(argv)
+
+    data_dir = Path(args.data_dir)
+    if not args.force:
+        existing = [n for n in COLLECTIONS if JsonCollection(n, data_dir).count()]
+        if existing:
+            print(f"Refusing to write into non-empty collections in {data_dir}: {', '.join(existing)}")
+            print("Use an empty --data-dir (or JSON_DB_DIR) or pass --force to append.")
+            return 1
+
+    print(f"Generating dataset in {data_dir}...")
+    counts = generate(data_dir, args.patients, args.doctors, args.clinics, args.years,
+                      args.password, args.seed)
+    for name, n in counts.items():
+        print(f"  {name:<20}{n:>10,}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
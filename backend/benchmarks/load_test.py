@@ -0,0 +1,335 @@
+"""
+HTTP load-test harness for the Flask API.
+
+Replays a weighted traffic mix (login, /auth/me/, /dashboard/stats/, list
+endpoints, health-metric POSTs, AI consultations) from concurrent virtual
+users and reports throughput plus p50/p95/p99 latency per route. Gemini is
+replaced by a stub so AI endpoints exercise the app, not the network.
+
+Modes:
+    inprocess  drive app.test_client() directly (no sockets)
+    http       drive a server over localhost; without --base-url a stubbed
+               server is started in a subprocess on --port
+
+Usage (from backend/, after benchmarks.generate_dataset):
+    JSON_DB_DIR=/tmp/hg-load python -m benchmarks.load_test --mode inprocess --duration 30
+    JSON_DB_DIR=/tmp/hg-load python -m benchmarks.load_test --mode http --concurrency 16
+    JSON_DB_DIR=/tmp/hg-load python -m benchmarks.load_test --mode http --workers 4
+    JSON_DB_DIR=/tmp/hg-load python -m benchmarks.load_test --serve --port 8001
+"""
+
+import argparse
+import http.client
+import json
+import logging
+import os
+import random
+import subprocess
+import sys
+import threading
+import time
+from collections import defaultdict
+from pathlib import Path
+from urllib.parse import urlsplit
+
+try:
+    from benchmarks._common import BACKEND_DIR, environment, save_results, summarize, percentile
+except ImportError:
+    from _common import BACKEND_DIR, environment, save_results, summarize, percentile
+
+# (weight, method, route label, path template, needs auth)
+TRAFFIC_MIX = (
+    (4, 'POST', 'POST /api/auth/login/', '/api/auth/login/', False),
+    (14, 'GET', 'GET /api/auth/me/', '/api/auth/me/', True),
+    (18, 'GET', 'GET /api/dashboard/stats/', '/api/dashboard/stats/', True),
+    (6, 'GET', 'GET /api/profiles/me/', '/api/profiles/me/', True),
+    (10, 'GET', 'GET /api/appointments/', '/api/appointments/', True),
+    (6, 'GET', 'GET /api/appointments/upcoming/', '/api/appointments/upcoming/', True),
+    (8, 'GET', 'GET /api/prescriptions/', '/api/prescriptions/', True),
+    (8, 'GET', 'GET /api/health-metrics/', '/api/health-metrics/', True),
+    (4, 'GET', 'GET /api/health-metrics/trends/', '/api/health-metrics/trends/?days=90', True),
+    (5, 'GET', 'GET /api/medical-records/', '/api/medical-records/', True),
+    (5, 'GET', 'GET /api/medicine-reminders/', '/api/medicine-reminders/', True),
+    (4, 'GET', 'GET /api/ai-consultations/', '/api/ai-consultations/', True),
+    (6, 'POST', 'POST /api/health-metrics/', '/api/health-metrics/', True),
+    (2, 'POST', 'POST /api/ai-consultations/', '/api/ai-consultations/', True),
+)
+
+STUB_RESPONSE = (
+    'Summary of understanding: your symptoms are commonly caused by a minor, '
+    'self-limiting illness. Rest, hydrate and monitor. Seek care if they worsen. '
+) * 8
+
+
+class _StubResponse:
+    def __init__(self, text):
+        self.text = text
+
+
+class StubGeminiModel:
+    """Stands in for genai.GenerativeModel with a fixed delay and canned text."""
+
+    def __init__(self, latency_ms: float = 0.0):
+        self.latency = latency_ms / 1000
+
+    def generate_content(self, prompt):
+        if self.latency:
+            time.sleep(self.latency)
+        return _StubResponse(STUB_RESPONSE)
+
+
+def build_app(gemini_latency_ms: float = 0.0):
+    """Create the Flask app with Gemini stubbed out."""
+    # Virtual users log in far more often than the per-identifier login
+    # limit allows; measure the login path, not the 429 path
+    os.environ.setdefault('LOGIN_RATE_LIMIT', str(10 ** 9))
+    sys.path.insert(0, str(BACKEND_DIR))
+    import gemini_service
+    from app import create_app
+
+    gemini_service.gemini_service.model = StubGeminiModel(gemini_latency_ms)
+    return create_app()
+
+
+# ── Clients ──────────────────────────────────────
+
+class InProcessClient:
+    def __init__(self, app):
+        self.client = app.test_client()
+
+    def request(self, method, path, body=None, headers=None):
+        resp = self.client.open(path, method=method, json=body, headers=headers or {})
+        data = resp.get_data()
+        return resp.status_code, data
+
+
+class HttpClient:
+    """Keep-alive HTTP/1.1 client; one per virtual user thread."""
+
+    def __init__(self, base_url: str):
+        parts = urlsplit(base_url)
+        self.host = parts.hostname
+        self.port = parts.port or 80
+        self.conn = None
+
+    def request(self, method, path, body=None, headers=None):
+        headers = dict(headers or {})
+        payload = None
+        if body is not None:
+            payload = json.dumps(body)
+            headers['Content-Type'] = 'application/json'
+        for attempt in (1, 2):
+            if self.conn is None:
+                self.conn = http.client.HTTPConnection(self.host, self.port, timeout=30)
+            try:
+                self.conn.request(method, path, body=payload, headers=headers)
+                resp = self.conn.getresponse()
+                return resp.status, resp.read()
+            except (http.client.HTTPException, ConnectionError):
+                self.conn.close()
+                self.conn = None
+                if attempt == 2:
+                    raise
+
+
+# ── Driver ───────────────────────────────────────
+
+class VirtualUser:
+    def __init__(self, client, username, password, rng):
+        self.client = client
+        self.username = username
+        self.password = password
+        self.rng = rng
+        self.token = None
+
+    def login(self):
+        status, data = self.client.request('POST', '/api/auth/login/',
+                                           {'username': self.username, 'password': self.password})
+        if status == 200:
+            self.token = json.loads(data)['token']
+        return status
+
+    def body_for(self, label):
+        if label == 'POST /api/health-metrics/':
+            return {'metric_type': 'heart_rate', 'value': str(self.rng.randint(55, 110)), 'unit': 'bpm'}
+        if label == 'POST /api/ai-consultations/':
+            return {'symptoms': 'mild headache since morning', 'patient_message': 'What should I do?'}
+        return None
+
+    def step(self, entry):
+        _, method, label, path, needs_auth = entry
+        if label == 'POST /api/auth/login/':
+            return self.login()
+        headers = {'Authorization': f'Bearer {self.token}'} if needs_auth and self.token else {}
+        status, _ = self.client.request(method, path, self.body_for(label), headers)
+        return status
+
+
+def run_load(make_client, usernames, password, concurrency, duration, max_requests, seed):
+    weights = [e[0] for e in TRAFFIC_MIX]
+    latencies = defaultdict(list)
+    errors = defaultdict(int)
+    limited = defaultdict(int)
+    lock = threading.Lock()
+    deadline = time.perf_counter() + duration
+    budget = [max_requests]
+
+    def worker(idx):
+        rng = random.Random(seed + idx)
+        vu = VirtualUser(make_client(), usernames[idx % len(usernames)], password, rng)
+        vu.login()
+        local_lat = defaultdict(list)
+        local_err = defaultdict(int)
+        local_limited = defaultdict(int)
+        while time.perf_counter() < deadline:
+            if max_requests:
+                with lock:
+                    if budget[0] <= 0:
+                        break
+                    budget[0] -= 1
+            entry = rng.choices(TRAFFIC_MIX, weights=weights)[0]
+            start = time.perf_counter()
+            try:
+                status = vu.step(entry)
+            except Exception:
+                status = 599
+            local_lat[entry[2]].append(time.perf_counter() - start)
+            if status == 429:
+                # Rate limiting is the server working as configured, not a failure
+                local_limited[entry[2]] += 1
+            elif status >= 400:
+                local_err[entry[2]] += 1
+        with lock:
+            for k, v in local_lat.items():
+                latencies[k].extend(v)
+            for k, v in local_err.items():
+                errors[k] += v
+            for k, v in local_limited.items():
+                limited[k] += v
+
+    threads = [threading.Thread(target=worker, args=(i,), daemon=True) for i in range(concurrency)]
+    wall_start = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    wall = time.perf_counter() - wall_start
+
+    routes = {}
+    for label, lat in sorted(latencies.items()):
+        stats = summarize(lat, wall)
+        stats['p95_ms'] = round(percentile(sorted(lat), 95) * 1000, 3)
+        stats['errors'] = errors.get(label, 0)
+        stats['rate_limited'] = limited.get(label, 0)
+        routes[label] = stats
+    all_lat = [x for lat in latencies.values() for x in lat]
+    total = summarize(all_lat, wall)
+    total['p95_ms'] = round(percentile(sorted(all_lat), 95) * 1000, 3)
+    total['errors'] = sum(errors.values())
+    total['rate_limited'] = sum(limited.values())
+    return {'total': total, 'routes': routes, 'wall_seconds': round(wall, 2)}
+
+
+def print_report(report):
+    print(f"\n{'route':<36}{'reqs':>8}{'req/s':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'errors':>8}{'429s':>6}")
+    for label, s in list(report['routes'].items()) + [('TOTAL', report['total'])]:
+        print(f"{label:<36}{s['iterations']:>8}{s['ops_per_sec']:>10.1f}{s['p50_ms']:>10.2f}"
+              f"{s['p95_ms']:>10.2f}{s['p99_ms']:>10.2f}{s['errors']:>8}{s['rate_limited']:>6}")
+
+
+def _wait_for_server(base_url, timeout=30):
+    client = HttpClient(base_url)
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            if client.request('GET', '/api/health/')[0] == 200:
+                return True
+        except OSError:
+            pass
+        time.sleep(0.2)
+    return False
+
+
+def serve(port, gemini_latency_ms, workers=0):
+    """Run the stubbed app on a threaded Werkzeug server, or prefork workers."""
+    if workers:
+        sys.path.insert(0, str(BACKEND_DIR))
+        import serve as prefork
+        prefork.configure_environment(workers)
+    app = build_app(gemini_latency_ms)
+    print(f"Stubbed HealthGuard API listening on http://127.0.0.1:{port}", flush=True)
+    if workers:
+        prefork.serve(app, '127.0.0.1', port, workers=workers)
+    else:
+        from werkzeug.serving import make_server
+        make_server('127.0.0.1', port, app, threaded=True).serve_forever()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Load-test the HealthGuard Flask API')
+    parser.add_argument('--mode', choices=('inprocess', 'http'), default='inprocess')
+    parser.add_argument('--base-url', help='Target server for --mode http (default: spawn a stubbed one)')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--serve', action='store_true', help='Only run the stubbed server')
+    parser.add_argument('--workers', type=int, default=0,
+                        help='Stubbed server: prefork worker processes (0 = one threaded dev server)')
+    parser.add_argument('--concurrency', type=int, default=8, help='Concurrent virtual users')
+    parser.add_argument('--duration', type=float, default=20.0, help='Seconds to run')
+    parser.add_argument('--requests', type=int, default=0, help='Stop after this many requests (0 = no cap)')
+    parser.add_argument('--users', type=int, default=200, help='Distinct patient accounts to log in as')
+    parser.add_argument('--password', default='loadtest123')
+    parser.add_argument('--gemini-latency-ms', type=float, default=0.0, help='Simulated Gemini latency')
+    parser.add_argument('--seed', type=int, default=11)
+    parser.add_argument('--output', help='Write the report JSON to this path')
+    parser.add_argument('--verbose', action='store_true', help='Keep per-request INFO logging')
+    args = parser.parse_args(argv)
+
+    if args.serve:
+        serve(args.port, args.gemini_latency_ms, args.workers)
+        return 0
+
+    usernames = [f'patient{i}' for i in range(1, args.users + 1)]
+    server = None
+    if args.mode == 'inprocess':
+        app = build_app(args.gemini_latency_ms)
+        if not args.verbose:
+            logging.getLogger().setLevel(logging.WARNING)
+        make_client = lambda: InProcessClient(app)  # noqa: E731
+        target = 'in-process'
+    else:
+        base_url = args.base_url
+        if not base_url:
+            base_url = f'http://127.0.0.1:{args.port}'
+            env = dict(os.environ)
+            server = subprocess.Popen(
+                [sys.executable, '-m', 'benchmarks.load_test', '--serve', '--port', str(args.port),
+                 '--gemini-latency-ms', str(args.gemini_latency_ms), '--workers', str(args.workers)],
+                cwd=str(BACKEND_DIR), env=env,
+                stdout=subprocess.DEVNULL, stderr=None if args.verbose else subprocess.DEVNULL,
+            )
+        if not _wait_for_server(base_url):
+            print(f"Server at {base_url} did not become healthy")
+            if server:
+                server.terminate()
+            return 1
+        make_client = lambda: HttpClient(base_url)  # noqa: E731
+        target = base_url
+
+    print(f"Running {args.concurrency} virtual users against {target} for {args.duration}s...")
+    try:
+        report = run_load(make_client, usernames, args.password, args.concurrency,
+                          args.duration, args.requests, args.seed)
+    finally:
+        if server:
+            server.terminate()
+            server.wait()
+
+    print_report(report)
+    if args.output:
+        save_results({'benchmark': 'load_test', 'target': target, 'concurrency': args.concurrency,
+                      'environment': environment(), **report}, Path(args.output))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
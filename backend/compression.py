@@ -0,0 +1,126 @@
+"""
+Response compression — negotiated gzip/brotli for JSON and text payloads.
+
+Large lists (medical records, AI consultation histories, metric trends)
+compress 5-10x. Bodies below COMPRESSION_MIN_SIZE are sent as-is. Compressed
+bodies are cached by ETag (or by a digest of the body when there is none), so
+repeat hits on an unchanged payload skip recompression. Streamed responses
+are compressed chunk by chunk; event streams are never touched.
+"""
+
+import gzip
+import hashlib
+import logging
+import os
+import zlib
+
+from flask import request
+
+from api.cache import LRUCache
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+logger = logging.getLogger(__name__)
+
+COMPRESSION_MIN_SIZE = int(os.getenv('COMPRESSION_MIN_SIZE', '1024'))
+COMPRESSION_LEVEL = int(os.getenv('COMPRESSION_LEVEL', '6'))
+BROTLI_QUALITY = int(os.getenv('BROTLI_QUALITY', '5'))
+COMPRESSION_CACHE_SIZE = int(os.getenv('COMPRESSION_CACHE_SIZE', '256'))
+
+COMPRESSIBLE_TYPES = {
+    'application/json', 'text/plain', 'text/html', 'text/css',
+    'application/javascript', 'text/javascript',
+}
+
+_compressed_cache = LRUCache(max_entries=COMPRESSION_CACHE_SIZE)
+
+
+def choose_encoding():
+    """Best encoding the client accepts: 'br' (if available), 'gzip' or None."""
+    accepted = request.accept_encodings
+    if brotli is not None and accepted['br'] > 0:
+        return 'br'
+    if accepted['gzip'] > 0:
+        return 'gzip'
+    return None
+
+
+def compress(body: bytes, encoding: str) -> bytes:
+    if encoding == 'br':
+        return brotli.compress(body, quality=BROTLI_QUALITY)
+    return gzip.compress(body, compresslevel=COMPRESSION_LEVEL, mtime=0)
+
+
+def _compress_stream(chunks, encoding: str):
+    """Compress an iterable of chunks, flushing after each so clients see progress."""
+    if encoding == 'br':
+        compressor = brotli.Compressor(quality=BROTLI_QUALITY)
+        for chunk in chunks:
+            if isinstance(chunk, str):
+                chunk = chunk.encode()
+            out = compressor.process(chunk) + compressor.flush()
+            if out:
+                yield out
+        yield compressor.finish()
+        return
+
+    compressor = zlib.compressobj(COMPRESSION_LEVEL, zlib.DEFLATED, 31)  # 31 = gzip container
+    for chunk in chunks:
+        if isinstance(chunk, str):
+            chunk = chunk.encode()
+        out = compressor.compress(chunk) + compressor.flush(zlib.Z_SYNC_FLUSH)
+        if out:
+            yield out
+    yield compressor.flush()
+
+
+def _should_skip(response) -> bool:
+    return (
+        request.method == 'HEAD'
+        or response.status_code < 200
+        or response.status_code in (204, 206, 304)
+        or 'Content-Encoding' in response.headers
+        or response.mimetype not in COMPRESSIBLE_TYPES
+        or response.direct_passthrough
+    )
+
+
+def compress_response(response):
+    """after_request hook: compress the response if it is worth it."""
+    if _should_skip(response):
+        return response
+    response.vary.add('Accept-Encoding')
+    encoding = choose_encoding()
+    if encoding is None:
+        return response
+
+    if response.is_streamed:
+        response.response = _compress_stream(response.response, encoding)
+        response.headers.pop('Content-Length', None)
+        response.headers['Content-Encoding'] = encoding
+        return response
+
+    body = response.get_data()
+    if len(body) < COMPRESSION_MIN_SIZE:
+        return response
+
+    etag = response.headers.get('ETag')
+    key = (encoding, etag, len(body)) if etag else (encoding, hashlib.sha1(body).digest())
+    compressed = _compressed_cache.get(key)
+    if compressed is None:
+        compressed = compress(body, encoding)
+        _compressed_cache.set(key, compressed)
+
+    response.set_data(compressed)
+    response.headers['Content-Encoding'] = encoding
+    return response
+
+
+def init_compression(app):
+    """Register response compression on a Flask app."""
+    app.after_request(compress_response)
+    logger.info(f"Response compression enabled (gzip{', br' if brotli else ''}, "
+                f"min size {COMPRESSION_MIN_SIZE} bytes)")
@@ -0,0 +1,311 @@
+"""
+Dashboard Summary Service
+Incrementally maintained per-user dashboard counters.
+
+Instead of scanning four collections on every /dashboard/stats/ call, the
+summary is built once from a full scan and then kept current by collection
+listeners. Time-based transitions (an appointment passing `now`, a
+prescription's `valid_until` or a reminder's `end_date` going by) are kept
+in per-counter deadline heaps, expired on read and by a background refresher.
+Each read stats the source files first, so writes by other server processes
+arrive as a 'reload' and trigger a rebuild.
+
+That rebuild is the limit under the prefork server: a 'reload' says only
+that the file changed, not which records, so any write by another worker
+to any of the five source collections costs the next read here a full
+scan of all five. Reads between such writes stay O(1); a write-heavy
+deployment with several workers pays roughly the old per-request scan.
+"""
+
+import heapq
+import logging
+import threading
+from collections import defaultdict
+from datetime import datetime
+
+from api.json_db import (
+    appointments_db, prescriptions_db, medicine_reminders_db,
+    ai_consultations_db, health_metrics_db,
+)
+
+logger = logging.getLogger(__name__)
+
+RECENT_METRICS = 5
+REFRESH_INTERVAL_SECONDS = 60
+
+
+def _now() -> str:
+    return datetime.now().isoformat()
+
+
+def _today() -> str:
+    return datetime.now().date().isoformat()
+
+
+class _DeadlineCounter:
+    """Per-user count of records that stay active until an optional deadline.
+
+    A record is counted while `deadline >= clock()` (deadline None = forever),
+    matching the string comparisons the dashboard has always used.
+    """
+
+    def __init__(self, clock):
+        self.clock = clock
+        self.members = {}
+        self.counts = defaultdict(int)
+        self.deadlines = []
+
+    def put(self, record_id, user_id, deadline=None):
+        self.remove(record_id)
+        if user_id is None:
+            return
+        if deadline is not None and deadline < self.clock():
+            return
+        self.members[record_id] = (user_id, deadline)
+        self.counts[user_id] += 1
+        if deadline is not None:
+            heapq.heappush(self.deadlines, (deadline, record_id, user_id))
+
+    def remove(self, record_id):
+        entry = self.members.pop(record_id, None)
+        if entry is not None:
+            self.counts[entry[0]] -= 1
+
+    def expire(self):
+        """Drop members whose deadline has passed. O(1) when nothing is due."""
+        if not self.deadlines:
+            return
+        now = self.clock()
+        while self.deadlines and self.deadlines[0][0] < now:
+            deadline, record_id, user_id = heapq.heappop(self.deadlines)
+            # Skip heap entries made stale by a later put/remove
+            if self.members.get(record_id) == (user_id, deadline):
+                self.remove(record_id)
+
+    def count(self, user_id) -> int:
+        return self.counts.get(user_id, 0)
+
+    def clear(self):
+        self.members.clear()
+        self.counts.clear()
+        self.deadlines.clear()
+
+
+# ── Record → counter mapping ─────────────────────
+
+def _appointment_entry(r):
+    if r.get('status') not in ('scheduled', 'confirmed'):
+        return None, None
+    return r.get('patient'), r.get('appointment_date', '')
+
+
+def _prescription_entry(r):
+    # Missing or empty valid_until means ongoing
+    return r.get('patient'), r.get('valid_until') or None
+
+
+def _reminder_entry(r):
+    if r.get('is_active') is not True:
+        return None, None
+    # Missing or empty end_date means ongoing
+    return r.get('user'), r.get('end_date') or None
+
+
+def _consultation_entry(r):
+    return r.get('patient'), None
+
+
+def _metric_key(r):
+    # Newest first; ties keep storage (id) order like a stable reverse sort
+    return r.get('recorded_at', ''), -(r.get('id') or 0)
+
+
+class DashboardSummary:
+    """Materialized per-user dashboard counters plus a recent-metrics ring."""
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._build_lock = threading.Lock()
+        self.counters = {
+            'upcoming_appointments': (_DeadlineCounter(_now), _appointment_entry),
+            'active_prescriptions': (_DeadlineCounter(_today), _prescription_entry),
+            'active_reminders': (_DeadlineCounter(_today), _reminder_entry),
+            'total_consultations': (_DeadlineCounter(_now), _consultation_entry),
+        }
+        self.recent = {}
+        self.dirty_recent = {}
+        self._built = False
+        self._building = False
+        self._stale = False
+        self._buffer = []
+
+    # ── Building ─────────────────────────────────
+
+    def _sources(self):
+        return {
+            'upcoming_appointments': appointments_db,
+            'active_prescriptions': prescriptions_db,
+            'active_reminders': medicine_reminders_db,
+            'total_consultations': ai_consultations_db,
+        }
+
+    def build(self):
+        """Full scan of every source collection; events seen meanwhile are replayed."""
+        with self._lock:
+            self._building = True
+            self._stale = False
+            self._buffer = []
+        snapshot = {name: col.get_all() for name, col in self._sources().items()}
+        metrics = health_metrics_db.get_all()
+        with self._lock:
+            for name, (counter, entry) in self.counters.items():
+                counter.clear()
+                for r in snapshot[name]:
+                    counter.put(r.get('id'), *entry(r))
+            by_user = defaultdict(list)
+            for m in metrics:
+                if m.get('user') is not None:
+                    by_user[m['user']].append(m)
+            self.recent = {
+                uid: sorted(rows, key=_metric_key, reverse=True)[:RECENT_METRICS]
+                for uid, rows in by_user.items()
+            }
+            self.dirty_recent = {}
+            for apply, args in self._buffer:
+                apply(*args)
+            self._buffer = []
+            self._building = False
+            # A file restored from backup mid-build means the snapshot may be stale
+            self._built = not self._stale
+        logger.info("Dashboard summary built")
+
+    def ensure_built(self):
+        # A stat of each file surfaces writes by other workers as a 'reload'
+        for col in self._sources().values():
+            col.version_of()
+        health_metrics_db.version_of()
+        if self._built:
+            return
+        with self._build_lock:
+            if not self._built:
+                self.build()
+
+    def invalidate(self):
+        with self._lock:
+            self._built = False
+
+    def _dispatch(self, apply, event, *args):
+        with self._lock:
+            if event == 'reload':
+                self._built = False
+                self._stale = self._building
+                return
+            if self._building:
+                self._buffer.append((apply, (event,) + args))
+            elif self._built:
+                apply(event, *args)
+
+    # ── Listeners ────────────────────────────────
+
+    def counter_listener(self, name):
+        counter, entry = self.counters[name]
+
+        def apply(event, record, previous):
+            if event == 'delete':
+                counter.remove(previous.get('id'))
+            else:
+                counter.put(record.get('id'), *entry(record))
+
+        return lambda event, record, previous: self._dispatch(apply, event, record, previous)
+
+    def _apply_metric(self, event, record, previous):
+        if previous is not None:
+            uid = previous.get('user')
+            ring = self.recent.get(uid, [])
+            if any(m.get('id') == previous.get('id') for m in ring):
+                # A top-N member went away or changed; rescan this user on next read
+                self.dirty_recent[uid] = self.dirty_recent.get(uid, 0) + 1
+        if record is not None and record.get('user') is not None:
+            uid = record['user']
+            ring = [m for m in self.recent.get(uid, []) if m.get('id') != record.get('id')]
+            ring.append(record)
+            ring.sort(key=_metric_key, reverse=True)
+            self.recent[uid] = ring[:RECENT_METRICS]
+
+    def metric_listener(self, event, record, previous):
+        self._dispatch(self._apply_metric, event, record, previous)
+
+    # ── Reads ────────────────────────────────────
+
+    def expire(self):
+        with self._lock:
+            for counter, _ in self.counters.values():
+                counter.expire()
+
+    def _rescan_recent(self, uid):
+        with self._lock:
+            token = self.dirty_recent.get(uid)
+        rows = health_metrics_db.filter(user=uid)
+        rows.sort(key=_metric_key, reverse=True)
+        with self._lock:
+            # Only publish if no further change arrived during the rescan
+            if self.dirty_recent.get(uid) == token:
+                self.recent[uid] = rows[:RECENT_METRICS]
+                self.dirty_recent.pop(uid, None)
+
+    def get(self, uid) -> dict:
+        self.ensure_built()
+        if uid in self.dirty_recent:
+            self._rescan_recent(uid)
+        with self._lock:
+            summary = {}
+            for name, (counter, _) in self.counters.items():
+                counter.expire()
+                summary[name] = counter.count(uid)
+            summary['recent_metrics'] = [dict(m) for m in self.recent.get(uid, [])]
+            return summary
+
+
+dashboard_summary = DashboardSummary()
+
+for _name, _collection in dashboard_summary._sources().items():
+    _collection.add_listener(dashboard_summary.counter_listener(_name))
+health_metrics_db.add_listener(dashboard_summary.metric_listener)
+
+
+def get_dashboard_summary(user_id) -> dict:
+    """O(1) dashboard counters for a user (builds the summary on first use)."""
+    return dashboard_summary.get(user_id)
+
+
+_refresher = None
+
+
+def start_dashboard_refresher(interval: float = REFRESH_INTERVAL_SECONDS):
+    """Start a daemon thread that expires time-based transitions periodically."""
+    global _refresher
+    if _refresher is not None:
+        return _refresher
+    stop = threading.Event()
+
+    def run():
+        while not stop.wait(interval):
+            try:
+                dashboard_summary.expire()
+            except Exception:
+                logger.exception("Dashboard refresher failed")
+
+    _refresher = threading.Thread(target=run, name='dashboard-refresher', daemon=True)
+    _refresher.stop = stop
+    _refresher.start()
+    return _refresher
+
+
+def stop_dashboard_refresher(timeout: float = 5.0):
+    """Stop the refresher thread (e.g. before forking worker processes)."""
+    global _refresher
+    if _refresher is None:
+        return
+    _refresher.stop.set()
+    _refresher.join(timeout)
+    _refresher = None
@@ -0,0 +1,190 @@
+"""
+Event Stream Service
+Per-user push events for /api/events/ (Server-Sent Events).
+
+A relay thread in each worker tails shared storage and publishes to the
+subscribers connected to that worker:
+- new chat messages, from the message store (by id);
+- appointment creates/updates/deletes, from the sync change log;
+- medicine reminders whose reminder_times match the current minute.
+Because it tails storage instead of hooking local writes, changes made by
+other worker processes reach connections held here as well. Local writes
+wake the relay at once; other workers' writes are seen within
+EVENTS_POLL_INTERVAL seconds. Read receipts are pushed by the worker that
+records them. The relay only does work while someone is subscribed.
+
+Each open stream occupies one server thread for as long as the client stays
+connected (Werkzeug has no async I/O), so a worker holds at most
+EVENTS_MAX_STREAMS streams; further connections get 503 and EventSource
+retries, landing on another worker under the prefork server.
+"""
+
+import json
+import logging
+import os
+import threading
+from datetime import datetime
+
+from api.json_db import appointments_db, medicine_reminders_db
+from api.message_store import message_store
+from api.pubsub import Broker, BrokerFull
+from sync_service import change_log
+
+logger = logging.getLogger(__name__)
+
+EVENTS_POLL_INTERVAL = float(os.getenv('EVENTS_POLL_INTERVAL', '0.5'))
+EVENTS_HEARTBEAT = float(os.getenv('EVENTS_HEARTBEAT', '15'))
+EVENTS_QUEUE_SIZE = int(os.getenv('EVENTS_QUEUE_SIZE', '100'))
+EVENTS_MAX_PER_USER = int(os.getenv('EVENTS_MAX_PER_USER', '10'))
+EVENTS_MAX_STREAMS = int(os.getenv('EVENTS_MAX_STREAMS', '100'))
+EVENTS_RETRY_MS = 3000
+
+broker = Broker(queue_size=EVENTS_QUEUE_SIZE, max_per_user=EVENTS_MAX_PER_USER,
+                max_total=EVENTS_MAX_STREAMS)
+_wake = threading.Event()
+
+
+# ── Sources ──────────────────────────────────────
+
+def _relay_messages(users, after: int) -> int:
+    for message in message_store.since(after):
+        for uid in {message['sender'], message['recipient']} & users:
+            broker.publish(uid, 'message', message)
+        after = message['id']
+    return after
+
+
+def _relay_appointments(users, cursor: str) -> str:
+    entries, cursor = change_log.read_since(cursor)
+    if entries is None:
+        return cursor  # log rotated; clients refetch on their next reconnect
+    changed = {}
+    for entry in entries:
+        if entry.get('c') == 'appointments' and users.intersection(entry.get('o', ())):
+            owners, _ = changed.get(entry['id'], (set(), None))
+            changed[entry['id']] = (owners | (users & set(entry['o'])), entry['e'])
+    if changed:
+        current = appointments_db.get_many([i for i, (_, e) in changed.items() if e != 'delete'])
+        for appointment_id, (owners, event) in changed.items():
+            data = {'event': event, 'id': appointment_id, 'appointment': current.get(appointment_id)}
+            for uid in owners:
+                broker.publish(uid, 'appointment', data)
+    return cursor
+
+
+def _relay_reminders(users, last_minute):
+    now = datetime.now()
+    minute = now.strftime('%Y-%m-%dT%H:%M')
+    if minute == last_minute:
+        return last_minute
+    hhmm, today = now.strftime('%H:%M'), now.date().isoformat()
+    for reminder in medicine_reminders_db.filter_in('user', users):
+        if reminder.get('is_active') is not True or hhmm not in (reminder.get('reminder_times') or ()):
+            continue
+        if (reminder.get('start_date') or today) > today or (reminder.get('end_date') or today) < today:
+            continue
+        broker.publish(reminder['user'], 'reminder', {'reminder': reminder, 'due': minute})
+    return minute
+
+
+# ── Relay ────────────────────────────────────────
+
+class EventRelay:
+    """Background thread feeding the broker; started on the first subscription."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._thread = None
+        self._pid = None
+
+    def ensure_running(self):
+        with self._lock:
+            # Threads do not survive fork; each worker starts its own
+            if self._thread is not None and self._thread.is_alive() and self._pid == os.getpid():
+                return
+            self._thread = threading.Thread(target=self._run, name='event-relay', daemon=True)
+            self._pid = os.getpid()
+            self._thread.start()
+
+    def _run(self):
+        cursor = last_message = None
+        last_minute = None
+        while True:
+            _wake.wait(EVENTS_POLL_INTERVAL)
+            _wake.clear()
+            users = broker.users()
+            if not users:
+                # Nobody listening: start from "now" when someone subscribes again
+                cursor = last_message = None
+                continue
+            try:
+                if cursor is None:
+                    cursor, last_message = change_log.cursor(), message_store.latest_id()
+                last_message = _relay_messages(users, last_message)
+                cursor = _relay_appointments(users, cursor)
+                last_minute = _relay_reminders(users, last_minute)
+            except Exception:
+                logger.exception("Event relay failed")
+
+
+relay = EventRelay()
+
+
+def _on_message_store(event, payload):
+    if event == 'message':
+        _wake.set()
+    elif event == 'read':
+        broker.publish(payload['sender'], 'read', payload)
+
+
+def _on_appointment(event, record, previous):
+    if event != 'reload':
+        _wake.set()
+
+
+message_store.add_listener(_on_message_store)
+appointments_db.add_listener(_on_appointment)
+
+
+# ── Streams ──────────────────────────────────────
+
+def _format(event: str, data) -> str:
+    return f'event: {event}\ndata: {json.dumps(data, separators=(",", ":"), default=str)}\n\n'
+
+
+def subscribe(user_id):
+    """A new subscription for `user_id`, or None when they have too many open.
+
+    Raises BrokerFull when this worker already holds EVENTS_MAX_STREAMS streams.
+    """
+    subscription = broker.subscribe(user_id)
+    if subscription is not None:
+        relay.ensure_running()
+    return subscription
+
+
+def event_stream(subscription):
+    """SSE body: events as they arrive, a comment heartbeat while idle."""
+    try:
+        yield f'retry: {EVENTS_RETRY_MS}\n' + _format('ready', {'user': subscription.user_id})
+        while True:
+            try:
+                item = subscription.get(timeout=EVENTS_HEARTBEAT)
+            except EOFError:
+                # Server shutting down; EventSource reconnects to another worker
+                yield _format('reconnect', {})
+                return
+            dropped = subscription.take_dropped()
+            if dropped:
+                # The client fell behind; it should refetch rather than trust the stream
+                yield _format('reset', {'dropped': dropped})
+            yield ': ping\n\n' if item is None else _format(*item)
+    finally:
+        broker.unsubscribe(subscription)
+
+
+def close_streams():
+    """End every open stream in this worker (graceful shutdown)."""
+    if len(broker):
+        logger.info(f"Closing {len(broker)} event streams")
+    broker.close_all()
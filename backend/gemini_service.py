@@ -6,6 +6,8 @@ import os
 import logging
 from typing import Dict, Optional
 
+from api.timing import span
+
 try:
     import google.generativeai as genai
 except ImportError:
@@ -84,6 +86,10 @@ Remember: Your goal is to educate, guide, and support patients while directing t
     def is_configured(self) -> bool:
         return self.model is not None
 
+    def _generate(self, prompt: str):
+        with span('gemini'):
+            return self.model.generate_content(prompt)
+
     def analyze_symptoms(self, symptoms: str, patient_context: Optional[Dict] = None, custom_prompt: Optional[str] = None) -> Dict:
         if not self.is_configured():
             return {'success': False, 'error': 'Gemini AI is not configured.', 'response': None, 'confidence_score': 0.0}
@@ -106,7 +112,7 @@ Patient's Symptoms/Query:
 
 Please provide a comprehensive response following the guidelines above."""
 
-            response = self.model.generate_content(full_prompt)
+            response = self._generate(full_prompt)
 
             confidence_score = 0.7
             if response and hasattr(response, 'text') and response.text:
@@ -149,7 +155,7 @@ Prescription:
 Provide a clear, patient-friendly analysis."""
 
         try:
-            response = self.model.generate_content(prompt)
+            response = self._generate(prompt)
             return {'success': True, 'response': response.text if hasattr(response, 'text') else str(response), 'error': None}
         except Exception as e:
             logger.error(f"Prescription analysis error: {e}")
@@ -172,7 +178,7 @@ Include:
 Keep the language simple and accessible to general audiences. Include relevant disclaimers about seeking professional medical advice."""
 
         try:
-            response = self.model.generate_content(prompt)
+            response = self._generate(prompt)
             return {'success': True, 'response': response.text if hasattr(response, 'text') else str(response), 'error': None}
         except Exception as e:
             logger.error(f"Health education error: {e}")
@@ -3,7 +3,8 @@ Initialize system with default admin account
 Run this once to set up the admin user
 """
 
-from api.json_db import users_db, user_profiles_db, hash_password
+from api.json_db import users_db, user_profiles_db
+from password_service import compute_hash
 
 def create_admin_account():
     """Create default admin account"""
@@ -18,7 +19,7 @@ def create_admin_account():
     admin_user = users_db.create({
         'username': 'admin',
         'email': 'admin@healthguard.local',
-        'password': hash_password('admin123'),
+        'password': compute_hash('admin123'),
         'first_name': 'System',
         'last_name': 'Administrator',
         'is_active': True,
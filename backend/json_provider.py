@@ -0,0 +1,105 @@
+"""
+Flask JSON provider — orjson when installed, stdlib json otherwise.
+
+Used for jsonify() responses and request.get_json() parsing. datetime and
+date values are serialized as ISO 8601 strings with both backends (the old
+`app.json_encoder` hook is ignored by current Flask, which fell back to HTTP
+date strings). Anything orjson cannot encode natively goes through the same
+default() as the stdlib path.
+"""
+
+import dataclasses
+import decimal
+import json
+import logging
+import uuid
+from datetime import date, datetime
+
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+logger = logging.getLogger(__name__)
+
+
+def _default(obj):
+    """Fallback encoder shared by both backends."""
+    if isinstance(obj, (datetime, date)):
+        return obj.isoformat()
+    if isinstance(obj, (decimal.Decimal, uuid.UUID)):
+        return str(obj)
+    if dataclasses.is_dataclass(obj) and not isinstance(obj, type):
+        return dataclasses.asdict(obj)
+    if isinstance(obj, (set, frozenset)):
+        return list(obj)
+    if hasattr(obj, '__html__'):
+        return str(obj.__html__())
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+class FastJSONProvider(DefaultJSONProvider):
+    """DefaultJSONProvider with an orjson fast path for dumps, loads and responses."""
+
+    default = staticmethod(_default)
+
+    @property
+    def backend(self) -> str:
+        return 'orjson' if orjson is not None else 'json'
+
+    def _orjson_options(self, pretty: bool = False) -> int:
+        options = orjson.OPT_NON_STR_KEYS
+        if self.sort_keys:
+            options |= orjson.OPT_SORT_KEYS
+        if pretty:
+            options |= orjson.OPT_INDENT_2
+        return options
+
+    def _orjson_dumps(self, obj, pretty: bool = False):
+        """orjson bytes, or None when orjson is unavailable or rejects the value."""
+        if orjson is None:
+            return None
+        try:
+            return orjson.dumps(obj, default=_default, option=self._orjson_options(pretty))
+        except orjson.JSONEncodeError:
+            # e.g. integers beyond 64 bits; the stdlib handles these
+            return None
+
+    def dumps(self, obj, **kwargs) -> str:
+        # Custom separators/cls/etc. are only honoured by the stdlib path
+        if not kwargs or set(kwargs) <= {'indent', 'sort_keys'}:
+            sort_keys = kwargs.get('sort_keys', self.sort_keys)
+            pretty = bool(kwargs.get('indent'))
+            if sort_keys == self.sort_keys:
+                data = self._orjson_dumps(obj, pretty)
+                if data is not None:
+                    return data.decode()
+        kwargs.setdefault('default', self.default)
+        kwargs.setdefault('ensure_ascii', self.ensure_ascii)
+        kwargs.setdefault('sort_keys', self.sort_keys)
+        return json.dumps(obj, **kwargs)
+
+    def loads(self, s, **kwargs):
+        if orjson is not None and not kwargs:
+            try:
+                return orjson.loads(s)
+            except orjson.JSONDecodeError:
+                # Re-parse with the stdlib for its error message (and NaN/Infinity support)
+                pass
+        return json.loads(s, **kwargs)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        pretty = (self.compact is None and self._app.debug) or self.compact is False
+        data = self._orjson_dumps(obj, pretty)
+        if data is None:
+            return super().response(obj)
+        return self._app.response_class(data + b'\n', mimetype=self.mimetype)
+
+
+def init_json(app):
+    """Install FastJSONProvider as the app's JSON provider."""
+    app.json = FastJSONProvider(app)
+    logger.info(f"JSON provider: {app.json.backend}")
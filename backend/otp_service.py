@@ -11,6 +11,7 @@ from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
 import os
 from api.json_db import JsonCollection
+from api.timing import span
 
 # Email configuration
 SMTP_SERVER = os.getenv('SMTP_SERVER', 'smtp.gmail.com')
@@ -60,11 +61,12 @@ def send_otp_email(email: str, otp: str, name: str = "User") -> bool:
         message.attach(part)
 
         # Send email
-        session = smtplib.SMTP(SMTP_SERVER, SMTP_PORT)
-        session.starttls()
-        session.login(SENDER_EMAIL, SENDER_PASSWORD)
-        session.sendmail(SENDER_EMAIL, email, message.as_string())
-        session.quit()
+        with span('smtp'):
+            session = smtplib.SMTP(SMTP_SERVER, SMTP_PORT)
+            session.starttls()
+            session.login(SENDER_EMAIL, SENDER_PASSWORD)
+            session.sendmail(SENDER_EMAIL, email, message.as_string())
+            session.quit()
 
         return True
     except Exception as e:
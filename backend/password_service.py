@@ -0,0 +1,235 @@
+"""
+Password Hashing Service
+Memory-hard password hashes computed off the request threads.
+
+Passwords are hashed with scrypt (default) or PBKDF2-SHA256 from hashlib,
+in a bounded process pool so a burst of logins cannot pin every request
+thread. At most HASH_MAX_PENDING hashes may be running or queued; beyond
+that callers wait up to HASH_QUEUE_TIMEOUT seconds and then get
+HashingBusyError (the API answers 503), as they do when a hash takes longer
+than HASH_RESULT_TIMEOUT seconds. HASH_WORKERS=0 hashes inline on the
+request thread instead.
+
+Pool workers are spawned with a stand-in __main__, so they import only this
+module rather than re-running the server's entry script (the whole app).
+
+Stored formats:
+    scrypt$<n>$<r>$<p>$<salt hex>$<hash hex>
+    pbkdf2_sha256$<iterations>$<salt hex>$<hash hex>
+    <salt hex>$<sha256 hex>          legacy, verified but never written
+
+Legacy and outdated hashes are upgraded after a successful login.
+"""
+
+import hashlib
+import hmac
+import logging
+import multiprocessing
+import os
+import secrets
+import sys
+import threading
+import types
+from concurrent.futures import Future, ProcessPoolExecutor, TimeoutError
+from concurrent.futures.process import BrokenProcessPool
+
+logger = logging.getLogger(__name__)
+
+PASSWORD_KDF = os.getenv('PASSWORD_KDF', 'scrypt')
+SCRYPT_N = int(os.getenv('SCRYPT_N', str(2 ** 14)))
+SCRYPT_R = int(os.getenv('SCRYPT_R', '8'))
+SCRYPT_P = int(os.getenv('SCRYPT_P', '1'))
+PBKDF2_ITERATIONS = int(os.getenv('PBKDF2_ITERATIONS', '600000'))
+HASH_WORKERS = int(os.getenv('HASH_WORKERS', str(min(4, os.cpu_count() or 1))))
+HASH_MAX_PENDING = int(os.getenv('HASH_MAX_PENDING', str(max(1, HASH_WORKERS) * 4)))
+HASH_QUEUE_TIMEOUT = float(os.getenv('HASH_QUEUE_TIMEOUT', '2'))
+HASH_RESULT_TIMEOUT = float(os.getenv('HASH_RESULT_TIMEOUT', '30'))
+
+KEY_LENGTH = 32
+
+
+class HashingBusyError(RuntimeError):
+    """Too many password hashes in flight; retry shortly."""
+
+
+# ── KDF primitives (run in pool workers) ─────────
+
+def _scrypt(password: str, salt: bytes, n: int, r: int, p: int) -> bytes:
+    return hashlib.scrypt(password.encode(), salt=salt, n=n, r=r, p=p,
+                          maxmem=256 * n * r + 1024 * 1024, dklen=KEY_LENGTH)
+
+
+def _pbkdf2(password: str, salt: bytes, iterations: int) -> bytes:
+    return hashlib.pbkdf2_hmac('sha256', password.encode(), salt, iterations, dklen=KEY_LENGTH)
+
+
+def compute_hash(password: str, algorithm: str = PASSWORD_KDF) -> str:
+    """Hash `password` with the configured KDF (synchronous)."""
+    salt = secrets.token_bytes(16)
+    if algorithm == 'pbkdf2_sha256':
+        digest = _pbkdf2(password, salt, PBKDF2_ITERATIONS)
+        return f'pbkdf2_sha256${PBKDF2_ITERATIONS}${salt.hex()}${digest.hex()}'
+    digest = _scrypt(password, salt, SCRYPT_N, SCRYPT_R, SCRYPT_P)
+    return f'scrypt${SCRYPT_N}${SCRYPT_R}${SCRYPT_P}${salt.hex()}${digest.hex()}'
+
+
+def check_hash(password: str, stored: str) -> bool:
+    """Verify `password` against any supported stored format (synchronous)."""
+    if not isinstance(stored, str):
+        return False
+    parts = stored.split('$')
+    try:
+        if parts[0] == 'scrypt' and len(parts) == 6:
+            n, r, p = int(parts[1]), int(parts[2]), int(parts[3])
+            digest = _scrypt(password, bytes.fromhex(parts[4]), n, r, p)
+            return hmac.compare_digest(digest.hex(), parts[5])
+        if parts[0] == 'pbkdf2_sha256' and len(parts) == 4:
+            digest = _pbkdf2(password, bytes.fromhex(parts[2]), int(parts[1]))
+            return hmac.compare_digest(digest.hex(), parts[3])
+        if len(parts) == 2:
+            salt, hashed = parts
+            return hmac.compare_digest(hashlib.sha256(f'{salt}{password}'.encode()).hexdigest(), hashed)
+    except ValueError:
+        pass
+    return False
+
+
+def needs_rehash(stored: str) -> bool:
+    """True for legacy hashes and hashes weaker than the current settings."""
+    parts = (stored or '').split('$')
+    try:
+        if PASSWORD_KDF == 'pbkdf2_sha256':
+            return not (parts[0] == 'pbkdf2_sha256' and len(parts) == 4
+                        and int(parts[1]) >= PBKDF2_ITERATIONS)
+        return not (parts[0] == 'scrypt' and len(parts) == 6
+                    and (int(parts[1]), int(parts[2]), int(parts[3])) >= (SCRYPT_N, SCRYPT_R, SCRYPT_P))
+    except ValueError:
+        return True
+
+
+# ── Bounded pool ─────────────────────────────────
+
+class PasswordHasher:
+    """Runs KDF work in a process pool with a cap on hashes in flight."""
+
+    def __init__(self, workers: int = HASH_WORKERS, max_pending: int = HASH_MAX_PENDING,
+                 queue_timeout: float = HASH_QUEUE_TIMEOUT, result_timeout: float = HASH_RESULT_TIMEOUT):
+        if max_pending < 1:
+            raise ValueError('HASH_MAX_PENDING must be at least 1')
+        self.workers = workers
+        self.queue_timeout = queue_timeout
+        self.result_timeout = result_timeout
+        self._slots = threading.BoundedSemaphore(max_pending)
+        self._lock = threading.Lock()
+        self._pool = None
+        self._pid = None
+
+    def _executor(self, broken=None):
+        # Pools do not survive fork; each worker process builds its own
+        with self._lock:
+            if self._pool is not None and self._pool is broken:
+                logger.warning("Password hashing pool broke; starting a new one")
+                self._pool.shutdown(wait=False, cancel_futures=True)
+                self._pool = None
+            if self._pool is None or self._pid != os.getpid():
+                # spawn: forking a threaded server process is unsafe
+                self._pool = ProcessPoolExecutor(
+                    max_workers=self.workers, mp_context=multiprocessing.get_context('spawn'))
+                self._pid = os.getpid()
+                self._start_workers(self._pool)
+            return self._pool
+
+    def _start_workers(self, pool):
+        """Launch every worker now, while __main__ is a stand-in.
+
+        Spawned children re-import the parent's __main__ (app.py or serve.py)
+        before running any task; an empty one leaves them with just this
+        module. The swap lasts only while the processes are created.
+        """
+        real_main = sys.modules['__main__']
+        sys.modules['__main__'] = types.ModuleType('__main__')
+        try:
+            started = [pool.submit(os.getpid) for _ in range(self.workers)]
+        finally:
+            sys.modules['__main__'] = real_main
+        for future in started:
+            future.result()
+
+    def _result(self, future):
+        try:
+            return future.result(timeout=self.result_timeout)
+        except TimeoutError:
+            logger.error(f"Password hash took longer than {self.result_timeout:g}s")
+            raise HashingBusyError('Password hashing timed out') from None
+
+    def submit(self, fn, *args):
+        """Submit KDF work, waiting for a free slot; raises HashingBusyError."""
+        if not self._slots.acquire(timeout=self.queue_timeout):
+            logger.warning("Password hashing pool saturated")
+            raise HashingBusyError('Password hashing is busy')
+        try:
+            if self.workers > 0:
+                executor = self._executor()
+                try:
+                    future = executor.submit(fn, *args)
+                except BrokenProcessPool:
+                    # A worker died (e.g. OOM-killed); replace the pool once
+                    future = self._executor(broken=executor).submit(fn, *args)
+            else:
+                # HASH_WORKERS=0: hash inline on the calling thread
+                future = Future()
+                future.set_result(fn(*args))
+        except BaseException:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda _: self._slots.release())
+        return future
+
+    def hash(self, password: str) -> str:
+        return self._result(self.submit(compute_hash, password, PASSWORD_KDF))
+
+    def verify(self, password: str, stored: str) -> bool:
+        if not isinstance(stored, str) or not stored:
+            return False
+        if stored.count('$') == 1:
+            # Legacy SHA-256 is cheap; not worth a round trip to the pool
+            return check_hash(password, stored)
+        return self._result(self.submit(check_hash, password, stored))
+
+    def rehash_later(self, password: str, on_done):
+        """Compute a fresh hash in the background and pass it to on_done(new_hash)."""
+        try:
+            future = self.submit(compute_hash, password, PASSWORD_KDF)
+        except HashingBusyError:
+            return  # try again on the next login
+
+        def done(f):
+            try:
+                on_done(f.result())
+            except Exception:
+                logger.exception("Password rehash failed")
+        future.add_done_callback(done)
+
+    def warm(self):
+        """Start the pool's worker processes now instead of on the first login."""
+        if self.workers > 0:
+            self._executor()
+
+    def shutdown(self, wait: bool = False):
+        with self._lock:
+            if self._pool is not None:
+                self._pool.shutdown(wait=wait, cancel_futures=True)
+                self._pool = None
+
+
+password_hasher = PasswordHasher()
+
+
+def hash_password(password: str) -> str:
+    """Hash a password for storage (runs in the hashing pool)."""
+    return password_hasher.hash(password)
+
+
+def verify_password(password: str, stored_hash: str) -> bool:
+    """Check a password against its stored hash (runs in the hashing pool)."""
+    return password_hasher.verify(password, stored_hash)
@@ -0,0 +1,291 @@
+"""
+Profiling endpoints — live stacks from a running worker, without a restart.
+
+POST /api/debug/profile/ samples every thread's stack via
+sys._current_frames() from a background thread for `seconds` (default 5)
+every `interval_ms` (default 5) and returns the collapsed stacks (one
+"root;...;leaf count" line per distinct stack, as consumed by flamegraph.pl
+and speedscope) plus the top functions by self and total samples. Threads
+parked in select/accept/wait are skipped unless include_idle is set.
+?format=collapsed returns the collapsed stacks as plain text. The sampler
+needs the GIL to run, so frames that release it (file and socket I/O,
+os.stat) tend to be over-represented.
+
+POST /api/debug/profile/requests/ {"route": "/api/prescriptions/", "count": 5}
+runs cProfile on the next `count` requests whose path or URL rule matches;
+GET on the same URL returns the merged statistics once they are captured
+(?format=pstats for a file snakeviz/pstats can load), DELETE cancels.
+
+Both profile only the worker process that serves the call. Platform admins only.
+"""
+
+import cProfile
+import io
+import logging
+import marshal
+import os
+import pstats
+import sys
+import threading
+import time
+from collections import Counter
+
+from flask import Blueprint, Response, jsonify, request
+
+from auth import admin_required
+
+logger = logging.getLogger(__name__)
+
+profiler_bp = Blueprint('profiler', __name__)
+
+PROFILE_MAX_SECONDS = float(os.getenv('PROFILE_MAX_SECONDS', '60'))
+PROFILE_MAX_REQUESTS = int(os.getenv('PROFILE_MAX_REQUESTS', '100'))
+TOP_FUNCTIONS = 30
+SORT_KEYS = ('cumulative', 'tottime', 'calls')
+
+# Leaf frames of threads that are waiting for work rather than doing it
+IDLE_FRAMES = {
+    ('selectors.py', 'select'), ('socketserver.py', 'serve_forever'),
+    ('socket.py', 'accept'), ('socket.py', 'readinto'),
+    ('threading.py', 'wait'), ('threading.py', '_wait_for_tstate_lock'),
+    ('queue.py', 'get'), ('thread.py', '_worker'),
+}
+
+
+def _label(code) -> str:
+    return f'{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})'
+
+
+# ── Stack sampling ───────────────────────────────
+
+class StackSampler:
+    """Collects stack samples of every other thread in this process."""
+
+    def __init__(self, interval: float = 0.005, include_idle: bool = False):
+        self.interval = interval
+        self.include_idle = include_idle
+        self.stacks = Counter()
+        self.samples = 0
+        self.idle = 0
+        self.duration = 0.0
+
+    def _sample(self, skip):
+        for thread_id, frame in sys._current_frames().items():
+            if thread_id in skip:
+                continue
+            code = frame.f_code
+            if not self.include_idle and (os.path.basename(code.co_filename), code.co_name) in IDLE_FRAMES:
+                self.idle += 1
+                continue
+            labels = []
+            while frame is not None:
+                labels.append(_label(frame.f_code))
+                frame = frame.f_back
+            self.stacks[';'.join(reversed(labels))] += 1
+            self.samples += 1
+
+    def run(self, seconds: float) -> 'StackSampler':
+        """Sample from a dedicated thread for `seconds`; blocks until done."""
+        caller = threading.get_ident()
+
+        def loop():
+            skip = {caller, threading.get_ident()}
+            start = time.perf_counter()
+            deadline = start + seconds
+            while time.perf_counter() < deadline:
+                self._sample(skip)
+                time.sleep(self.interval)
+            self.duration = time.perf_counter() - start
+
+        sampler = threading.Thread(target=loop, name='stack-sampler', daemon=True)
+        sampler.start()
+        sampler.join()
+        return self
+
+    def collapsed(self) -> str:
+        return ''.join(f'{stack} {count}\n' for stack, count in self.stacks.most_common())
+
+    def top(self, n: int = TOP_FUNCTIONS) -> dict:
+        """Functions by self samples (leaf) and total samples (anywhere on the stack)."""
+        self_counts, total_counts = Counter(), Counter()
+        for stack, count in self.stacks.items():
+            frames = stack.split(';')
+            self_counts[frames[-1]] += count
+            for name in set(frames):
+                total_counts[name] += count
+
+        def rows(counts):
+            return [{'function': name, 'samples': count,
+                     'percent': round(100.0 * count / self.samples, 2) if self.samples else 0}
+                    for name, count in counts.most_common(n)]
+        return {'self': rows(self_counts), 'total': rows(total_counts)}
+
+
+_sampling_lock = threading.Lock()
+
+
+# ── Request profiling ────────────────────────────
+
+class RequestProfiler:
+    """cProfile for the next N requests matching a route."""
+
+    ENVIRON_KEY = 'healthguard.cprofile'
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.route = None
+        self.method = None
+        self.remaining = 0
+        self.requested = 0
+        self.profiles = []
+        self.armed_at = None
+
+    def arm(self, route: str, count: int, method=None):
+        with self._lock:
+            self.route = route
+            self.method = method
+            self.remaining = self.requested = count
+            self.profiles = []
+            self.armed_at = time.time()
+
+    def cancel(self):
+        with self._lock:
+            self.route = None
+            self.remaining = self.requested = 0
+            self.profiles = []
+
+    def _matches(self) -> bool:
+        if self.method and request.method != self.method:
+            return False
+        rule = request.url_rule.rule if request.url_rule is not None else None
+        return self.route in (request.path, rule)
+
+    def start(self):
+        if not self.remaining:
+            return
+        with self._lock:
+            if not self.remaining or not self._matches():
+                return
+            self.remaining -= 1
+        profile = cProfile.Profile()
+        try:
+            profile.enable()
+        except ValueError:
+            # Python 3.12+ allows one active profiler per process; catch the next request
+            with self._lock:
+                self.remaining += 1
+            return
+        request.environ[self.ENVIRON_KEY] = profile
+
+    def finish(self):
+        profile = request.environ.pop(self.ENVIRON_KEY, None)
+        if profile is None:
+            return
+        profile.disable()
+        with self._lock:
+            self.profiles.append(profile)
+        logger.info(f"Profiled {request.method} {request.path} for the request profiler")
+
+    def status(self) -> dict:
+        with self._lock:
+            return {
+                'route': self.route, 'method': self.method, 'requested': self.requested,
+                'captured': len(self.profiles), 'pending': self.remaining,
+                'armed_at': self.armed_at,
+            }
+
+    def stats(self):
+        with self._lock:
+            profiles = list(self.profiles)
+        if not profiles:
+            return None
+        stats = pstats.Stats(profiles[0], stream=io.StringIO())
+        for profile in profiles[1:]:
+            stats.add(profile)
+        return stats
+
+
+request_profiler = RequestProfiler()
+
+
+@profiler_bp.before_app_request
+def _start_request_profile():
+    request_profiler.start()
+
+
+@profiler_bp.teardown_app_request
+def _finish_request_profile(exc):
+    request_profiler.finish()
+
+
+# ── Routes ───────────────────────────────────────
+
+def _number(data, name, default, cast=float):
+    try:
+        return cast(data.get(name, default))
+    except (TypeError, ValueError):
+        return default
+
+
+@profiler_bp.route('/debug/profile/', methods=['POST'])
+@admin_required
+def sample_profile():
+    data = request.get_json(silent=True) or request.args
+    seconds = min(max(_number(data, 'seconds', 5.0), 0.1), PROFILE_MAX_SECONDS)
+    interval = max(_number(data, 'interval_ms', 5.0), 1.0) / 1000
+    include_idle = str(data.get('include_idle', '')).lower() in ('1', 'true', 'yes')
+
+    if not _sampling_lock.acquire(blocking=False):
+        return jsonify({'error': 'Conflict', 'detail': 'A profile is already being sampled'}), 409
+    try:
+        logger.info(f"Sampling stacks for {seconds}s every {interval * 1000:.0f}ms")
+        sampler = StackSampler(interval, include_idle).run(seconds)
+    finally:
+        _sampling_lock.release()
+
+    if request.args.get('format') == 'collapsed':
+        return Response(sampler.collapsed(), mimetype='text/plain')
+    return jsonify({
+        'pid': os.getpid(),
+        'seconds': round(sampler.duration, 3),
+        'interval_ms': interval * 1000,
+        'samples': sampler.samples,
+        'idle_samples': sampler.idle,
+        'top': sampler.top(),
+        'collapsed': sampler.collapsed(),
+    }), 200
+
+
+@profiler_bp.route('/debug/profile/requests/', methods=['GET', 'POST', 'DELETE'])
+@admin_required
+def request_profile():
+    if request.method == 'DELETE':
+        request_profiler.cancel()
+        return jsonify(request_profiler.status()), 200
+
+    if request.method == 'POST':
+        data = request.get_json(silent=True) or {}
+        route = data.get('route')
+        if not isinstance(route, str) or not route.startswith('/'):
+            return jsonify({'error': 'Invalid request', 'detail': 'route must be a path such as /api/prescriptions/'}), 400
+        count = min(max(_number(data, 'count', 1, int), 1), PROFILE_MAX_REQUESTS)
+        method = str(data['method']).upper() if data.get('method') else None
+        request_profiler.arm(route, count, method)
+        logger.info(f"Request profiler armed for {count} requests to {route}")
+        return jsonify(request_profiler.status()), 202
+
+    status = request_profiler.status()
+    stats = request_profiler.stats()
+    if stats is None:
+        return jsonify(status), 200
+    if request.args.get('format') == 'pstats':
+        # The format pstats.Stats(path) and snakeviz load
+        return Response(marshal.dumps(stats.stats), mimetype='application/octet-stream',
+                        headers={'Content-Disposition': 'attachment; filename="requests.pstats"'})
+    buffer = io.StringIO()
+    stats.stream = buffer
+    sort = request.args.get('sort', 'cumulative')
+    stats.sort_stats(sort if sort in SORT_KEYS else 'cumulative').print_stats(TOP_FUNCTIONS * 2)
+    status['pid'] = os.getpid()
+    status['report'] = buffer.getvalue()
+    return jsonify(status), 200
@@ -0,0 +1,243 @@
+"""
+Rate limiting — sliding-window counters with bounded memory.
+
+Each key keeps three integers (window index, hits in the current window,
+hits in the previous one); the previous window's count is weighted by how
+much of it still overlaps the sliding window. Checks are O(1).
+
+Backends:
+- memory (default): per-process LRU capped at RATE_LIMIT_MAX_KEYS keys.
+- sqlite: a shared database file, so every worker process enforces the
+  same limits. Select with RATE_LIMIT_BACKEND=sqlite.
+
+Use the rate_limit() decorator on any route, or a RateLimiter directly.
+"""
+
+import functools
+import logging
+import math
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict, namedtuple
+from typing import Callable, Optional
+
+from flask import jsonify, make_response, request
+
+from api.json_db import DATA_DIR
+
+logger = logging.getLogger(__name__)
+
+RATE_LIMIT_BACKEND = os.getenv('RATE_LIMIT_BACKEND', 'memory')
+RATE_LIMIT_MAX_KEYS = int(os.getenv('RATE_LIMIT_MAX_KEYS', '100000'))
+RATE_LIMIT_SQLITE_PATH = os.getenv('RATE_LIMIT_SQLITE_PATH', str(DATA_DIR / '_ratelimit.sqlite3'))
+
+RateLimitResult = namedtuple('RateLimitResult', 'allowed remaining retry_after')
+
+
+def _advance(state, index):
+    """Roll a (window index, count, previous count) state forward to `index`."""
+    if state is None:
+        return index, 0, 0
+    stored, count, previous = state
+    if stored == index:
+        return state
+    if stored == index - 1:
+        return index, 0, count
+    return index, 0, 0
+
+
+def _estimate(count, previous, elapsed_fraction) -> float:
+    return previous * (1.0 - elapsed_fraction) + count
+
+
+def _retry_after(count, previous, elapsed, window, limit) -> int:
+    """Seconds until one more hit would be allowed."""
+    if count < limit and previous:
+        # Still in this window, once enough of the previous window slides out
+        wait = window * (1.0 - (limit - count - 1) / previous) - elapsed
+    else:
+        # Next window, once enough of this window slides out
+        wait = window - elapsed + (window * (1.0 - (limit - 1) / count) if count else 0)
+    return max(1, math.ceil(wait))
+
+
+# ── Backends ─────────────────────────────────────
+
+class MemoryBackend:
+    """Per-process counters with LRU eviction beyond max_keys."""
+
+    def __init__(self, max_keys: int = RATE_LIMIT_MAX_KEYS):
+        self.max_keys = max_keys
+        self._states: 'OrderedDict[str, tuple]' = OrderedDict()
+        self._lock = threading.Lock()
+
+    def update(self, key: str, fn: Callable[[Optional[tuple]], tuple], expires: float = 0):
+        """Atomically replace the state of `key` with fn(old state); returns fn's result."""
+        with self._lock:
+            state, result = fn(self._states.get(key))
+            self._states[key] = state
+            self._states.move_to_end(key)
+            while len(self._states) > self.max_keys:
+                self._states.popitem(last=False)
+            return result
+
+    def reset(self, key: str):
+        with self._lock:
+            self._states.pop(key, None)
+
+    def __len__(self) -> int:
+        return len(self._states)
+
+
+class SQLiteBackend:
+    """Counters in a shared SQLite file, consistent across worker processes."""
+
+    PURGE_EVERY = 1000
+
+    def __init__(self, path: str = RATE_LIMIT_SQLITE_PATH):
+        self.path = path
+        self._local = threading.local()
+        self._updates = 0
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with self._connect() as conn:
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS rate_limits ('
+                ' key TEXT PRIMARY KEY, window INTEGER, count INTEGER, previous INTEGER,'
+                ' expires REAL)'
+            )
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            self._local.conn = conn
+        return conn
+
+    def update(self, key: str, fn: Callable[[Optional[tuple]], tuple], expires: float = 0):
+        conn = self._connect()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            row = conn.execute(
+                'SELECT window, count, previous FROM rate_limits WHERE key = ?', (key,)
+            ).fetchone()
+            state, result = fn(tuple(row) if row else None)
+            conn.execute(
+                'INSERT OR REPLACE INTO rate_limits (key, window, count, previous, expires)'
+                ' VALUES (?, ?, ?, ?, ?)', (key, *state, expires),
+            )
+            self._updates += 1
+            if self._updates % self.PURGE_EVERY == 0:
+                # Keys idle for two windows carry no information
+                conn.execute('DELETE FROM rate_limits WHERE expires < ?', (time.time(),))
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+        return result
+
+    def reset(self, key: str):
+        self._connect().execute('DELETE FROM rate_limits WHERE key = ?', (key,))
+
+
+_default_backend = None
+_backend_lock = threading.Lock()
+
+
+def default_backend():
+    """Backend chosen by RATE_LIMIT_BACKEND (created on first use)."""
+    global _default_backend
+    with _backend_lock:
+        if _default_backend is None:
+            if RATE_LIMIT_BACKEND == 'sqlite':
+                _default_backend = SQLiteBackend()
+                logger.info(f"Rate limiter using shared SQLite backend at {RATE_LIMIT_SQLITE_PATH}")
+            else:
+                _default_backend = MemoryBackend()
+        return _default_backend
+
+
+# ── Limiter ──────────────────────────────────────
+
+class RateLimiter:
+    """At most `limit` hits per key in any sliding `window` seconds."""
+
+    def __init__(self, limit: int, window: float, scope: str = 'default', backend=None):
+        self.limit = limit
+        self.window = window
+        self.scope = scope
+        self._backend = backend
+
+    @property
+    def backend(self):
+        return self._backend if self._backend is not None else default_backend()
+
+    def _apply(self, key: str, cost: int) -> RateLimitResult:
+        now = time.time()
+        index = int(now // self.window)
+        elapsed = now - index * self.window
+
+        def fn(state):
+            state = _advance(state, index)
+            _, count, previous = state
+            used = _estimate(count, previous, elapsed / self.window)
+            # check() (cost 0) asks whether one more hit would fit
+            if used + max(cost, 1) > self.limit:
+                return state, RateLimitResult(False, 0, _retry_after(count, previous, elapsed, self.window, self.limit))
+            state = (index, count + cost, previous)
+            remaining = max(0, int(self.limit - used - cost))
+            return state, RateLimitResult(True, remaining, 0)
+
+        return self.backend.update(f'{self.scope}:{key}', fn, expires=now + 2 * self.window)
+
+    def hit(self, key: str, cost: int = 1) -> RateLimitResult:
+        """Count a hit if it fits under the limit."""
+        return self._apply(key, cost)
+
+    def check(self, key: str) -> RateLimitResult:
+        """Whether a hit would be allowed now, without counting one."""
+        return self._apply(key, 0)
+
+    def reset(self, key: str):
+        self.backend.reset(f'{self.scope}:{key}')
+
+
+def client_ip() -> str:
+    return request.remote_addr or 'unknown'
+
+
+def rate_limit(limit: int, window: float, key: Callable[[], str] = client_ip,
+               scope: Optional[str] = None, methods=None, backend=None,
+               error: str = 'Too many requests'):
+    """Decorator limiting a route to `limit` requests per `window` seconds per key.
+
+    `key()` identifies the caller (client IP by default; e.g. a username read
+    from the body for login). Requests over the limit get 429 with Retry-After.
+    `methods` restricts counting to some HTTP methods.
+    """
+    def decorator(f):
+        limiter = RateLimiter(limit, window, scope or f.__name__, backend)
+
+        @functools.wraps(f)
+        def wrapper(*args, **kwargs):
+            if methods and request.method not in methods:
+                return f(*args, **kwargs)
+            result = limiter.hit(key())
+            if not result.allowed:
+                logger.warning(f"Rate limit exceeded for {limiter.scope} from {request.remote_addr}")
+                response = make_response(jsonify({
+                    'error': error,
+                    'detail': f'Please try again in {result.retry_after} seconds.'
+                }), 429)
+                response.headers['Retry-After'] = str(result.retry_after)
+            else:
+                response = make_response(f(*args, **kwargs))
+            response.headers['X-RateLimit-Limit'] = str(limit)
+            response.headers['X-RateLimit-Remaining'] = str(result.remaining)
+            return response
+
+        wrapper.limiter = limiter
+        return wrapper
+    return decorator
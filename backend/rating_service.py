@@ -0,0 +1,232 @@
+"""
+Rating Service
+Incrementally maintained per-doctor rating aggregates and a ranked leaderboard.
+
+Each doctor's aggregate holds the review count, rating sum, a 1–5
+histogram and a recency-weighted sum. Aggregates are built from one full
+scan of doctor_reviews and then adjusted by the delta of every create,
+update and delete, so rating displays never touch raw reviews.
+
+Recency weighting uses forward decay: a review written at time t weighs
+2 ** ((t - epoch) / RATING_HALF_LIFE_DAYS). A review's weight never changes
+after it is written, so the weighted mean only moves when reviews do, yet
+a review one half-life older than another counts half as much.
+
+The leaderboard is kept sorted by a Bayesian average (RATING_PRIOR_WEIGHT
+phantom reviews of RATING_PRIOR_MEAN), so a single 5-star review does not
+outrank a hundred 4.8s.
+
+Under the prefork server a review written by another worker arrives only
+as a 'reload' of doctor_reviews, with no record attached, so the next read
+here rebuilds every aggregate from a full scan. Many workers and frequent
+reviews bring back roughly the per-request scan this index replaced.
+"""
+
+import heapq
+import logging
+import os
+import threading
+from bisect import bisect_left, insort
+from datetime import datetime
+from typing import Callable, List, Optional
+
+from api.json_db import doctor_reviews_db
+
+logger = logging.getLogger(__name__)
+
+RATING_HALF_LIFE_DAYS = float(os.getenv('RATING_HALF_LIFE_DAYS', '180'))
+RATING_PRIOR_MEAN = float(os.getenv('RATING_PRIOR_MEAN', '3.5'))
+RATING_PRIOR_WEIGHT = float(os.getenv('RATING_PRIOR_WEIGHT', '5'))
+DECAY_EPOCH = datetime(2024, 1, 1)
+LEADERBOARD_SORTS = ('score', 'recent', 'count')
+
+
+def _rating(record) -> Optional[int]:
+    try:
+        rating = int(record.get('rating'))
+    except (TypeError, ValueError):
+        return None
+    return rating if 1 <= rating <= 5 else None
+
+
+def _tiebreak(doctor) -> tuple:
+    """Orders doctor ids of any JSON type without ever comparing across types."""
+    if isinstance(doctor, int) and not isinstance(doctor, bool):
+        return 0, doctor, ''
+    return 1, 0, f'{type(doctor).__name__}:{doctor!r}'
+
+
+def _weight(record) -> float:
+    try:
+        written = datetime.fromisoformat(str(record.get('created_at')))
+    except ValueError:
+        written = DECAY_EPOCH
+    if written.tzinfo is not None:
+        written = written.astimezone().replace(tzinfo=None)
+    return 2.0 ** ((written - DECAY_EPOCH).total_seconds() / 86400 / RATING_HALF_LIFE_DAYS)
+
+
+class _Aggregate:
+    """Running totals for one doctor."""
+
+    __slots__ = ('count', 'total', 'histogram', 'weighted', 'weights')
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0
+        self.histogram = [0] * 5
+        self.weighted = 0.0
+        self.weights = 0.0
+
+    def apply(self, rating: int, weight: float, sign: int):
+        self.count += sign
+        self.total += sign * rating
+        self.histogram[rating - 1] += sign
+        self.weighted += sign * rating * weight
+        self.weights += sign * weight
+
+    def score(self) -> float:
+        return (self.total + RATING_PRIOR_MEAN * RATING_PRIOR_WEIGHT) / (self.count + RATING_PRIOR_WEIGHT)
+
+    def summary(self, doctor) -> dict:
+        return {
+            'doctor': doctor,
+            'count': self.count,
+            'average': round(self.total / self.count, 2) if self.count else None,
+            'recent_average': round(self.weighted / self.weights, 2) if self.weights > 0 else None,
+            'score': round(self.score(), 3),
+            'histogram': {str(stars): n for stars, n in enumerate(self.histogram, 1)},
+        }
+
+
+class RatingIndex:
+    """Per-doctor aggregates plus the doctors sorted by score."""
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._build_lock = threading.Lock()
+        self.aggregates = {}
+        self.members = {}
+        self.ranking = []  # (-score, -count, _tiebreak(doctor), doctor), ascending = best first
+        self._keys = {}
+        self._built = False
+        self._building = False
+        self._stale = False
+        self._buffer = []
+
+    # ── Maintenance ──────────────────────────────
+
+    def _rerank(self, doctor):
+        old = self._keys.pop(doctor, None)
+        if old is not None:
+            i = bisect_left(self.ranking, old)
+            if i < len(self.ranking) and self.ranking[i] == old:
+                del self.ranking[i]
+        aggregate = self.aggregates.get(doctor)
+        if aggregate is None or aggregate.count <= 0:
+            self.aggregates.pop(doctor, None)
+            return
+        key = (-aggregate.score(), -aggregate.count, _tiebreak(doctor), doctor)
+        insort(self.ranking, key)
+        self._keys[doctor] = key
+
+    def _remove(self, review_id):
+        member = self.members.pop(review_id, None)
+        if member is None:
+            return
+        doctor, rating, weight = member
+        self.aggregates[doctor].apply(rating, weight, -1)
+        self._rerank(doctor)
+
+    def _put(self, record):
+        review_id = record.get('id')
+        self._remove(review_id)
+        doctor, rating = record.get('doctor'), _rating(record)
+        if doctor is None or rating is None or isinstance(doctor, (dict, list)):
+            return
+        weight = _weight(record)
+        self.aggregates.setdefault(doctor, _Aggregate()).apply(rating, weight, 1)
+        self.members[review_id] = (doctor, rating, weight)
+        self._rerank(doctor)
+
+    def _apply(self, event, record, previous):
+        if event == 'delete':
+            self._remove(previous.get('id'))
+        else:
+            self._put(record)
+
+    def listener(self, event, record, previous):
+        with self._lock:
+            if event == 'reload':
+                self._built = False
+                self._stale = self._building
+            elif self._building:
+                self._buffer.append((event, record, previous))
+            elif self._built:
+                self._apply(event, record, previous)
+
+    def build(self):
+        """Full scan of reviews; events seen meanwhile are replayed."""
+        with self._lock:
+            self._building = True
+            self._stale = False
+            self._buffer = []
+        records = doctor_reviews_db.get_all(fields=('id', 'doctor', 'rating', 'created_at'))
+        with self._lock:
+            self.aggregates.clear()
+            self.members.clear()
+            self.ranking = []
+            self._keys.clear()
+            for record in records:
+                self._put(record)
+            for args in self._buffer:
+                self._apply(*args)
+            self._buffer = []
+            self._building = False
+            self._built = not self._stale
+        logger.info(f"Rating index built: {len(self.members)} reviews, {len(self.aggregates)} doctors")
+
+    def ensure_built(self):
+        # A stat of the file surfaces writes by other workers as a 'reload'
+        doctor_reviews_db.version_of()
+        if self._built:
+            return
+        with self._build_lock:
+            if not self._built:
+                self.build()
+
+    # ── Reads ────────────────────────────────────
+
+    def summary(self, doctor) -> dict:
+        self.ensure_built()
+        with self._lock:
+            return (self.aggregates.get(doctor) or _Aggregate()).summary(doctor)
+
+    def leaderboard(self, limit: int = 10, sort: str = 'score', min_reviews: int = 1,
+                    include: Optional[Callable[[object], bool]] = None) -> List[dict]:
+        """Top `limit` doctors by 'score' (Bayesian average), 'recent' or 'count'."""
+        self.ensure_built()
+        with self._lock:
+            if sort == 'score':
+                # Already in order: walk until enough doctors pass the filters
+                top = []
+                for _, negative_count, _, doctor in self.ranking:
+                    if len(top) == limit:
+                        break
+                    if -negative_count >= min_reviews and (include is None or include(doctor)):
+                        top.append(doctor)
+            else:
+                candidates = (
+                    (doctor, a) for doctor, a in self.aggregates.items()
+                    if a.count >= min_reviews and (include is None or include(doctor))
+                )
+                if sort == 'recent':
+                    key = lambda item: (item[1].weighted / item[1].weights if item[1].weights > 0 else 0, item[1].count)
+                else:
+                    key = lambda item: (item[1].count, item[1].score())
+                top = [doctor for doctor, _ in heapq.nlargest(limit, candidates, key=key)]
+            return [dict(self.aggregates[d].summary(d), rank=i) for i, d in enumerate(top, 1)]
+
+
+rating_index = RatingIndex()
+doctor_reviews_db.add_listener(rating_index.listener)
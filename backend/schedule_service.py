@@ -0,0 +1,344 @@
+"""
+Schedule Service
+Per-doctor and per-patient appointment timelines for conflict checks and
+range queries.
+
+Every active appointment (scheduled or confirmed, with a parseable
+appointment_date) is an interval [start, start + duration). Each doctor and
+each patient has a timeline of these intervals sorted by start, so "does
+this booking overlap?" and "what is on this doctor's calendar this week?"
+are a binary search plus a scan of the hits instead of a pass over every
+appointment. Timelines are built from one full scan and then kept current
+by appointments_db listeners; a write by another process (a 'reload')
+triggers a rebuild on next use.
+
+Open slots are a doctor's working hours (their profile's working_hours,
+or DEFAULT_WORKING_DAYS/DEFAULT_WORKING_HOURS) minus the busy intervals of
+their timeline, walked window by window.
+
+Under the prefork server a 'reload' carries no records, so every
+appointment written by another worker costs the next query here a full
+scan of appointments. When that query is a booking's conflict check, the
+scan runs inside booking(), under the appointments file lock, and the
+other workers' appointment writes wait for it.
+"""
+
+import logging
+import os
+import threading
+from bisect import bisect_left, bisect_right
+from collections import defaultdict
+from contextlib import contextmanager
+from datetime import datetime, time, timedelta
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from api.identity_map import current_identity_map
+from api.json_db import appointments_db
+
+logger = logging.getLogger(__name__)
+
+ACTIVE_STATUSES = ('scheduled', 'confirmed')
+DEFAULT_DURATION_MINUTES = 30
+WEEKDAYS = ('mon', 'tue', 'wed', 'thu', 'fri', 'sat', 'sun')
+DEFAULT_WORKING_DAYS = os.getenv('DEFAULT_WORKING_DAYS', 'mon,tue,wed,thu,fri')
+DEFAULT_WORKING_HOURS = os.getenv('DEFAULT_WORKING_HOURS', '09:00-13:00,14:00-17:00')
+SLOT_STEP_MINUTES = int(os.getenv('SLOT_STEP_MINUTES', '15'))
+
+Interval = Tuple[datetime, datetime, int]
+
+
+def parse_datetime(value) -> Optional[datetime]:
+    """Naive local datetime from an ISO string (offsets are converted), or None."""
+    if isinstance(value, datetime):
+        dt = value
+    else:
+        try:
+            dt = datetime.fromisoformat(str(value))
+        except ValueError:
+            return None
+    if dt.tzinfo is not None:
+        # Stored dates are naive local times, like datetime.now().isoformat()
+        dt = dt.astimezone().replace(tzinfo=None)
+    return dt
+
+
+def duration_minutes(value) -> int:
+    try:
+        minutes = int(value)
+    except (TypeError, ValueError):
+        return DEFAULT_DURATION_MINUTES
+    return minutes if minutes > 0 else DEFAULT_DURATION_MINUTES
+
+
+def appointment_interval(record) -> Optional[Tuple[datetime, datetime]]:
+    """(start, end) of an appointment, or None if it does not occupy time."""
+    if record.get('status') not in ACTIVE_STATUSES:
+        return None
+    start = parse_datetime(record.get('appointment_date'))
+    if start is None:
+        return None
+    return start, start + timedelta(minutes=duration_minutes(record.get('duration')))
+
+
+def _parse_window(spec: str) -> Tuple[time, time]:
+    opens, closes = (time.fromisoformat(part.strip()) for part in spec.split('-'))
+    if closes <= opens:
+        raise ValueError(f'{spec}: closing time must be after opening time')
+    return opens, closes
+
+
+def parse_working_hours(value) -> Dict[int, List[Tuple[time, time]]]:
+    """Weekday (0 = Monday) -> sorted (opens, closes) windows.
+
+    `value` maps day names to lists of "HH:MM-HH:MM", e.g.
+    {"mon": ["09:00-13:00", "14:00-17:00"], "sat": ["10:00-12:00"]};
+    days left out are days off. Raises ValueError if it is malformed.
+    """
+    if not isinstance(value, dict):
+        raise ValueError('working_hours must map day names to lists of "HH:MM-HH:MM"')
+    hours = {}
+    for day, windows in value.items():
+        if day not in WEEKDAYS:
+            raise ValueError(f'{day}: expected one of {", ".join(WEEKDAYS)}')
+        if isinstance(windows, str):
+            windows = [windows]
+        if not isinstance(windows, list) or not all(isinstance(w, str) for w in windows):
+            raise ValueError(f'{day}: expected a list of "HH:MM-HH:MM"')
+        hours[WEEKDAYS.index(day)] = sorted(_parse_window(w) for w in windows)
+    return hours
+
+
+DEFAULT_HOURS = parse_working_hours({
+    day.strip(): DEFAULT_WORKING_HOURS.split(',') for day in DEFAULT_WORKING_DAYS.split(',') if day.strip()
+})
+
+
+def doctor_hours(profile) -> Dict[int, List[Tuple[time, time]]]:
+    """A doctor's working hours from their profile, falling back to the defaults."""
+    value = (profile or {}).get('working_hours')
+    if value:
+        try:
+            return parse_working_hours(value)
+        except ValueError:
+            logger.warning(f"Ignoring invalid working_hours on profile {profile.get('id')}")
+    return DEFAULT_HOURS
+
+
+def _align(t: datetime, origin: datetime, step: timedelta) -> datetime:
+    """The first origin + k*step at or after t."""
+    if t <= origin:
+        return origin
+    return origin + -((origin - t) // step) * step
+
+
+def _serialize(interval: Interval) -> dict:
+    start, end, record_id = interval
+    return {'id': record_id, 'start': start.isoformat(), 'end': end.isoformat()}
+
+
+class _Timeline:
+    """Intervals sorted by start.
+
+    Intervals may overlap (older data was never checked), so ends are not
+    sorted; remembering the longest interval bounds how far before `start`
+    an overlapping interval can begin.
+    """
+
+    def __init__(self):
+        self.starts: List[datetime] = []
+        self.entries: List[Interval] = []
+        self.longest = timedelta(0)
+
+    def add(self, entry: Interval):
+        i = bisect_right(self.entries, entry)
+        self.entries.insert(i, entry)
+        self.starts.insert(i, entry[0])
+        self.longest = max(self.longest, entry[1] - entry[0])
+
+    def remove(self, entry: Interval):
+        i = bisect_left(self.entries, entry)
+        if i < len(self.entries) and self.entries[i] == entry:
+            del self.entries[i]
+            del self.starts[i]
+
+    def overlapping(self, start: datetime, end: datetime) -> List[Interval]:
+        """Intervals intersecting [start, end)."""
+        lo = bisect_left(self.starts, start - self.longest)
+        hi = bisect_left(self.starts, end)
+        return [e for e in self.entries[lo:hi] if e[1] > start]
+
+    def starting(self, start: datetime, end: Optional[datetime] = None) -> List[Interval]:
+        """Intervals whose start is in [start, end)."""
+        lo = bisect_left(self.starts, start)
+        hi = bisect_left(self.starts, end) if end is not None else len(self.starts)
+        return self.entries[lo:hi]
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+
+class ScheduleIndex:
+    """Appointment timelines by doctor and by patient."""
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._build_lock = threading.Lock()
+        self.doctors = defaultdict(_Timeline)
+        self.patients = defaultdict(_Timeline)
+        self.members = {}
+        self._built = False
+        self._building = False
+        self._stale = False
+        self._buffer = []
+
+    # ── Maintenance ──────────────────────────────
+
+    def _remove(self, record_id):
+        member = self.members.pop(record_id, None)
+        if member is None:
+            return
+        doctor, patient, entry = member
+        for timelines, owner in ((self.doctors, doctor), (self.patients, patient)):
+            timeline = timelines.get(owner)
+            if timeline is not None:
+                timeline.remove(entry)
+                if not timeline:
+                    del timelines[owner]
+
+    def _put(self, record):
+        record_id = record.get('id')
+        self._remove(record_id)
+        interval = appointment_interval(record)
+        if interval is None:
+            return
+        entry = (interval[0], interval[1], record_id)
+        doctor, patient = record.get('doctor'), record.get('patient')
+        if doctor is not None:
+            self.doctors[doctor].add(entry)
+        if patient is not None:
+            self.patients[patient].add(entry)
+        self.members[record_id] = (doctor, patient, entry)
+
+    def _apply(self, event, record, previous):
+        if event == 'delete':
+            self._remove(previous.get('id'))
+        else:
+            self._put(record)
+
+    def listener(self, event, record, previous):
+        with self._lock:
+            if event == 'reload':
+                self._built = False
+                self._stale = self._building
+            elif self._building:
+                self._buffer.append((event, record, previous))
+            elif self._built:
+                self._apply(event, record, previous)
+
+    def build(self):
+        """Full scan of appointments; events seen meanwhile are replayed."""
+        with self._lock:
+            self._building = True
+            self._stale = False
+            self._buffer = []
+        records = appointments_db.get_all(
+            fields=('id', 'doctor', 'patient', 'appointment_date', 'duration', 'status'))
+        with self._lock:
+            self.doctors.clear()
+            self.patients.clear()
+            self.members.clear()
+            for record in records:
+                self._put(record)
+            for args in self._buffer:
+                self._apply(*args)
+            self._buffer = []
+            self._building = False
+            self._built = not self._stale
+        logger.info(f"Schedule index built: {len(self.members)} active appointments, "
+                    f"{len(self.doctors)} doctors")
+
+    def ensure_built(self):
+        # A stat of the file surfaces writes by other workers as a 'reload'
+        appointments_db.version_of()
+        if self._built:
+            return
+        with self._build_lock:
+            if not self._built:
+                self.build()
+
+    # ── Queries ──────────────────────────────────
+
+    @contextmanager
+    def booking(self):
+        """Serialize check-then-write sequences so two bookings cannot both pass the check.
+
+        Holds the appointments file lock, which every appointments write takes
+        as well, so this covers other worker processes too. Writes by other
+        workers are picked up before the caller checks for conflicts, and
+        appointments read inside the block come from the file rather than
+        from the request's identity map.
+        """
+        with appointments_db.file_lock():
+            appointments_db.version_of()
+            imap = current_identity_map()
+            if imap is not None:
+                imap.invalidate(str(appointments_db.filepath))
+            yield self
+
+    def conflicts(self, doctor, start: datetime, end: datetime, exclude=None) -> List[dict]:
+        """The doctor's active appointments overlapping [start, end), other than `exclude`."""
+        self.ensure_built()
+        with self._lock:
+            timeline = self.doctors.get(doctor)
+            hits = timeline.overlapping(start, end) if timeline is not None else []
+        return [_serialize(e) for e in hits if e[2] != exclude]
+
+    def doctor_range(self, doctor, start: datetime, end: datetime) -> List[dict]:
+        """The doctor's active appointments overlapping [start, end), in start order."""
+        self.ensure_built()
+        with self._lock:
+            timeline = self.doctors.get(doctor)
+            return [_serialize(e) for e in timeline.overlapping(start, end)] if timeline else []
+
+    def free_slots(self, doctor, hours, start: datetime, end: datetime,
+                   duration: timedelta, step: timedelta = timedelta(minutes=SLOT_STEP_MINUTES),
+                   limit: int = 100) -> Iterator[Tuple[datetime, datetime]]:
+        """Open (start, end) slots of `duration` in [start, end), earliest first.
+
+        Slots begin on `step` boundaries from the opening of each working window.
+        """
+        self.ensure_built()
+        found = 0
+        day = start.replace(hour=0, minute=0, second=0, microsecond=0)
+        while day < end and found < limit:
+            for opens, closes in hours.get(day.weekday(), ()):
+                window_start = datetime.combine(day.date(), opens)
+                window_end = min(datetime.combine(day.date(), closes), end)
+                if window_end <= start:
+                    continue
+                with self._lock:
+                    timeline = self.doctors.get(doctor)
+                    busy = timeline.overlapping(window_start, window_end) if timeline else []
+                t = _align(max(start, window_start), window_start, step)
+                for busy_start, busy_end, _ in busy:
+                    while t + duration <= busy_start and found < limit:
+                        yield t, t + duration
+                        found += 1
+                        t += step
+                    t = max(t, _align(busy_end, window_start, step))
+                while t + duration <= window_end and found < limit:
+                    yield t, t + duration
+                    found += 1
+                    t += step
+            day += timedelta(days=1)
+
+    def patient_upcoming(self, patient, now: datetime) -> List[int]:
+        """Ids of the patient's active appointments starting at or after `now`, soonest first."""
+        self.ensure_built()
+        with self._lock:
+            timeline = self.patients.get(patient)
+            return [e[2] for e in timeline.starting(now)] if timeline else []
+
+
+schedule_index = ScheduleIndex()
+appointments_db.add_listener(schedule_index.listener)
@@ -0,0 +1,300 @@
+"""
+Production server — a prefork pool of threaded Werkzeug workers.
+
+The master process builds the app once, warms the caches (collection
+checks, dashboard summary, file signatures) and binds the listening
+socket, then forks one worker per core. Workers inherit the warm state
+copy-on-write and accept connections from the shared socket.
+
+Each worker exits after SERVE_MAX_REQUESTS requests (plus up to
+SERVE_MAX_REQUESTS_JITTER, so workers do not all recycle at once) and the
+master forks a replacement. SIGTERM/SIGINT drain in-flight requests for up
+to SERVE_GRACEFUL_TIMEOUT seconds; SIGHUP replaces every worker.
+
+Usage:
+    python -m backend.serve                 # from the repository root
+    python serve.py --workers 4 --port 8000 # from backend/
+"""
+
+import argparse
+import logging
+import os
+import random
+import signal
+import socket
+import sys
+import threading
+import time
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent
+if str(BACKEND_DIR) not in sys.path:
+    sys.path.insert(0, str(BACKEND_DIR))
+
+from dotenv import load_dotenv  # noqa: E402
+
+load_dotenv(BACKEND_DIR / '.env')
+
+logger = logging.getLogger('serve')
+
+SERVE_WORKERS = int(os.getenv('SERVE_WORKERS', str(os.cpu_count() or 1)))
+SERVE_MAX_REQUESTS = int(os.getenv('SERVE_MAX_REQUESTS', '10000'))
+SERVE_MAX_REQUESTS_JITTER = int(os.getenv('SERVE_MAX_REQUESTS_JITTER', '1000'))
+SERVE_GRACEFUL_TIMEOUT = float(os.getenv('SERVE_GRACEFUL_TIMEOUT', '30'))
+SERVE_BACKLOG = int(os.getenv('SERVE_BACKLOG', '2048'))
+
+
+def configure_environment(workers: int):
+    """Defaults that only make sense with several worker processes.
+
+    Must run before the app modules are imported: they read these at import.
+    """
+    if workers > 1:
+        # Login limits must hold across workers, not per worker
+        os.environ.setdefault('RATE_LIMIT_BACKEND', 'sqlite')
+        # Share the cores between the workers' hashing pools
+        os.environ.setdefault('HASH_WORKERS', str(max(1, (os.cpu_count() or 1) // workers)))
+
+
+def warm(app):
+    """Fill caches in the master so every worker starts with them."""
+    from api.json_db import _registry
+    from dashboard_service import dashboard_summary
+    from rating_service import rating_index
+    from schedule_service import schedule_index
+
+    start = time.perf_counter()
+    for collection in _registry.values():
+        # Records the file signatures, so workers do not see their first read as external
+        collection.version_of()
+    dashboard_summary.ensure_built()
+    schedule_index.ensure_built()
+    rating_index.ensure_built()
+    with app.test_request_context('/api/health/'):
+        app.json.dumps({'warm': True})
+    logger.info(f"Caches warmed in {(time.perf_counter() - start) * 1000:.0f} ms")
+
+
+def bind(host: str, port: int, backlog: int = SERVE_BACKLOG) -> socket.socket:
+    from werkzeug.serving import get_sockaddr, select_address_family
+
+    family = select_address_family(host, port)
+    sock = socket.socket(family, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind(get_sockaddr(host, port, family))
+    sock.listen(backlog)
+    return sock
+
+
+# ── Worker ───────────────────────────────────────
+
+class Worker:
+    """One forked process: a threaded server on the shared socket."""
+
+    def __init__(self, app, sock: socket.socket, host: str, port: int, max_requests: int,
+                 graceful_timeout: float = SERVE_GRACEFUL_TIMEOUT):
+        self.app = app
+        self.sock = sock
+        self.host = host
+        self.port = port
+        self.max_requests = max_requests
+        self.graceful_timeout = graceful_timeout
+        self.served = 0
+        self.active = 0
+        self._cond = threading.Condition()
+        self._stopping = threading.Event()
+        self.server = None
+
+    def __call__(self, environ, start_response):
+        from werkzeug.wsgi import ClosingIterator
+
+        with self._cond:
+            self.active += 1
+            self.served += 1
+            served = self.served
+        if served >= self.max_requests:
+            self.stop(f"served {served} requests")
+        try:
+            return ClosingIterator(self.app(environ, start_response), self._finished)
+        except BaseException:
+            self._finished()
+            raise
+
+    def _finished(self):
+        with self._cond:
+            self.active -= 1
+            self._cond.notify_all()
+
+    def stop(self, reason: str):
+        """Stop accepting connections; run() then drains and exits."""
+        if self._stopping.is_set():
+            return
+        self._stopping.set()
+        logger.info(f"Worker {os.getpid()} stopping: {reason}")
+        # shutdown() waits for serve_forever() to notice, so never call it on that thread
+        threading.Thread(target=self.server.shutdown, daemon=True).start()
+
+    def run(self) -> int:
+        from werkzeug.serving import make_server
+        from dashboard_service import start_dashboard_refresher
+        from events_service import close_streams
+        from password_service import password_hasher
+
+        signal.signal(signal.SIGTERM, lambda *_: self.stop('SIGTERM'))
+        signal.signal(signal.SIGINT, lambda *_: self.stop('SIGINT'))
+        signal.signal(signal.SIGHUP, signal.SIG_DFL)
+        random.seed()
+
+        # Threads and process pools do not survive fork; start this worker's own
+        start_dashboard_refresher()
+        password_hasher.warm()
+
+        self.server = make_server(self.host, self.port, self, threaded=True, fd=self.sock.fileno())
+        logger.info(f"Worker {os.getpid()} ready (recycles after {self.max_requests} requests)")
+        self.server.serve_forever()
+        self.server.socket.close()
+        # Event streams never finish on their own; end them so the drain can
+        close_streams()
+
+        with self._cond:
+            drained = self._cond.wait_for(lambda: self.active == 0, timeout=self.graceful_timeout)
+        if not drained:
+            logger.warning(f"Worker {os.getpid()} exiting with {self.active} requests in flight")
+        password_hasher.shutdown(wait=True)
+        return 0
+
+
+# ── Master ───────────────────────────────────────
+
+class Master:
+    """Forks workers, replaces the ones that exit and coordinates shutdown."""
+
+    def __init__(self, app, host: str, port: int, workers: int = SERVE_WORKERS,
+                 max_requests: int = SERVE_MAX_REQUESTS,
+                 max_requests_jitter: int = SERVE_MAX_REQUESTS_JITTER,
+                 graceful_timeout: float = SERVE_GRACEFUL_TIMEOUT):
+        self.app = app
+        self.host = host
+        self.port = port
+        self.workers = max(1, workers)
+        self.max_requests = max_requests
+        self.max_requests_jitter = max_requests_jitter
+        self.graceful_timeout = graceful_timeout
+        self.children = {}  # pid -> fork time
+        self.stopping = False
+        self.sock = None
+
+    def spawn(self):
+        limit = self.max_requests + random.randint(0, max(0, self.max_requests_jitter))
+        pid = os.fork()
+        if pid == 0:
+            code = 1
+            try:
+                code = Worker(self.app, self.sock, self.host, self.port, limit,
+                              self.graceful_timeout).run()
+            except BaseException:
+                logger.exception(f"Worker {os.getpid()} crashed")
+            finally:
+                # A normal interpreter exit, so the worker's hashing pool is cleaned up
+                sys.exit(code)
+        self.children[pid] = time.monotonic()
+
+    def reap(self):
+        while self.children:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                return
+            if pid == 0:
+                return
+            started = self.children.pop(pid, None)
+            if started is None:
+                continue
+            code = os.waitstatus_to_exitcode(status)
+            if code != 0 and not self.stopping:
+                logger.warning(f"Worker {pid} exited with status {code}")
+            if not self.stopping:
+                if time.monotonic() - started < 1.0:
+                    time.sleep(1.0)  # do not spin on a worker that dies at boot
+                self.spawn()
+
+    def signal_workers(self, signum):
+        for pid in list(self.children):
+            try:
+                os.kill(pid, signum)
+            except ProcessLookupError:
+                pass
+
+    def _stop(self, signum, frame):
+        if not self.stopping:
+            logger.info(f"Received {signal.Signals(signum).name}; draining workers")
+        self.stopping = True
+
+    def _recycle(self, signum, frame):
+        logger.info("Received SIGHUP; replacing workers")
+        self.signal_workers(signal.SIGTERM)
+
+    def run(self) -> int:
+        from dashboard_service import stop_dashboard_refresher
+
+        self.sock = bind(self.host, self.port)
+        warm(self.app)
+        # Only the main thread survives fork; nothing else may hold locks then
+        stop_dashboard_refresher()
+
+        signal.signal(signal.SIGTERM, self._stop)
+        signal.signal(signal.SIGINT, self._stop)
+        signal.signal(signal.SIGHUP, self._recycle)
+
+        logger.info(f"Serving HealthGuard API on {self.host}:{self.port} with {self.workers} workers")
+        for _ in range(self.workers):
+            self.spawn()
+        while not self.stopping:
+            self.reap()
+            time.sleep(0.2)
+
+        self.signal_workers(signal.SIGTERM)
+        deadline = time.monotonic() + self.graceful_timeout + 5
+        while self.children and time.monotonic() < deadline:
+            self.reap()
+            time.sleep(0.1)
+        if self.children:
+            logger.warning(f"Killing {len(self.children)} workers that did not drain in time")
+            self.signal_workers(signal.SIGKILL)
+            while self.children:
+                pid, _ = os.waitpid(-1, 0)
+                self.children.pop(pid, None)
+        self.sock.close()
+        logger.info("Server stopped")
+        return 0
+
+
+def serve(app, host: str, port: int, **kwargs) -> int:
+    """Run `app` under the prefork server until SIGTERM/SIGINT."""
+    app.config['DEBUG'] = False
+    # The app's access log replaces Werkzeug's per-request line
+    logging.getLogger('werkzeug').setLevel(logging.WARNING)
+    return Master(app, host, port, **kwargs).run()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Run the HealthGuard API with prefork workers')
+    parser.add_argument('--host', default=os.getenv('HOST', '0.0.0.0'))
+    parser.add_argument('--port', type=int, default=int(os.getenv('PORT', 8000)))
+    parser.add_argument('--workers', type=int, default=SERVE_WORKERS, help='Worker processes (default: cores)')
+    parser.add_argument('--max-requests', type=int, default=SERVE_MAX_REQUESTS,
+                        help='Recycle a worker after this many requests')
+    parser.add_argument('--max-requests-jitter', type=int, default=SERVE_MAX_REQUESTS_JITTER)
+    parser.add_argument('--graceful-timeout', type=float, default=SERVE_GRACEFUL_TIMEOUT)
+    args = parser.parse_args(argv)
+
+    configure_environment(args.workers)
+    from app import create_app
+
+    return serve(create_app(), args.host, args.port, workers=args.workers,
+                 max_requests=args.max_requests, max_requests_jitter=args.max_requests_jitter,
+                 graceful_timeout=args.graceful_timeout)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
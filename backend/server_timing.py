@@ -0,0 +1,64 @@
+"""
+Server-Timing — per-request span breakdown in a response header.
+
+Each request gets a RequestTiming (api/timing.py). Storage operations
+(db.<collection>), user lookups, Gemini calls and SMTP sends record spans
+into it, and the response carries them as
+
+    Server-Timing: db.prescriptions;dur=1.8;desc="2 calls", gemini;dur=840.2;desc="1 call", total;dur=845.9
+
+which browser dev tools display next to the network timings. The same
+numbers are folded into per-route aggregates served at /api/debug/timing/.
+"""
+
+import logging
+import os
+
+from flask import request
+
+from api import timing
+
+logger = logging.getLogger(__name__)
+
+SERVER_TIMING_HEADER = os.getenv('SERVER_TIMING_HEADER', 'True') == 'True'
+
+_TOKEN_KEY = 'healthguard.timing_token'
+
+
+def _header(spans, total: float) -> str:
+    parts = [
+        f'{name};dur={seconds * 1000:.1f};desc="{calls} call{"s" if calls != 1 else ""}"'
+        for name, (seconds, calls) in sorted(spans.items(), key=lambda s: s[1][0], reverse=True)
+    ]
+    parts.append(f'total;dur={total * 1000:.1f}')
+    return ', '.join(parts)
+
+
+def init_server_timing(app):
+    """Time every request; register before other hooks so the total covers them."""
+
+    @app.before_request
+    def start_request_timing():
+        # Kept in the environ, not g: batch sub-requests share g but not the environ
+        request.environ[_TOKEN_KEY] = timing.begin()
+
+    @app.after_request
+    def add_server_timing(response):
+        current = timing.current()
+        if current is None or request.method == 'OPTIONS':
+            return response
+        total = current.elapsed()
+        spans = current.snapshot()
+        rule = request.url_rule.rule if request.url_rule is not None else '<unmatched>'
+        timing.route_timings.observe(f'{request.method} {rule}', total, spans)
+        if SERVER_TIMING_HEADER:
+            response.headers['Server-Timing'] = _header(spans, total)
+        return response
+
+    @app.teardown_request
+    def end_request_timing(exc):
+        token = request.environ.pop(_TOKEN_KEY, None)
+        if token is not None:
+            timing.end(token)
+
+    logger.info(f"Request timing enabled (Server-Timing header {'on' if SERVER_TIMING_HEADER else 'off'})")
@@ -0,0 +1,152 @@
+"""
+Delta Sync Service
+Per-user change feed for offline-capable clients.
+
+Collection listeners append every create/update/delete to a shared change
+log (api/change_log.py) together with the record's owner ids. A client
+calls /api/sync/ once without `since` to get a full snapshot and a cursor,
+then passes the cursor back to receive only the records created, updated
+or deleted since. Expired or unknown cursors fall back to a full snapshot
+with `reset: true`; so do all cursors once a synced collection has been
+restored from backup, since that rolls back changes clients may hold.
+"""
+
+import logging
+import os
+import time
+from collections import OrderedDict
+
+from api.change_log import ChangeLog
+from api.json_db import (
+    DATA_DIR, medical_records_db, prescriptions_db, medications_db,
+    medicine_reminders_db, appointments_db, health_metrics_db, diet_plans_db,
+    ai_consultations_db, emergency_contacts_db, doctor_reviews_db,
+    user_profiles_db, prefetch_children,
+)
+
+logger = logging.getLogger(__name__)
+
+SYNC_LOG_MAX_BYTES = int(os.getenv('SYNC_LOG_MAX_BYTES', str(16 * 1024 * 1024)))
+
+# Synced collections and the fields that make a record belong to a user
+SYNC_COLLECTIONS = OrderedDict([
+    ('user_profiles', (user_profiles_db, ('user_id',))),
+    ('medical_records', (medical_records_db, ('patient', 'recorded_by'))),
+    ('prescriptions', (prescriptions_db, ('patient', 'doctor'))),
+    ('medicine_reminders', (medicine_reminders_db, ('user',))),
+    ('appointments', (appointments_db, ('patient', 'doctor'))),
+    ('health_metrics', (health_metrics_db, ('user',))),
+    ('diet_plans', (diet_plans_db, ('patient', 'created_by'))),
+    ('ai_consultations', (ai_consultations_db, ('patient',))),
+    ('emergency_contacts', (emergency_contacts_db, ('user',))),
+    ('doctor_reviews', (doctor_reviews_db, ('patient', 'doctor'))),
+])
+
+change_log = ChangeLog(DATA_DIR / '_changes.jsonl', max_bytes=SYNC_LOG_MAX_BYTES)
+
+
+def _owners(fields, *records) -> list:
+    return sorted({
+        r.get(f) for r in records if r for f in fields
+        if r.get(f) is not None and not isinstance(r.get(f), (dict, list))
+    }, key=str)
+
+
+# ── Recording ────────────────────────────────────
+
+def _reset_on_restore(name, previous):
+    """A restored file discards logged changes without logging any: expire every cursor."""
+    if previous and previous.get('restored_from'):
+        change_log.reset(f"{name} restored from {previous['restored_from']}")
+
+
+def _record_listener(name, owner_fields):
+    def record_change(event, record, previous):
+        if event == 'reload':
+            # Another process's write (it logs its own changes) or a restore
+            _reset_on_restore(name, previous)
+            return
+        rec = record or previous
+        change_log.append({
+            'c': name, 'e': event, 'id': rec.get('id'),
+            'o': _owners(owner_fields, record, previous), 't': time.time(),
+        })
+    return record_change
+
+
+def _medication_change(event, record, previous):
+    """Medications are synced inside their prescription; log it as updated."""
+    if event == 'reload':
+        _reset_on_restore('medications', previous)
+        return
+    prescription_ids = {r.get('prescription_id') for r in (record, previous) if r} - {None}
+    for pid in prescription_ids:
+        # A different collection, so reading it under the medications lock is safe
+        prescription = prescriptions_db.get(pid, fields=('patient', 'doctor'))
+        change_log.append({
+            'c': 'prescriptions', 'e': 'update', 'id': pid,
+            'o': _owners(('patient', 'doctor'), prescription), 't': time.time(),
+        })
+
+
+for _name, (_collection, _fields) in SYNC_COLLECTIONS.items():
+    _collection.add_listener(_record_listener(_name, _fields))
+medications_db.add_listener(_medication_change)
+
+
+# ── Reading ──────────────────────────────────────
+
+def _owned_by(uid, fields):
+    return lambda r: any(r.get(f) == uid for f in fields)
+
+
+def _with_children(name, records):
+    if name == 'prescriptions':
+        prefetch_children(records, medications_db, fk='prescription_id', as_='medications')
+    return records
+
+
+def _snapshot(uid, cursor) -> dict:
+    changes = {}
+    for name, (collection, fields) in SYNC_COLLECTIONS.items():
+        records = collection.filter_fn(_owned_by(uid, fields))
+        if records:
+            changes[name] = {'created': _with_children(name, records), 'updated': [], 'deleted': []}
+    return {'reset': True, 'cursor': cursor, 'changes': changes}
+
+
+def get_changes(uid, since=None) -> dict:
+    """Changes visible to `uid` since the cursor `since` (a full snapshot without one)."""
+    if not since:
+        # Cursor first: anything written during the snapshot is re-sent next time
+        return _snapshot(uid, change_log.cursor())
+    entries, cursor = change_log.read_since(since)
+    if entries is None:
+        logger.info(f"Sync cursor expired for user {uid}; sending full snapshot")
+        return _snapshot(uid, cursor)
+
+    # Per collection: record id -> (first event, last event) in this window
+    touched = {}
+    for entry in entries:
+        if uid not in entry.get('o', ()) or entry['c'] not in SYNC_COLLECTIONS:
+            continue
+        events = touched.setdefault(entry['c'], {})
+        first = events[entry['id']][0] if entry['id'] in events else entry['e']
+        events[entry['id']] = (first, entry['e'])
+
+    changes = {}
+    for name, events in touched.items():
+        collection, fields = SYNC_COLLECTIONS[name]
+        current = collection.get_many(events.keys())
+        owned = _owned_by(uid, fields)
+        created, updated, deleted = [], [], []
+        for record_id, (first, last) in events.items():
+            record = current.get(record_id)
+            if last != 'delete' and record is not None and owned(record):
+                (created if first == 'create' else updated).append(record)
+            elif first != 'create':
+                # Deleted, or no longer this user's record
+                deleted.append(record_id)
+        _with_children(name, created + updated)
+        changes[name] = {'created': created, 'updated': updated, 'deleted': deleted}
+    return {'reset': False, 'cursor': cursor, 'changes': changes}
@@ -0,0 +1,81 @@
+"""
+Shared fixtures: the app over a throwaway JSON_DB_DIR, and signed-in users.
+
+Run from backend/:  python -m pytest -q
+"""
+
+import os
+import shutil
+import sys
+import tempfile
+import traceback
+from pathlib import Path
+
+import pytest
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+if str(BACKEND_DIR) not in sys.path:
+    sys.path.insert(0, str(BACKEND_DIR))
+
+# Collections bind their directory at import, so this must precede any app import
+TEST_DATA_DIR = tempfile.mkdtemp(prefix='healthguard-tests-')
+os.environ['JSON_DB_DIR'] = TEST_DATA_DIR
+os.environ['LOGIN_RATE_LIMIT'] = str(10 ** 9)
+os.environ.setdefault('JWT_SECRET_KEY', 'healthguard-test-secret-0123456789abcdef')
+
+
+def pytest_sessionfinish(session, exitstatus):
+    shutil.rmtree(TEST_DATA_DIR, ignore_errors=True)
+
+
+@pytest.fixture(scope='session')
+def app():
+    from app import create_app
+    app = create_app()
+    app.config['TESTING'] = True
+    return app
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+def in_another_process(action):
+    """Run `action` in a forked child, as another server worker would."""
+    pid = os.fork()
+    if pid == 0:
+        status = 1
+        try:
+            action()
+            status = 0
+        except BaseException:
+            traceback.print_exc()
+        finally:
+            os._exit(status)
+    _, status = os.waitpid(pid, 0)
+    assert os.waitstatus_to_exitcode(status) == 0, 'the other worker failed'
+
+
+def make_user(username, user_type='patient', password='pass-1234'):
+    """A user with a profile; returns (user record, Authorization headers)."""
+    from api.json_db import users_db, user_profiles_db
+    from auth import generate_token
+    from password_service import hash_password
+    user = users_db.create({
+        'username': username, 'email': f'{username}@example.com',
+        'password': hash_password(password), 'first_name': username.title(),
+        'last_name': 'Test', 'is_active': True,
+    })
+    user_profiles_db.create({'user_id': user['id'], 'user_type': user_type})
+    return user, {'Authorization': f'Bearer {generate_token(user)}'}
+
+
+@pytest.fixture(scope='session')
+def patient(app):
+    return make_user('patient')
+
+
+@pytest.fixture(scope='session')
+def admin(app):
+    return make_user('admin', user_type='platform_admin')
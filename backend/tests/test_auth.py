@@ -0,0 +1,96 @@
+"""login_required: bearer tokens and the resolved-principal cache."""
+
+import datetime
+
+import jwt
+import pytest
+
+import auth
+from conftest import in_another_process, make_user
+
+
+def _expired_token(user):
+    past = datetime.datetime.utcnow() - datetime.timedelta(hours=1)
+    payload = {'user_id': user['id'], 'username': user['username'], 'exp': past, 'iat': past}
+    return jwt.encode(payload, auth.JWT_SECRET, algorithm=auth.JWT_ALGORITHM)
+
+
+# ── Bearer tokens ────────────────────────────────
+
+def test_valid_token(client, patient):
+    user, headers = patient
+    response = client.get('/api/auth/me/', headers=headers)
+    assert response.status_code == 200
+    assert response.get_json()['username'] == user['username']
+
+
+@pytest.mark.parametrize('header', [None, 'Token abc', 'Bearer', 'Bearer not-a-jwt'])
+def test_missing_or_invalid_token(client, header):
+    headers = {'Authorization': header} if header is not None else {}
+    response = client.get('/api/auth/me/', headers=headers)
+    assert response.status_code == 401
+    assert response.get_json()['error'] == 'Unauthorized'
+
+
+def test_expired_token(client, patient):
+    headers = {'Authorization': f'Bearer {_expired_token(patient[0])}'}
+    assert client.get('/api/auth/me/', headers=headers).status_code == 401
+
+
+def test_token_of_deleted_user(client):
+    from api.json_db import users_db
+    user, headers = make_user('leaver')
+    users_db.delete(user['id'])
+    response = client.get('/api/auth/me/', headers=headers)
+    assert response.status_code == 401
+    assert response.get_json()['detail'] == 'User not found'
+
+
+def test_cached_principal_follows_profile_changes(client):
+    from api.json_db import user_profiles_db
+    user, headers = make_user('promoted')
+    assert client.get('/api/debug/timing/', headers=headers).status_code == 403  # now cached
+
+    profile = user_profiles_db.filter(user_id=user['id'])[0]
+    user_profiles_db.update(profile['id'], {'user_type': 'platform_admin'})
+
+    assert client.get('/api/debug/timing/', headers=headers).status_code == 200
+
+
+def test_principal_is_a_copy(client, patient):
+    user, headers = patient
+    resolved, error = auth._resolve_principal(headers['Authorization'][len('Bearer '):])
+    resolved['username'] = 'mutated'
+    assert client.get('/api/auth/me/', headers=headers).get_json()['username'] == user['username']
+
+
+def _uncached(token):
+    auth.invalidate_principal()
+    return auth._resolve_principal(token)
+
+
+def test_cached_principal_sees_another_workers_demotion(client):
+    from api.json_db import user_profiles_db
+    user, headers = make_user('demoted', user_type='platform_admin')
+    assert client.get('/api/debug/timing/', headers=headers).status_code == 200  # now cached
+
+    profile = user_profiles_db.filter(user_id=user['id'])[0]
+    in_another_process(lambda: user_profiles_db.update(profile['id'], {'user_type': 'patient'}))
+
+    assert client.get('/api/debug/timing/', headers=headers).status_code == 403
+
+
+def test_cached_principals_match_a_fresh_lookup_after_another_workers_writes(client):
+    from api.json_db import users_db
+    users = [make_user(f'cached-{n}') for n in range(3)]
+    tokens = [headers['Authorization'][len('Bearer '):] for _, headers in users]
+    for token in tokens:
+        auth._resolve_principal(token)
+
+    renamed = users[0][0]['id']
+    in_another_process(lambda: (users_db.update(renamed, {'first_name': 'Renamed'}),
+                                make_user('newcomer')))
+
+    cached = [auth._resolve_principal(token) for token in tokens]
+    assert cached[0][0]['first_name'] == 'Renamed'
+    assert cached == [_uncached(token) for token in tokens]
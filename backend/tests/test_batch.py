@@ -0,0 +1,90 @@
+"""/api/batch/: validation, streamed sub-requests and the parallel time limit."""
+
+import time
+
+import pytest
+from flask import Response
+
+import batch
+
+
+@pytest.mark.parametrize('payload, detail', [
+    ({}, 'requests must be a non-empty list'),
+    ({'requests': []}, 'requests must be a non-empty list'),
+    ({'requests': {'path': '/api/'}}, 'requests must be a non-empty list'),
+    ({'requests': ['/api/']}, 'requests[0] must be an object'),
+    ({'requests': [{'method': 'TRACE', 'path': '/api/'}]}, 'requests[0]: unsupported method TRACE'),
+    ({'requests': [{'path': '/health/'}]}, 'requests[0]: path must start with /api/'),
+    ({'requests': [{'path': '/api/'}, {'method': 'POST', 'path': '/api/batch/'}]},
+     'requests[1]: batches cannot be nested'),
+    ({'requests': [{'path': '/api/events/'}]}, 'requests[0]: event streams cannot be batched'),
+    ({'requests': [{'method': 'POST', 'path': '/api/events/session/'}]},
+     'requests[0]: event streams cannot be batched'),
+])
+def test_malformed_batches_are_rejected(client, patient, payload, detail):
+    response = client.post('/api/batch/', json=payload, headers=patient[1])
+    assert response.status_code == 400
+    assert response.get_json()['detail'] == detail
+
+
+def test_batch_size_limit(client, patient):
+    items = [{'path': '/api/'}] * (batch.BATCH_MAX_REQUESTS + 1)
+    response = client.post('/api/batch/', json={'requests': items}, headers=patient[1])
+    assert response.status_code == 400
+
+
+def test_batch_requires_login(client):
+    assert client.post('/api/batch/', json={'requests': [{'path': '/api/'}]}).status_code == 401
+
+
+@pytest.mark.parametrize('parallel', [False, True])
+def test_results_keep_request_order(client, patient, parallel):
+    items = [
+        {'id': 'me', 'path': '/api/auth/me/'},
+        {'id': 'missing', 'path': '/api/appointments/999999/'},
+        {'id': 'root', 'path': '/api/'},
+    ]
+    response = client.post('/api/batch/', json={'requests': items, 'parallel': parallel},
+                           headers=patient[1])
+    assert response.status_code == 200
+    results = response.get_json()
+    assert [(r['id'], r['status']) for r in results] == [('me', 200), ('missing', 404), ('root', 200)]
+    assert results[0]['body']['username'] == 'patient'
+
+
+@pytest.fixture(scope='module')
+def streaming_client():
+    """A separate app with a never-ending stream and a slow route (rules must precede requests)."""
+    from app import create_app
+    from conftest import make_user
+
+    app = create_app()
+
+    def forever():
+        while True:
+            yield 'data: tick\n\n'
+            time.sleep(0.01)
+
+    app.add_url_rule('/api/_test/stream/', 'test_stream',
+                     lambda: Response(forever(), mimetype='text/event-stream'))
+    app.add_url_rule('/api/_test/slow/', 'test_slow', lambda: (time.sleep(0.5), {'slow': True})[1])
+    return app.test_client(), make_user('batcher')[1]
+
+
+def test_streamed_sub_request_is_refused_per_item(streaming_client):
+    client, headers = streaming_client
+    items = [{'id': 'stream', 'path': '/api/_test/stream/'}, {'id': 'root', 'path': '/api/'}]
+    results = client.post('/api/batch/', json={'requests': items}, headers=headers).get_json()
+    assert [(r['id'], r['status']) for r in results] == [('stream', 400), ('root', 200)]
+    assert results[0]['body']['detail'] == 'Streaming responses cannot be batched'
+
+
+def test_slow_parallel_read_times_out_per_item(streaming_client, monkeypatch):
+    client, headers = streaming_client
+    monkeypatch.setattr(batch, 'BATCH_TIMEOUT', 0.1)
+    items = [{'id': 'slow', 'path': '/api/_test/slow/'}, {'id': 'root', 'path': '/api/'}]
+    started = time.monotonic()
+    response = client.post('/api/batch/', json={'requests': items, 'parallel': True}, headers=headers)
+    assert time.monotonic() - started < 0.5
+    results = response.get_json()
+    assert [(r['id'], r['status']) for r in results] == [('slow', 504), ('root', 200)]
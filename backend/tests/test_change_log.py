@@ -0,0 +1,85 @@
+"""Change log: cursors, rotation against appends in other processes, and reset markers."""
+
+import threading
+import time
+
+from api.change_log import ChangeLog
+
+
+def entry(n):
+    return {'c': 'items', 'e': 'create', 'id': n, 'o': [1]}
+
+
+def test_read_since_returns_later_entries(tmp_path):
+    log = ChangeLog(tmp_path / 'changes.jsonl')
+    log.append(entry(1))
+    cursor = log.cursor()
+    log.append(entry(2))
+    log.append(entry(3))
+
+    entries, end = log.read_since(cursor)
+    assert [e['id'] for e in entries] == [2, 3]
+    assert log.read_since(end) == ([], end)
+
+
+def test_reset_expires_earlier_cursors_only(tmp_path):
+    log = ChangeLog(tmp_path / 'changes.jsonl')
+    before = log.cursor()
+    log.reset('items restored from items_1.json')
+    after = log.cursor()
+    log.append(entry(1))
+
+    assert log.read_since(before)[0] is None
+    assert [e['id'] for e in log.read_since(after)[0]] == [1]
+
+
+def test_rotation_waits_for_an_append_in_flight(tmp_path):
+    """An append that passed its check must land before the log is rotated away.
+
+    Otherwise it goes into the old file, and a cursor taken in the new log
+    would silently miss it.
+    """
+    path = tmp_path / 'changes.jsonl'
+    writer, rotator, reader = ChangeLog(path), ChangeLog(path, max_bytes=1), ChangeLog(path)
+    writer.cursor()  # open the current file
+    checked, proceed = threading.Event(), threading.Event()
+    current = writer._current
+
+    def paused_current():
+        current()
+        checked.set()
+        proceed.wait(5)
+
+    writer._current = paused_current
+    appending = threading.Thread(target=writer.append, args=(entry(1),))
+    appending.start()
+    assert checked.wait(5)
+    rotating = threading.Thread(target=rotator.append, args=(entry(2),))  # rotates the log
+    rotating.start()
+    time.sleep(0.2)
+
+    cursor = reader.cursor()
+    proceed.set()
+    appending.join(5)
+    rotating.join(5)
+
+    entries, _ = reader.read_since(cursor)
+    assert entries is None or 1 in [e['id'] for e in entries]
+    assert (tmp_path / 'changes.jsonl.1').exists()
+
+
+def test_a_second_rotation_of_the_same_log_is_skipped(tmp_path):
+    path = tmp_path / 'changes.jsonl'
+    late, first = ChangeLog(path, max_bytes=10 ** 6), ChangeLog(path, max_bytes=200)
+    late.append({'c': 'items', 'pad': 'x' * 200})  # over first's limit, under its own
+    first.append(entry(1))  # rotates
+    rotated = (tmp_path / 'changes.jsonl.1').read_text()
+
+    # `late` saw the full file too and gets the exclusive lock only now
+    late.max_bytes = 200
+    with late._lock:
+        late._rotate()
+
+    assert (tmp_path / 'changes.jsonl.1').read_text() == rotated
+    late.append(entry(2))
+    assert '"id":2' in path.read_text()
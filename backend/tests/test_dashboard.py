@@ -0,0 +1,96 @@
+"""Dashboard summary: counters kept by listeners match a full scan, including writes by other workers."""
+
+import random
+from datetime import datetime, timedelta
+
+import pytest
+
+from api.json_db import (
+    appointments_db, prescriptions_db, medicine_reminders_db,
+    ai_consultations_db, health_metrics_db,
+)
+from conftest import in_another_process
+from dashboard_service import dashboard_summary, get_dashboard_summary
+
+USERS = range(50_001, 50_005)
+
+
+def full_scan(uid) -> dict:
+    """The per-request scan /api/dashboard/stats/ ran before the summary existed."""
+    now = datetime.now().isoformat()
+    today = datetime.now().date().isoformat()
+    metrics = health_metrics_db.filter(user=uid)
+    metrics.sort(key=lambda r: r.get('recorded_at', ''), reverse=True)
+    return {
+        'upcoming_appointments': len(appointments_db.filter_fn(
+            lambda r: r.get('patient') == uid and r.get('appointment_date', '') >= now
+            and r.get('status') in ('scheduled', 'confirmed'))),
+        'active_prescriptions': len(prescriptions_db.filter_fn(
+            lambda r: r.get('patient') == uid
+            and (not r.get('valid_until') or r['valid_until'] >= today))),
+        'active_reminders': len(medicine_reminders_db.filter_fn(
+            lambda r: r.get('user') == uid and r.get('is_active') is True
+            and (not r.get('end_date') or r['end_date'] >= today))),
+        'total_consultations': ai_consultations_db.count(patient=uid),
+        'recent_metrics': metrics[:5],
+    }
+
+
+def _days(rng, n):
+    return (datetime.now() + timedelta(days=rng.randint(-n, n))).date().isoformat()
+
+
+def random_writes(seed, n=40):
+    """Creates, updates and deletes across every source collection."""
+    rng = random.Random(seed)
+    makers = {
+        appointments_db: lambda: {
+            'patient': rng.choice(USERS),
+            'status': rng.choice(['scheduled', 'confirmed', 'cancelled', 'completed']),
+            'appointment_date': (datetime.now() + timedelta(hours=rng.randint(-48, 48))).isoformat(),
+        },
+        prescriptions_db: lambda: {
+            'patient': rng.choice(USERS),
+            'valid_until': rng.choice(['', None, _days(rng, 3)]),
+        },
+        medicine_reminders_db: lambda: {
+            'user': rng.choice(USERS), 'is_active': rng.choice([True, False, 'yes']),
+            'end_date': rng.choice(['', _days(rng, 3)]),
+        },
+        ai_consultations_db: lambda: {'patient': rng.choice(USERS)},
+        health_metrics_db: lambda: {
+            'user': rng.choice(USERS), 'value': rng.random(),
+            'recorded_at': f'2031-01-{rng.randint(1, 9):02d}',  # ties are common
+        },
+    }
+    for _ in range(n):
+        collection, make = rng.choice(list(makers.items()))
+        mine = [r['id'] for r in collection.filter_fn(lambda r: r.get('patient', r.get('user')) in USERS)]
+        action = rng.random()
+        if mine and action < 0.2:
+            collection.delete(rng.choice(mine))
+        elif mine and action < 0.5:
+            collection.update(rng.choice(mine), make())
+        else:
+            collection.create(make())
+
+
+@pytest.mark.parametrize('seed', range(3))
+def test_summary_matches_a_full_scan(seed):
+    get_dashboard_summary(USERS[0])  # built; everything below arrives through listeners
+    random_writes(seed)
+    for uid in USERS:
+        assert get_dashboard_summary(uid) == full_scan(uid)
+
+
+def test_summary_matches_a_full_scan_after_another_worker_writes(monkeypatch):
+    get_dashboard_summary(USERS[0])
+    builds = []
+    original = dashboard_summary.build
+    monkeypatch.setattr(dashboard_summary, 'build', lambda: (builds.append(1), original())[1])
+
+    in_another_process(lambda: random_writes(seed=99))
+    for uid in USERS:
+        assert get_dashboard_summary(uid) == full_scan(uid)
+    # The other worker's writes arrive as a 'reload': one rebuild, not one per read
+    assert len(builds) == 1
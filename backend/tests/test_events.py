@@ -0,0 +1,56 @@
+"""/api/events/: cookie authentication and the per-worker stream cap."""
+
+import datetime
+
+import jwt
+
+import auth
+import events_service
+
+
+def _expired_token(user):
+    past = datetime.datetime.utcnow() - datetime.timedelta(hours=1)
+    payload = {'user_id': user['id'], 'username': user['username'], 'exp': past, 'iat': past}
+    return jwt.encode(payload, auth.JWT_SECRET, algorithm=auth.JWT_ALGORITHM)
+
+
+def test_stream_rejects_token_in_query_string(client, patient):
+    token = patient[1]['Authorization'][len('Bearer '):]
+    assert client.get(f'/api/events/?token={token}').status_code == 401
+
+
+def test_stream_cookie(app, patient):
+    client = app.test_client()
+    session = client.post('/api/events/session/', headers=patient[1])
+    assert session.status_code == 204
+    cookie = session.headers['Set-Cookie']
+    assert 'HttpOnly' in cookie and 'Path=/api/events/' in cookie
+
+    stream = client.get('/api/events/', buffered=False)
+    try:
+        assert stream.status_code == 200
+        assert stream.mimetype == 'text/event-stream'
+        assert next(stream.response).startswith(b'retry:')
+    finally:
+        stream.close()
+
+    assert client.delete('/api/events/session/', headers=patient[1]).status_code == 204
+    assert client.get('/api/events/').status_code == 401
+
+
+def test_stream_cookie_with_expired_token(app, patient):
+    client = app.test_client()
+    client.set_cookie(auth.STREAM_COOKIE, _expired_token(patient[0]), path='/api/events/')
+    assert client.get('/api/events/').status_code == 401
+
+
+def test_stream_cap_per_worker(client, patient, monkeypatch):
+    monkeypatch.setattr(events_service.broker, 'max_total', len(events_service.broker) + 1)
+    first = client.get('/api/events/', headers=patient[1], buffered=False)
+    try:
+        second = client.get('/api/events/', headers=patient[1])
+        assert second.status_code == 503
+        assert second.headers['Retry-After']
+    finally:
+        first.close()
+    assert len(events_service.broker) == 0
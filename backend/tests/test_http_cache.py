@@ -0,0 +1,107 @@
+"""Conditional GET: per-user ETags, 304s, and tags that move with the data they cover."""
+
+import pytest
+
+from api.json_db import health_metrics_db
+from conftest import in_another_process, make_user
+
+
+@pytest.fixture(scope='module')
+def users(app):
+    return make_user('etag-a')[1], make_user('etag-b')[1]
+
+
+def get(client, path, headers, etag=None):
+    if etag is not None:
+        headers = dict(headers, **{'If-None-Match': etag})
+    return client.get(path, headers=headers)
+
+
+def test_matching_etag_gets_304(client, users):
+    first = get(client, '/api/health-metrics/', users[0])
+    assert first.status_code == 200
+    assert first.headers['ETag'].startswith('W/"')
+    assert first.headers['Cache-Control'] == 'private, no-cache'
+
+    again = get(client, '/api/health-metrics/', users[0], first.headers['ETag'])
+    assert again.status_code == 304
+    assert again.data == b''
+    assert again.headers['ETag'] == first.headers['ETag']
+
+
+@pytest.mark.parametrize('header', [
+    lambda tag: tag[2:],                       # strong form of the weak tag
+    lambda tag: f'W/"other", {tag}',
+    lambda tag: '*',
+])
+def test_if_none_match_forms(client, users, header):
+    etag = get(client, '/api/health-metrics/', users[0]).headers['ETag']
+    assert get(client, '/api/health-metrics/', users[0], header(etag)).status_code == 304
+
+
+def test_tags_are_per_user(client, users):
+    # Both lists are empty, yet one user's tag must not validate the other's response
+    empty_a = get(client, '/api/emergency-contacts/', users[0])
+    empty_b = get(client, '/api/emergency-contacts/', users[1])
+    assert empty_a.get_json() == empty_b.get_json() == []
+    assert empty_a.headers['ETag'] != empty_b.headers['ETag']
+    assert get(client, '/api/emergency-contacts/', users[1], empty_a.headers['ETag']).status_code == 200
+
+
+def test_same_url_gets_a_different_tag_per_user(client, users):
+    # A detail URL depends only on its record, so the user alone tells the tags apart
+    mine = client.post('/api/health-metrics/', json={'value': 1}, headers=users[0]).get_json()
+    path = f"/api/health-metrics/{mine['id']}/"
+    etag = get(client, path, users[0]).headers['ETag']
+    assert get(client, path, users[1], etag).status_code != 304
+
+
+def test_query_string_is_part_of_the_tag(client, users):
+    plain = get(client, '/api/health-metrics/', users[0]).headers['ETag']
+    assert get(client, '/api/health-metrics/?fields=id', users[0], plain).status_code == 200
+
+
+def test_own_write_changes_the_tag_and_others_writes_do_not(client, users):
+    etag = get(client, '/api/health-metrics/', users[0]).headers['ETag']
+
+    client.post('/api/health-metrics/', json={'metric_type': 'weight', 'value': 70}, headers=users[1])
+    assert get(client, '/api/health-metrics/', users[0], etag).status_code == 304
+
+    client.post('/api/health-metrics/', json={'metric_type': 'weight', 'value': 71}, headers=users[0])
+    changed = get(client, '/api/health-metrics/', users[0], etag)
+    assert changed.status_code == 200
+    assert [m['value'] for m in changed.get_json()][0] == 71
+
+
+def test_detail_tag_follows_its_record(client, users):
+    mine = client.post('/api/health-metrics/', json={'value': 1}, headers=users[0]).get_json()
+    other = client.post('/api/health-metrics/', json={'value': 2}, headers=users[0]).get_json()
+    path = f"/api/health-metrics/{mine['id']}/"
+    etag = get(client, path, users[0]).headers['ETag']
+
+    client.put(f"/api/health-metrics/{other['id']}/", json={'value': 3}, headers=users[0])
+    assert get(client, path, users[0], etag).status_code == 304
+
+    client.put(path, json={'value': 4}, headers=users[0])
+    assert get(client, path, users[0], etag).status_code == 200
+
+
+def test_another_workers_write_is_never_answered_with_304(client, users):
+    mine = client.post('/api/health-metrics/', json={'value': 1}, headers=users[0]).get_json()
+    list_tag = get(client, '/api/health-metrics/', users[0]).headers['ETag']
+    detail_tag = get(client, f"/api/health-metrics/{mine['id']}/", users[0]).headers['ETag']
+
+    in_another_process(lambda: health_metrics_db.update(mine['id'], {'value': 5}))
+
+    assert get(client, '/api/health-metrics/', users[0], list_tag).status_code == 200
+    response = get(client, f"/api/health-metrics/{mine['id']}/", users[0], detail_tag)
+    assert response.status_code == 200
+    assert response.get_json()['value'] == 5
+
+
+def test_writes_ignore_if_none_match(client, users):
+    mine = client.post('/api/health-metrics/', json={'value': 1}, headers=users[0]).get_json()
+    path = f"/api/health-metrics/{mine['id']}/"
+    etag = get(client, path, users[0]).headers['ETag']
+    response = client.put(path, json={'value': 2}, headers=dict(users[0], **{'If-None-Match': etag}))
+    assert response.status_code == 200
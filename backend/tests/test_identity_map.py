@@ -0,0 +1,74 @@
+"""Request identity map: reads load once per request, and writes drop the collection's entries."""
+
+import pytest
+from flask import g
+
+from api.identity_map import IdentityMap
+from api.json_db import JsonCollection
+
+
+@pytest.fixture
+def request_map(app):
+    """An active identity map, as open_identity_map() sets up for each request."""
+    with app.app_context():
+        g.identity_map = IdentityMap()
+        yield g.identity_map
+
+
+@pytest.fixture
+def items(tmp_path):
+    collection = JsonCollection('items', data_dir=tmp_path)
+    collection.create({'owner': 1, 'value': 'a'})
+    collection.create({'owner': 2, 'value': 'b'})
+    return collection
+
+
+def test_repeated_reads_load_once(request_map, items):
+    for _ in range(3):
+        items.get(1)
+        items.filter(owner=1)
+    assert (request_map.misses, request_map.hits) == (2, 4)
+
+
+def test_results_are_copies(request_map, items):
+    items.get(1)['value'] = 'mutated'
+    items.filter(owner=1)[0]['value'] = 'mutated'
+    assert items.get(1)['value'] == 'a'
+    assert items.filter(owner=1)[0]['value'] == 'a'
+
+
+@pytest.mark.parametrize('write, expected', [
+    (lambda c: c.create({'owner': 1, 'value': 'c'}), ['a', 'c']),
+    (lambda c: c.update(1, {'value': 'changed'}), ['changed']),
+    (lambda c: c.delete(1), []),
+])
+def test_write_drops_cached_reads(request_map, items, write, expected):
+    assert [r['value'] for r in items.filter(owner=1)] == ['a']  # now cached
+    write(items)
+    assert [r['value'] for r in items.filter(owner=1)] == expected
+    assert [r['value'] for r in items.get_all() if r['owner'] == 1] == expected
+
+
+def test_write_keeps_other_collections_cached(request_map, items, tmp_path):
+    others = JsonCollection('others', data_dir=tmp_path)
+    others.create({'value': 'x'})
+    others.get_all()
+    items.get_all()
+
+    items.update(1, {'value': 'changed'})
+    hits = request_map.hits
+    others.get_all()
+    assert request_map.hits == hits + 1
+    assert items.get(1)['value'] == 'changed'
+
+
+def test_projection_does_not_replace_the_full_records(request_map, items):
+    assert items.get_all(fields=('id',)) == [{'id': 1}, {'id': 2}]
+    assert items.get_all()[0] == dict(items.get(1))
+    assert 'value' in items.get_all()[0]
+
+
+def test_no_map_outside_a_request(items):
+    items.get(1)
+    items.update(1, {'value': 'changed'})
+    assert items.get(1)['value'] == 'changed'
@@ -0,0 +1,138 @@
+"""Collection files: checksums, restore from backup, and the cross-process file lock."""
+
+import json
+import os
+import time
+
+from api.json_db import JsonCollection, CORRUPT_DIR_NAME, _serialize
+
+
+def _tamper(collection, old, new):
+    """Rewrite the file as another process would: still valid JSON, stale checksum."""
+    raw = collection.filepath.read_text().replace(old, new)
+    time.sleep(0.01)  # a new mtime, so the stat signature changes
+    collection.filepath.write_text(raw)
+
+
+def _collection(tmp_path, name='items'):
+    collection = JsonCollection(name, data_dir=tmp_path)
+    collection.create({'value': 1})
+    collection.create({'value': 2})
+    return collection
+
+
+def test_verify_passes_an_intact_file(tmp_path):
+    report = _collection(tmp_path).verify()
+    assert report['status'] == 'ok'
+    assert report['action'] == 'none'
+    assert report['records'] == 2
+
+
+def test_unparseable_file_is_restored_from_backup(tmp_path):
+    collection = _collection(tmp_path)
+    collection.filepath.write_text('{"auto_id": 2, "records": [')
+
+    report = collection.verify()
+
+    assert report['action'] == 'restored'
+    assert [r['value'] for r in collection.get_all()] == [1, 2]
+    assert list((tmp_path / CORRUPT_DIR_NAME).iterdir())
+
+
+def test_checksum_mismatch_is_restored_at_startup(tmp_path):
+    _tamper(_collection(tmp_path), '"value": 2', '"value": 9')
+
+    report = JsonCollection('items', data_dir=tmp_path).verify()
+
+    assert (report['status'], report['action']) == ('corrupt', 'restored')
+    assert [r['value'] for r in JsonCollection('items', data_dir=tmp_path).get_all()] == [1, 2]
+
+
+def test_checksum_mismatch_is_caught_on_reload(tmp_path):
+    collection = _collection(tmp_path)
+    events = []
+    collection.add_listener(lambda event, record, previous: events.append(event))
+
+    _tamper(collection, '"value": 2', '"value": 9')
+
+    assert [r['value'] for r in collection.get_all()] == [1, 2]
+    assert 'reload' in events
+    assert list((tmp_path / CORRUPT_DIR_NAME).iterdir())
+
+
+def test_foreign_write_with_valid_checksum_is_loaded(tmp_path):
+    collection = _collection(tmp_path)
+    other = JsonCollection('items', data_dir=tmp_path)  # stands in for another worker
+
+    other.create({'value': 3})
+
+    assert [r['value'] for r in collection.get_all()] == [1, 2, 3]
+    assert not (tmp_path / CORRUPT_DIR_NAME).exists()
+
+
+def test_validator_sees_a_rewrite_the_stat_signature_misses(tmp_path):
+    """Same inode, size and mtime (a reused inode within one mtime tick) but new content."""
+    collection = _collection(tmp_path)
+    other = JsonCollection('items', data_dir=tmp_path)
+    before = collection.validator_of()
+    assert other.validator_of() == before
+
+    st = os.stat(collection.filepath)
+    data = json.loads(collection.filepath.read_text())
+    data['records'][1]['value'] = 9
+    with open(collection.filepath, 'r+b') as f:  # in place, valid checksum
+        f.write(_serialize(data).encode())
+    os.utime(collection.filepath, ns=(st.st_atime_ns, st.st_mtime_ns))
+    assert os.stat(collection.filepath).st_size == st.st_size
+
+    assert collection.validator_of() != before
+    assert collection.validator_of('id', 2) != before
+    # A plain read notices it too, so caches kept on reloads are dropped
+    events = []
+    other.add_listener(lambda event, record, previous: events.append(event))
+    assert [r['value'] for r in other.get_all()] == [1, 9]
+    assert events == ['reload']
+    assert other.validator_of() == collection.validator_of()
+
+
+def test_writes_leave_no_temp_files(tmp_path):
+    collection = _collection(tmp_path)
+    collection.update(1, {'value': 10})
+    collection.delete(2)
+    assert not [p for p in os.listdir(tmp_path) if p.endswith('.tmp')]
+    assert json.loads(collection.filepath.read_text())['checksum']
+
+
+def test_file_lock_is_reentrant_around_writes(tmp_path):
+    collection = _collection(tmp_path)
+    with collection.file_lock():
+        with collection.file_lock():
+            collection.create({'value': 3})
+    assert collection.count() == 3
+
+
+def test_read_path_recovery_waits_for_another_workers_write(tmp_path):
+    collection = _collection(tmp_path)
+    _tamper(collection, '"value": 2', '"value": 9')
+    ready_r, ready_w = os.pipe()
+
+    pid = os.fork()
+    if pid == 0:
+        try:
+            # Another worker: holds the file lock, then writes a good file
+            other = JsonCollection('items', data_dir=tmp_path)
+            with other.file_lock():
+                os.write(ready_w, b'1')
+                time.sleep(0.3)
+                other._write_raw({'auto_id': 3, 'records': [{'id': 3, 'value': 42}]})
+        finally:
+            os._exit(0)
+    os.read(ready_r, 1)
+
+    values = [r['value'] for r in collection.get_all()]
+    os.waitpid(pid, 0)
+
+    # The read waited for the lock and kept the newer file instead of an old backup
+    assert values == [42]
+    assert [r['value'] for r in collection.get_all()] == [42]
+    assert not (tmp_path / CORRUPT_DIR_NAME).exists()
@@ -0,0 +1,143 @@
+"""Message store: unread counters and read receipts against a recount, across workers and over HTTP."""
+
+import os
+import random
+
+import pytest
+
+from api.message_store import MessageStore, conversation_key
+from conftest import in_another_process, make_user
+
+USERS = (1, 2, 3, 4)
+
+
+@pytest.fixture
+def store(tmp_path):
+    return MessageStore(str(tmp_path / 'messages.sqlite3'))
+
+
+def recount(store, user_id):
+    """Unread messages per conversation, counted from the rows themselves."""
+    conn = store._connect()
+    return dict(conn.execute(
+        'SELECT m.conversation, COUNT(*) FROM messages m'
+        ' JOIN participants p ON p.user_id = m.recipient AND p.conversation = m.conversation'
+        ' WHERE m.recipient = ? AND m.id > p.last_read_id GROUP BY m.conversation', (user_id,),
+    ).fetchall())
+
+
+def assert_counters_match(store):
+    for user in USERS:
+        expected = recount(store, user)
+        listed = {conversation_key(user, c['peer']): c['unread']
+                  for c in store.conversations(user, limit=200)['results']}
+        assert {k: v for k, v in listed.items() if v} == expected
+        assert store.unread_count(user) == sum(expected.values())
+
+
+@pytest.mark.parametrize('seed', range(3))
+def test_counters_match_a_recount(store, seed):
+    rng = random.Random(seed)
+    sent = []
+    for _ in range(150):
+        if sent and rng.random() < 0.3:
+            message = rng.choice(sent)
+            # The recipient reads up to some message, possibly one already read
+            store.mark_read(message['recipient'], message['id'])
+        else:
+            sender, recipient = rng.sample(USERS, 2)
+            sent.append(store.send(sender, recipient, 'hi'))
+        assert_counters_match(store)
+
+
+def test_read_receipt_counts_only_messages_to_the_reader(store):
+    a, b = USERS[:2]
+    store.send(a, b, 'one')
+    store.send(b, a, 'reply')
+    last = store.send(a, b, 'two')
+
+    receipt = store.mark_read(b, last['id'])
+    assert (receipt['newly_read'], receipt['unread']) == (2, 0)
+    assert store.unread_count(b) == 0
+    assert store.unread_count(a) == 1
+
+
+def test_reading_an_older_message_changes_nothing(store):
+    a, b = USERS[:2]
+    first = store.send(a, b, 'one')
+    second = store.send(a, b, 'two')
+    store.mark_read(b, second['id'])
+    events = []
+    store.add_listener(lambda event, payload: events.append(event))
+
+    receipt = store.mark_read(b, first['id'])
+    assert (receipt['newly_read'], receipt['last_read_id']) == (0, second['id'])
+    assert events == []
+    assert store.unread_count(b) == 0
+
+
+def test_only_the_recipient_can_mark_read(store):
+    a, b, c = USERS[:3]
+    message = store.send(a, b, 'one')
+    assert store.mark_read(a, message['id']) is None
+    assert store.mark_read(c, message['id']) is None
+    assert store.mark_read(b, 10 ** 9) is None
+    assert store.unread_count(b) == 1
+
+
+def test_history_marks_what_the_peer_has_read(store):
+    a, b = USERS[:2]
+    first = store.send(a, b, 'one')
+    store.send(a, b, 'two')
+    store.mark_read(b, first['id'])
+    page = store.history(a, b)
+    assert [m['read'] for m in page['results']] == [True, False]
+    assert page['peer_last_read_id'] == first['id']
+
+
+def test_workers_sending_at_once_keep_counters_exact(store):
+    def send_many(sender):
+        worker_store = MessageStore(store.path)
+        for _ in range(50):
+            worker_store.send(sender, USERS[0], 'hi')
+
+    pids = []
+    for sender in USERS[1:]:
+        pid = os.fork()
+        if pid == 0:
+            try:
+                send_many(sender)
+            finally:
+                os._exit(0)
+        pids.append(pid)
+    for pid in pids:
+        os.waitpid(pid, 0)
+
+    assert store.unread_count(USERS[0]) == 150
+    assert_counters_match(store)
+    # A receipt covers one conversation: the other two senders' 100 stay unread
+    in_another_process(lambda: MessageStore(store.path).mark_read(USERS[0], store.latest_id()))
+    assert store.unread_count(USERS[0]) == 100
+    assert_counters_match(store)
+
+
+def test_unread_endpoints(client):
+    sender, sender_headers = make_user('msg-sender')
+    reader, reader_headers = make_user('msg-reader')
+    for text in ('one', 'two'):
+        response = client.post('/api/messages/', json={'recipient_id': reader['id'], 'text': text},
+                               headers=sender_headers)
+        assert response.status_code == 201
+    last = response.get_json()
+
+    assert client.get('/api/messages/unread/', headers=reader_headers).get_json() == {'unread': 2}
+    listed = client.get('/api/messages/', headers=reader_headers).get_json()
+    assert listed['unread'] == 2
+    assert [(c['peer'], c['unread']) for c in listed['results']] == [(sender['id'], 2)]
+
+    assert client.patch(f"/api/messages/{last['id']}/", json={'read': False},
+                        headers=reader_headers).status_code == 400
+    assert client.patch(f"/api/messages/{last['id']}/", headers=sender_headers).status_code == 404
+    receipt = client.patch(f"/api/messages/{last['id']}/", headers=reader_headers).get_json()
+    assert receipt['newly_read'] == 2
+    assert client.get('/api/messages/unread/', headers=reader_headers).get_json() == {'unread': 0}
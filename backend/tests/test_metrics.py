@@ -0,0 +1,23 @@
+"""Admin-only observability routes and the METRICS_TOKEN scrape credential."""
+
+import pytest
+
+import app as app_module
+
+
+@pytest.mark.parametrize('path', ['/api/debug/timing/', '/api/metrics'])
+def test_admin_routes(client, patient, admin, path):
+    assert client.get(path).status_code == 401
+    assert client.get(path, headers=patient[1]).status_code == 403
+    assert client.get(path, headers=admin[1]).status_code == 200
+
+
+def test_metrics_token(client, monkeypatch):
+    monkeypatch.setattr(app_module, 'METRICS_TOKEN', 'scrape-me')
+    assert client.get('/api/metrics', headers={'Authorization': 'Bearer scrape-me'}).status_code == 200
+    assert client.get('/api/metrics', headers={'Authorization': 'Bearer guess'}).status_code == 401
+
+
+def test_metrics_token_unset_is_not_a_bypass(client, monkeypatch):
+    monkeypatch.setattr(app_module, 'METRICS_TOKEN', '')
+    assert client.get('/api/metrics', headers={'Authorization': 'Bearer '}).status_code == 401
@@ -0,0 +1,78 @@
+"""Login through the password-hashing pool, and the pool's limits."""
+
+import os
+import subprocess
+import sys
+import textwrap
+from concurrent.futures import Future
+
+import pytest
+
+from conftest import BACKEND_DIR
+from password_service import HashingBusyError, PasswordHasher
+
+
+def test_login(client, patient):
+    response = client.post('/api/auth/login/', json={'username': 'patient', 'password': 'pass-1234'})
+    assert response.status_code == 200
+    token = response.get_json()['token']
+    assert client.get('/api/auth/me/', headers={'Authorization': f'Bearer {token}'}).status_code == 200
+
+
+@pytest.mark.parametrize('credentials, status', [
+    ({'username': 'patient', 'password': 'wrong'}, 401),
+    ({'username': 'nobody', 'password': 'pass-1234'}, 401),
+    ({'username': 'patient'}, 400),
+])
+def test_login_failures(client, patient, credentials, status):
+    assert client.post('/api/auth/login/', json=credentials).status_code == status
+
+
+# ── Hashing pool ─────────────────────────────────
+
+def test_inline_mode_uses_default_pending_limit():
+    hasher = PasswordHasher(workers=0)
+    stored = hasher.hash('secret')
+    assert hasher.verify('secret', stored)
+    assert not hasher.verify('wrong', stored)
+
+
+def test_zero_pending_is_rejected():
+    with pytest.raises(ValueError):
+        PasswordHasher(workers=0, max_pending=0)
+
+
+def test_default_pending_limit_never_zero():
+    # Module constants are read at import, so check them in a fresh interpreter
+    code = ('import password_service as p; assert p.HASH_MAX_PENDING == 4; '
+            'assert p.verify_password("pw", p.hash_password("pw"))')
+    env = {k: v for k, v in os.environ.items() if k != 'HASH_MAX_PENDING'}
+    subprocess.run([sys.executable, '-c', code], check=True, timeout=60, cwd=BACKEND_DIR,
+                   env=dict(env, HASH_WORKERS='0'))
+
+
+def test_slow_hash_times_out_as_busy():
+    hasher = PasswordHasher(workers=0, result_timeout=0.01)
+    hasher.submit = lambda fn, *args: Future()  # never completes
+    with pytest.raises(HashingBusyError):
+        hasher.hash('secret')
+
+
+def test_pool_workers_do_not_import_the_entry_script(tmp_path):
+    # Run as a script: its __main__ must not be re-imported in the pool's workers
+    marker = tmp_path / 'imports'
+    script = tmp_path / 'entry.py'
+    script.write_text(textwrap.dedent(f'''
+        import os, sys
+        with open({str(marker)!r}, 'a') as f:
+            f.write(str(os.getpid()) + '\\n')
+        sys.path.insert(0, {str(BACKEND_DIR)!r})
+        from password_service import PasswordHasher, check_hash
+
+        if __name__ == '__main__':
+            hasher = PasswordHasher(workers=2)
+            assert check_hash('pw', hasher.hash('pw'))
+            hasher.shutdown(wait=True)
+    '''))
+    subprocess.run([sys.executable, str(script)], check=True, timeout=60)
+    assert len(marker.read_text().split()) == 1
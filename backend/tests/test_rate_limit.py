@@ -0,0 +1,145 @@
+"""Sliding-window rate limiter: window math, Retry-After, and both backends."""
+
+import random
+from types import SimpleNamespace
+
+import pytest
+from flask import Flask
+
+import rate_limit
+from conftest import in_another_process
+from rate_limit import MemoryBackend, RateLimiter, SQLiteBackend
+
+WINDOW = 10
+START = 1_000_000.0  # a window boundary
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Settable time for the limiter (and the SQLite purge)."""
+    now = SimpleNamespace(value=START)
+    monkeypatch.setattr(rate_limit, 'time', SimpleNamespace(time=lambda: now.value))
+    return now
+
+
+@pytest.fixture(params=['memory', 'sqlite'])
+def backend(request, tmp_path):
+    if request.param == 'memory':
+        return MemoryBackend()
+    return SQLiteBackend(str(tmp_path / 'limits.sqlite3'))
+
+
+def hits(limiter, clock, at, key='k'):
+    clock.value = START + at
+    return limiter.hit(key)
+
+
+def test_limit_within_one_window(backend, clock):
+    limiter = RateLimiter(3, WINDOW, backend=backend)
+    assert [hits(limiter, clock, 1).remaining for _ in range(3)] == [2, 1, 0]
+    denied = hits(limiter, clock, 2)
+    assert not denied.allowed
+    assert denied.remaining == 0
+    assert hits(limiter, clock, 2, key='other').allowed
+
+
+@pytest.mark.parametrize('at, allowed', [
+    (9.9, False),   # same window
+    (10, False),    # next window, previous still counts in full
+    (13, False),    # 3 * 0.7 + 1 > 3
+    (13.4, True),   # 3 * 0.66 + 1 <= 3
+    (20, True),     # previous window has slid out entirely
+    (35, True),     # idle for more than a window
+])
+def test_previous_window_slides_out(backend, clock, at, allowed):
+    limiter = RateLimiter(3, WINDOW, backend=backend)
+    for _ in range(3):
+        hits(limiter, clock, 0)
+    assert hits(limiter, clock, at).allowed is allowed
+
+
+def test_retry_after_is_when_a_hit_fits_again(backend, clock):
+    limiter = RateLimiter(3, WINDOW, backend=backend)
+    for _ in range(3):
+        hits(limiter, clock, 0)
+    denied = hits(limiter, clock, 10)
+    assert denied.retry_after == 4  # 10 * (1 - 2/3) = 3.33 s into the window
+    assert not limiter.check('k').allowed
+    assert hits(limiter, clock, 10 + denied.retry_after).allowed
+
+
+def test_retry_after_never_undershoots(backend, clock):
+    rng = random.Random(7)
+    limiter = RateLimiter(5, WINDOW, backend=backend)
+    at = 0.0
+    for _ in range(300):
+        at += rng.choice([0, 0, 0.5, 1, 3])
+        result = hits(limiter, clock, at)
+        if not result.allowed:
+            assert 1 <= result.retry_after <= 2 * WINDOW
+            clock.value = START + at + result.retry_after
+            assert limiter.check('k').allowed
+
+
+def test_check_does_not_count(backend, clock):
+    limiter = RateLimiter(1, WINDOW, backend=backend)
+    clock.value = START
+    assert limiter.check('k').allowed
+    assert limiter.check('k').allowed
+    assert limiter.hit('k').allowed
+    assert not limiter.check('k').allowed
+
+
+def test_reset_clears_the_key(backend, clock):
+    limiter = RateLimiter(1, WINDOW, backend=backend)
+    assert hits(limiter, clock, 0).allowed
+    limiter.reset('k')
+    assert hits(limiter, clock, 0).allowed
+
+
+def test_scopes_are_separate(backend, clock):
+    login, signup = (RateLimiter(1, WINDOW, scope=s, backend=backend) for s in ('login', 'signup'))
+    assert hits(login, clock, 0).allowed
+    assert hits(signup, clock, 0).allowed
+    assert not hits(login, clock, 0).allowed
+
+
+def test_memory_backend_evicts_least_recent_keys(clock):
+    backend = MemoryBackend(max_keys=2)
+    limiter = RateLimiter(1, WINDOW, backend=backend)
+    for key in ('a', 'b', 'a', 'c'):
+        hits(limiter, clock, 0, key)
+    assert len(backend) == 2
+    assert not hits(limiter, clock, 0, 'a').allowed    # used recently, so kept
+    assert hits(limiter, clock, 0, 'b').allowed        # evicted, so counting starts over
+
+
+def test_sqlite_backend_is_shared_between_processes(tmp_path, clock):
+    path = str(tmp_path / 'limits.sqlite3')
+    limiter = RateLimiter(3, WINDOW, backend=SQLiteBackend(path))
+    hits(limiter, clock, 0)
+
+    def other_worker():
+        other = RateLimiter(3, WINDOW, backend=SQLiteBackend(path))
+        assert hits(other, clock, 0).remaining == 1
+        hits(other, clock, 0)
+
+    in_another_process(other_worker)
+    assert not hits(limiter, clock, 0).allowed
+
+
+def test_decorator_answers_429_with_retry_after(clock):
+    app = Flask(__name__)
+
+    @app.route('/limited/')
+    @rate_limit.rate_limit(2, WINDOW, key=lambda: 'caller', backend=MemoryBackend())
+    def limited():
+        return {'ok': True}
+
+    client = app.test_client()
+    clock.value = START
+    assert [client.get('/limited/').headers['X-RateLimit-Remaining'] for _ in range(2)] == ['1', '0']
+    refused = client.get('/limited/')
+    assert refused.status_code == 429
+    assert refused.headers['Retry-After'] == '15'  # half of the next window must slide by
+    assert refused.get_json()['detail'] == 'Please try again in 15 seconds.'
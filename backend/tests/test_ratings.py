@@ -0,0 +1,130 @@
+"""Doctor reviews: input validation, the ranked leaderboard and aggregates against a full scan."""
+
+import random
+from collections import defaultdict
+from datetime import datetime
+
+import pytest
+
+from api.json_db import doctor_reviews_db
+from conftest import in_another_process, make_user
+from rating_service import RATING_PRIOR_MEAN, RATING_PRIOR_WEIGHT, _rating, _weight, rating_index
+
+
+@pytest.fixture(scope='module')
+def doctor(app):
+    return make_user('reviewed-doctor', user_type='doctor')[0]
+
+
+@pytest.mark.parametrize('value', ['x', None, '5', 5.0, True, [1], 999_999])
+def test_review_needs_a_registered_doctor(client, patient, doctor, value):
+    response = client.post('/api/doctor-reviews/', json={'doctor': value, 'rating': 5}, headers=patient[1])
+    assert response.status_code == 400
+    assert response.get_json()['error'] == 'Invalid doctor'
+
+
+def test_review_of_a_patient_is_rejected(client, patient):
+    response = client.post('/api/doctor-reviews/', json={'doctor': patient[0]['id'], 'rating': 5},
+                           headers=patient[1])
+    assert response.status_code == 400
+
+
+def test_review_of_a_doctor_is_ranked(client, patient, doctor):
+    response = client.post('/api/doctor-reviews/', json={'doctor': doctor['id'], 'rating': 4},
+                           headers=patient[1])
+    assert response.status_code == 201
+    assert rating_index.summary(doctor['id'])['count'] >= 1
+
+
+def test_mixed_doctor_types_in_stored_reviews_still_rank(client, patient):
+    # Data written before validation existed: equal scores force the tie-break
+    for doctor in ('x', 424242, '424242', 'y'):
+        doctor_reviews_db.create({'doctor': doctor, 'patient': 1, 'rating': 3})
+    doctor_reviews_db.create({'doctor': {'bad': 1}, 'patient': 1, 'rating': 3})
+
+    rating_index.build()
+    response = client.get('/api/doctor-reviews/leaderboard/?limit=100&sort=score', headers=patient[1])
+    assert response.status_code == 200
+    ranked = [entry['doctor'] for entry in response.get_json()['results']]
+    assert {'x', 424242, '424242', 'y'} <= set(ranked)
+    assert ranked.index(424242) < ranked.index('424242')  # integer ids order first on ties
+
+
+# ── Aggregates against a full scan ───────────────
+
+DOCTORS = range(60_001, 60_005)
+
+
+def full_scan():
+    """Each doctor's summary recomputed from every stored review."""
+    reviews = defaultdict(list)
+    for r in doctor_reviews_db.get_all():
+        if r.get('doctor') in DOCTORS and _rating(r) is not None:
+            reviews[r['doctor']].append((_rating(r), _weight(r)))
+    summaries = {}
+    for doctor, rows in reviews.items():
+        total = sum(rating for rating, _ in rows)
+        weights = sum(weight for _, weight in rows)
+        summaries[doctor] = {
+            'doctor': doctor, 'count': len(rows),
+            'average': round(total / len(rows), 2),
+            'recent_average': round(sum(rating * weight for rating, weight in rows) / weights, 2),
+            'score': round((total + RATING_PRIOR_MEAN * RATING_PRIOR_WEIGHT)
+                           / (len(rows) + RATING_PRIOR_WEIGHT), 3),
+            'histogram': {str(stars): sum(1 for rating, _ in rows if rating == stars)
+                          for stars in range(1, 6)},
+        }
+    return summaries
+
+
+def random_reviews(seed, n=40):
+    rng = random.Random(seed)
+
+    def make():
+        return {
+            'doctor': rng.choice(DOCTORS), 'patient': 1,
+            'rating': rng.choice([1, 2, 3, 4, 5, 5, '4', 0, 6, 'x']),
+            'created_at': datetime(2024 + rng.randint(0, 3), rng.randint(1, 12), 1).isoformat(),
+        }
+
+    for _ in range(n):
+        mine = [r['id'] for r in doctor_reviews_db.filter_fn(lambda r: r.get('doctor') in DOCTORS)]
+        action = rng.random()
+        if mine and action < 0.2:
+            doctor_reviews_db.delete(rng.choice(mine))
+        elif mine and action < 0.5:
+            doctor_reviews_db.update(rng.choice(mine), make())
+        else:
+            doctor_reviews_db.create(make())
+
+
+def assert_matches_full_scan():
+    expected = full_scan()
+    for doctor in DOCTORS:
+        summary = rating_index.summary(doctor)
+        if doctor not in expected:
+            assert summary['count'] == 0
+            continue
+        assert summary['recent_average'] == pytest.approx(expected[doctor].pop('recent_average'), abs=0.01)
+        del summary['recent_average']
+        assert summary == expected[doctor]
+    ranked = [row['doctor'] for row in rating_index.leaderboard(limit=len(DOCTORS), include=DOCTORS.__contains__)]
+    assert ranked == sorted(expected, key=lambda d: (-expected[d]['score'], -expected[d]['count'], d))
+
+
+@pytest.mark.parametrize('seed', range(3))
+def test_aggregates_match_a_full_scan(seed):
+    rating_index.ensure_built()  # everything below arrives through the listener
+    random_reviews(seed)
+    assert_matches_full_scan()
+
+
+def test_aggregates_match_a_full_scan_after_another_worker_writes(monkeypatch):
+    rating_index.ensure_built()
+    builds = []
+    original = rating_index.build
+    monkeypatch.setattr(rating_index, 'build', lambda: (builds.append(1), original())[1])
+
+    in_another_process(lambda: random_reviews(seed=99))
+    assert_matches_full_scan()
+    assert len(builds) == 1
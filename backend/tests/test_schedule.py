@@ -0,0 +1,191 @@
+"""Schedule index: conflict boundaries, bookings checked against the file, timelines against a full scan."""
+
+from datetime import datetime, timedelta
+import random
+from itertools import count
+
+import pytest
+
+from api.json_db import appointments_db
+from conftest import in_another_process
+from schedule_service import ScheduleIndex, appointment_interval, schedule_index
+
+DAY = datetime(2031, 3, 3)
+_doctors = count(10_000)
+
+
+def at(hh_mm: str) -> datetime:
+    hours, minutes = map(int, hh_mm.split(':'))
+    return DAY.replace(hour=hours, minute=minutes)
+
+
+def book(doctor, start: str, minutes=30, status='scheduled'):
+    return appointments_db.create({
+        'doctor': doctor, 'patient': 1, 'status': status,
+        'appointment_date': at(start).isoformat(), 'duration': minutes,
+    })
+
+
+@pytest.fixture
+def doctor():
+    """A doctor with one 10:00-10:30 appointment."""
+    doctor = next(_doctors)
+    book(doctor, '10:00')
+    return doctor
+
+
+@pytest.mark.parametrize('start, end', [
+    ('09:30', '10:00'),  # ends exactly when the booking starts
+    ('10:30', '11:00'),  # starts exactly when the booking ends
+    ('08:00', '09:59'),
+])
+def test_touching_intervals_do_not_conflict(doctor, start, end):
+    assert schedule_index.conflicts(doctor, at(start), at(end)) == []
+
+
+@pytest.mark.parametrize('start, end', [
+    ('09:31', '10:01'),  # overlaps the first minute
+    ('10:29', '10:59'),  # overlaps the last minute
+    ('10:10', '10:20'),  # inside
+    ('09:00', '11:00'),  # around
+    ('10:00', '10:30'),  # identical
+])
+def test_overlapping_intervals_conflict(doctor, start, end):
+    [hit] = schedule_index.conflicts(doctor, at(start), at(end))
+    assert (hit['start'], hit['end']) == (at('10:00').isoformat(), at('10:30').isoformat())
+
+
+def test_long_earlier_appointment_is_found():
+    doctor = next(_doctors)
+    book(doctor, '08:00', minutes=180)
+    book(doctor, '10:45', minutes=15)
+    hits = schedule_index.conflicts(doctor, at('10:50'), at('10:55'))
+    assert sorted(h['start'] for h in hits) == [at('08:00').isoformat(), at('10:45').isoformat()]
+
+
+def test_inactive_and_other_doctors_do_not_conflict(doctor):
+    other = next(_doctors)
+    book(other, '12:00', status='cancelled')
+    book(other, '12:00', status='completed')
+    assert schedule_index.conflicts(other, at('12:00'), at('12:30')) == []
+    assert schedule_index.conflicts(doctor, at('12:00'), at('12:30')) == []
+
+
+def test_excluded_appointment_and_updates():
+    doctor = next(_doctors)
+    record = book(doctor, '14:00')
+    assert schedule_index.conflicts(doctor, at('14:00'), at('14:30'), exclude=record['id']) == []
+
+    appointments_db.update(record['id'], {'appointment_date': at('15:00').isoformat()})
+    assert schedule_index.conflicts(doctor, at('14:00'), at('14:30')) == []
+    assert schedule_index.conflicts(doctor, at('15:15'), at('15:45'))
+
+    appointments_db.update(record['id'], {'status': 'cancelled'})
+    assert schedule_index.conflicts(doctor, at('15:00'), at('15:30')) == []
+
+
+def test_booking_endpoint_rejects_overlap_with_409(client, patient):
+    _, headers = patient
+    doctor = next(_doctors)
+    first = {'doctor': doctor, 'appointment_date': at('16:00').isoformat()}
+    assert client.post('/api/appointments/', json=first, headers=headers).status_code == 201
+    clash = dict(first, appointment_date=(at('16:00') + timedelta(minutes=29)).isoformat())
+    assert client.post('/api/appointments/', json=clash, headers=headers).status_code == 409
+    after = dict(first, appointment_date=at('16:30').isoformat())
+    assert client.post('/api/appointments/', json=after, headers=headers).status_code == 201
+
+
+@pytest.mark.parametrize('change, status', [
+    (lambda pk: appointments_db.delete(pk), 404),
+    (lambda pk: appointments_db.update(pk, {'duration': 120}), 409),
+])
+def test_update_sees_changes_made_by_another_worker(client, patient, monkeypatch, change, status):
+    _, headers = patient
+    doctor = next(_doctors)
+    record = book(doctor, '09:00')
+    book(doctor, '11:00')
+
+    original = ScheduleIndex.booking
+
+    def booking_after_foreign_change(self):
+        # The view has already loaded the appointment into the identity map
+        in_another_process(lambda: change(record['id']))
+        return original(self)
+
+    monkeypatch.setattr(ScheduleIndex, 'booking', booking_after_foreign_change)
+    response = client.put(f"/api/appointments/{record['id']}/",
+                          json={'appointment_date': at('10:00').isoformat()}, headers=headers)
+    assert response.status_code == status
+
+
+# ── Timelines against a full scan ────────────────
+
+DOCTORS = range(70_001, 70_004)
+PATIENTS = range(70_101, 70_104)
+WEEK = (DAY - timedelta(days=3), DAY + timedelta(days=4))
+
+
+def full_scan():
+    """Every doctor's and patient's active intervals, from all stored appointments."""
+    doctors, patients = {}, {}
+    for r in appointments_db.get_all():
+        interval = appointment_interval(r)
+        if interval is None:
+            continue
+        entry = (interval[0].isoformat(), interval[1].isoformat(), r['id'])
+        doctors.setdefault(r.get('doctor'), []).append(entry)
+        patients.setdefault(r.get('patient'), []).append(entry)
+    return doctors, patients
+
+
+def random_appointments(seed, n=40):
+    rng = random.Random(seed)
+
+    def make():
+        return {
+            'doctor': rng.choice(DOCTORS), 'patient': rng.choice(PATIENTS),
+            'status': rng.choice(['scheduled', 'confirmed', 'cancelled']),
+            'appointment_date': rng.choice([
+                (DAY + timedelta(days=rng.randint(-2, 2), minutes=15 * rng.randint(30, 70))).isoformat(),
+                'not a date',
+            ]),
+            'duration': rng.choice([15, 30, 90, None, -5]),
+        }
+
+    for _ in range(n):
+        mine = [r['id'] for r in appointments_db.filter_fn(lambda r: r.get('doctor') in DOCTORS)]
+        action = rng.random()
+        if mine and action < 0.2:
+            appointments_db.delete(rng.choice(mine))
+        elif mine and action < 0.5:
+            appointments_db.update(rng.choice(mine), make())
+        else:
+            appointments_db.create(make())
+
+
+def assert_matches_full_scan():
+    doctors, patients = full_scan()
+    for doctor in DOCTORS:
+        expected = sorted(doctors.get(doctor, []))
+        assert [(e['start'], e['end'], e['id']) for e in schedule_index.doctor_range(doctor, *WEEK)] == expected
+    for patient in PATIENTS:
+        expected = [entry[2] for entry in sorted(patients.get(patient, []))]
+        assert schedule_index.patient_upcoming(patient, WEEK[0]) == expected
+
+
+@pytest.mark.parametrize('seed', range(3))
+def test_timelines_match_a_full_scan(seed):
+    schedule_index.ensure_built()  # everything below arrives through the listener
+    random_appointments(seed)
+    assert_matches_full_scan()
+
+
+def test_timelines_match_a_full_scan_after_another_worker_writes(monkeypatch):
+    schedule_index.ensure_built()
+    builds = []
+    original = schedule_index.build
+    monkeypatch.setattr(schedule_index, 'build', lambda: (builds.append(1), original())[1])
+
+    in_another_process(lambda: random_appointments(seed=99))
+    assert_matches_full_scan()
+    assert len(builds) == 1
@@ -0,0 +1,122 @@
+"""Open slots: working hours minus busy intervals, checked against a brute-force walk."""
+
+import random
+from datetime import datetime, time, timedelta
+from itertools import count
+
+import pytest
+
+from api.json_db import appointments_db, user_profiles_db
+from conftest import make_user
+from schedule_service import DEFAULT_HOURS, appointment_interval, parse_working_hours, schedule_index
+
+MONDAY = datetime(2031, 3, 3)
+STEP = timedelta(minutes=15)
+_doctors = count(80_000)
+
+
+def book(doctor, start: datetime, minutes=30, status='scheduled'):
+    return appointments_db.create({
+        'doctor': doctor, 'patient': 1, 'status': status,
+        'appointment_date': start.isoformat(), 'duration': minutes,
+    })
+
+
+def brute_force(doctor, hours, start, end, duration, step=STEP):
+    """Every step-aligned slot inside working hours that overlaps no active appointment."""
+    busy = [appointment_interval(r) for r in appointments_db.filter(doctor=doctor)]
+    busy = [b for b in busy if b is not None]
+    slots = []
+    day = start.replace(hour=0, minute=0, second=0, microsecond=0)
+    while day < end:
+        for opens, closes in hours.get(day.weekday(), ()):
+            t = datetime.combine(day.date(), opens)
+            closing = min(datetime.combine(day.date(), closes), end)
+            while t + duration <= closing:
+                if t >= start and not any(b0 < t + duration and b1 > t for b0, b1 in busy):
+                    slots.append((t, t + duration))
+                t += step
+        day += timedelta(days=1)
+    return slots
+
+
+def slots(doctor, hours, start, end, duration, **kwargs):
+    return list(schedule_index.free_slots(doctor, hours, start, end, duration, limit=10_000, **kwargs))
+
+
+HOURS = [
+    DEFAULT_HOURS,
+    parse_working_hours({'mon': ['08:00-12:00', '12:30-18:00'], 'wed': '10:10-11:50', 'sat': ['09:00-10:00']}),
+]
+
+
+@pytest.mark.parametrize('seed', range(6))
+def test_slots_match_a_brute_force_walk(seed):
+    rng = random.Random(seed)
+    doctor = next(_doctors)
+    for _ in range(rng.randint(0, 25)):
+        # Anywhere in the week, including before opening, across lunch and past midnight
+        start = MONDAY + timedelta(days=rng.randint(0, 6), minutes=rng.randrange(6 * 60, 24 * 60, 5))
+        book(doctor, start, minutes=rng.choice([10, 15, 30, 45, 90, 240]),
+             status=rng.choice(['scheduled', 'confirmed', 'scheduled', 'cancelled']))
+    hours = rng.choice(HOURS)
+    start = MONDAY + timedelta(minutes=rng.randrange(0, 3 * 24 * 60, 7))  # not on a step
+    end = start + timedelta(days=rng.randint(1, 5), minutes=rng.randrange(0, 24 * 60, 5))
+    duration = timedelta(minutes=rng.choice([15, 20, 30, 60, 120]))
+
+    assert slots(doctor, hours, start, end, duration) == brute_force(doctor, hours, start, end, duration)
+
+
+def test_slots_resume_on_the_step_after_a_booking():
+    doctor = next(_doctors)
+    book(doctor, MONDAY.replace(hour=9), minutes=10)   # 09:00-09:10
+    book(doctor, MONDAY.replace(hour=10), minutes=60)  # 10:00-11:00
+    day = slots(doctor, DEFAULT_HOURS, MONDAY, MONDAY + timedelta(days=1), timedelta(minutes=30))
+    starts = [s.strftime('%H:%M') for s, _ in day]
+    assert starts[:5] == ['09:15', '09:30', '11:00', '11:15', '11:30']
+    assert '12:45' not in starts and '12:30' in starts  # 12:30-13:00 fits before lunch
+    assert starts[-1] == '16:30'
+
+
+def test_limit_and_days_off():
+    doctor = next(_doctors)
+    saturday = MONDAY + timedelta(days=5)
+    assert slots(doctor, DEFAULT_HOURS, saturday, saturday + timedelta(days=2), STEP) == []
+    first_three = list(schedule_index.free_slots(doctor, DEFAULT_HOURS, MONDAY, MONDAY + timedelta(days=7),
+                                                 timedelta(minutes=30), limit=3))
+    assert [s.time() for s, _ in first_three] == [time(9), time(9, 15), time(9, 30)]
+
+
+# ── Endpoint ─────────────────────────────────────
+
+@pytest.fixture(scope='module')
+def doctors(app):
+    """Two cardiologists with different hours, registered as doctor profiles."""
+    made = []
+    for name, hours in (('slot-early', {'mon': ['07:00-08:00']}), ('slot-late', {'mon': ['15:00-16:00']})):
+        user, _ = make_user(name, user_type='doctor')
+        profile = user_profiles_db.filter(user_id=user['id'])[0]
+        user_profiles_db.update(profile['id'], {'specialization': 'Cardiology', 'working_hours': hours})
+        made.append(user['id'])
+    return made
+
+
+def test_slots_endpoint_for_one_doctor(client, patient, doctors):
+    early, _ = doctors
+    book(early, MONDAY.replace(hour=7, minute=15), minutes=30)
+    response = client.get('/api/appointments/slots/', headers=patient[1], query_string={
+        'doctor': early, 'date': MONDAY.date().isoformat(), 'days': 1, 'duration': 15})
+    assert response.status_code == 200
+    [result] = response.get_json()['results']
+    assert [s['start'][11:16] for s in result['slots']] == ['07:00', '07:45']
+
+
+def test_slots_endpoint_by_specialization_earliest_first(client, patient, doctors):
+    response = client.get('/api/appointments/slots/', headers=patient[1], query_string={
+        'specialization': 'cardiology', 'date': MONDAY.date().isoformat(), 'days': 1, 'duration': 15})
+    assert [r['doctor'] for r in response.get_json()['results']] == doctors
+
+
+@pytest.mark.parametrize('query', [{}, {'doctor': 1, 'date': 'tomorrow'}])
+def test_slots_endpoint_rejects_bad_queries(client, patient, query):
+    assert client.get('/api/appointments/slots/', headers=patient[1], query_string=query).status_code == 400
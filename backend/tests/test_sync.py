@@ -0,0 +1,134 @@
+"""Delta sync: snapshots, the `since` cursor, deletes and ownership changes, and expired cursors."""
+
+from itertools import count
+
+import pytest
+
+from api.json_db import health_metrics_db, medications_db, prescriptions_db
+from conftest import in_another_process, make_user
+from sync_service import change_log
+
+_serial = count()
+
+
+@pytest.fixture
+def user(app):
+    """A fresh user per test, so snapshots only hold that test's records."""
+    user, headers = make_user(f'syncer-{next(_serial)}')
+    return user['id'], headers
+
+
+def sync(client, headers, since=None):
+    query = {'since': since} if since is not None else {}
+    response = client.get('/api/sync/', query_string=query, headers=headers)
+    assert response.status_code == 200
+    return response.get_json()
+
+
+def ids(changes, name, kind):
+    rows = changes['changes'].get(name, {}).get(kind, [])
+    return sorted(r if isinstance(r, int) else r['id'] for r in rows)
+
+
+def test_snapshot_then_only_new_changes(client, user):
+    uid, headers = user
+    kept = health_metrics_db.create({'user': uid, 'value': 1})
+    health_metrics_db.create({'user': uid + 10 ** 6, 'value': 1})  # someone else's
+
+    snapshot = sync(client, headers)
+    assert snapshot['reset'] is True
+    assert ids(snapshot, 'health_metrics', 'created') == [kept['id']]
+
+    quiet = sync(client, headers, snapshot['cursor'])
+    assert quiet == {'reset': False, 'cursor': snapshot['cursor'], 'changes': {}}
+
+
+def test_creates_updates_and_deletes_since_the_cursor(client, user):
+    uid, headers = user
+    updated = health_metrics_db.create({'user': uid, 'value': 1})
+    deleted = health_metrics_db.create({'user': uid, 'value': 2})
+    cursor = sync(client, headers)['cursor']
+
+    created = health_metrics_db.create({'user': uid, 'value': 3})
+    health_metrics_db.update(updated['id'], {'value': 10})
+    health_metrics_db.delete(deleted['id'])
+    fleeting = health_metrics_db.create({'user': uid, 'value': 4})
+    health_metrics_db.delete(fleeting['id'])  # created and gone inside the window: not sent
+
+    delta = sync(client, headers, cursor)
+    assert delta['reset'] is False
+    assert ids(delta, 'health_metrics', 'created') == [created['id']]
+    assert ids(delta, 'health_metrics', 'updated') == [updated['id']]
+    assert delta['changes']['health_metrics']['updated'][0]['value'] == 10
+    assert ids(delta, 'health_metrics', 'deleted') == [deleted['id']]
+
+    assert sync(client, headers, delta['cursor'])['changes'] == {}
+
+
+def test_record_handed_to_another_user_is_deleted_for_the_old_owner(client, user):
+    uid, headers = user
+    other, other_headers = make_user(f'syncer-other-{next(_serial)}')
+    record = health_metrics_db.create({'user': uid, 'value': 1})
+    mine, theirs = sync(client, headers)['cursor'], sync(client, other_headers)['cursor']
+
+    health_metrics_db.update(record['id'], {'user': other['id']})
+
+    assert ids(sync(client, headers, mine), 'health_metrics', 'deleted') == [record['id']]
+    assert ids(sync(client, other_headers, theirs), 'health_metrics', 'updated') == [record['id']]
+
+
+def test_medication_change_resends_its_prescription(client, user):
+    uid, headers = user
+    prescription = prescriptions_db.create({'patient': uid, 'doctor': 1})
+    cursor = sync(client, headers)['cursor']
+
+    medications_db.create({'prescription_id': prescription['id'], 'name': 'aspirin'})
+
+    [sent] = sync(client, headers, cursor)['changes']['prescriptions']['updated']
+    assert [m['name'] for m in sent['medications']] == ['aspirin']
+
+
+def test_another_workers_writes_are_synced(client, user):
+    uid, headers = user
+    cursor = sync(client, headers)['cursor']
+    in_another_process(lambda: health_metrics_db.create({'user': uid, 'value': 5}))
+    delta = sync(client, headers, cursor)
+    assert delta['reset'] is False  # the other worker logged its write; cursors stay valid
+    assert [r['value'] for r in delta['changes']['health_metrics']['created']] == [5]
+
+
+def test_restore_from_backup_expires_every_cursor(client, user):
+    uid, headers = user
+    health_metrics_db.create({'user': uid, 'value': 1})
+    cursor = sync(client, headers)['cursor']
+
+    health_metrics_db.filepath.write_text('{"auto_id": 0, "records": [')
+    health_metrics_db.get_all()  # the next read restores the newest backup
+
+    response = sync(client, headers, cursor)
+    assert response['reset'] is True
+    assert [r['value'] for r in response['changes']['health_metrics']['created']] == [1]
+
+
+@pytest.mark.parametrize('cursor', ['garbage', 'nolog.12', '', 'x.-1'])
+def test_unknown_cursor_gets_a_snapshot(client, user, cursor):
+    uid, headers = user
+    record = health_metrics_db.create({'user': uid, 'value': 1})
+    response = sync(client, headers, cursor)
+    assert response['reset'] is True
+    assert ids(response, 'health_metrics', 'created') == [record['id']]
+
+
+def test_cursor_into_a_rotated_log_expires(client, user, monkeypatch):
+    uid, headers = user
+    record = health_metrics_db.create({'user': uid, 'value': 1})
+    cursor = sync(client, headers)['cursor']
+
+    monkeypatch.setattr(change_log, 'max_bytes', 1)
+    health_metrics_db.update(record['id'], {'value': 2})  # this append rotates the log
+    monkeypatch.undo()
+
+    expired = sync(client, headers, cursor)
+    assert expired['reset'] is True
+    assert expired['changes']['health_metrics']['created'][0]['value'] == 2
+    assert sync(client, headers, expired['cursor'])['reset'] is False
@@ -4,10 +4,21 @@ Uses JSON file storage via json_db.
 """
 
 import logging
-from flask import Blueprint, request, jsonify, g
+from flask import Blueprint, Response, make_response, request, jsonify, g
 from datetime import datetime, timedelta
 
-from auth import login_required
+from auth import login_required, stream_login_required, STREAM_COOKIE, JWT_EXPIRATION_HOURS
+from http_cache import conditional
+from dashboard_service import get_dashboard_summary
+from sync_service import get_changes
+from events_service import subscribe, event_stream, EVENTS_RETRY_MS
+from api.pubsub import BrokerFull
+from rating_service import rating_index, LEADERBOARD_SORTS
+from schedule_service import (
+    schedule_index, appointment_interval, parse_datetime, parse_working_hours, doctor_hours,
+)
+from api.timing import span
+from api.message_store import message_store, MESSAGE_PAGE_SIZE
 
 logger = logging.getLogger(__name__)
 
@@ -16,6 +27,7 @@ try:
         user_profiles_db, medical_records_db, prescriptions_db, medications_db,
         medicine_reminders_db, appointments_db, health_metrics_db, diet_plans_db,
         ai_consultations_db, emergency_contacts_db, doctor_reviews_db, users_db,
+        prefetch, prefetch_children, project,
     )
     from api.gemini_service import gemini_service
 except ImportError:
@@ -23,6 +35,7 @@ except ImportError:
         user_profiles_db, medical_records_db, prescriptions_db, medications_db,
         medicine_reminders_db, appointments_db, health_metrics_db, diet_plans_db,
         ai_consultations_db, emergency_contacts_db, doctor_reviews_db, users_db,
+        prefetch, prefetch_children, project,
     )
     try:
         from api.gemini_service import gemini_service
@@ -34,23 +47,76 @@ views_bp = Blueprint('views', __name__)
 
 # ── Helpers ──────────────────────────────────────
 
-def _user_info(user_id):
-    u = users_db.get(user_id)
+def _format_user(user_id, u):
     if not u:
         return {'id': user_id, 'full_name': 'Unknown'}
     full = f"{u.get('first_name', '')} {u.get('last_name', '')}".strip() or u.get('username', '')
     return {'id': user_id, 'full_name': full, 'username': u.get('username', '')}
 
 
+def _user_info(user_id):
+    with span('user_info'):
+        return _format_user(user_id, users_db.get(user_id))
+
+
+def _attach_user_names(records, *fields):
+    """Set `<field>_name` for each user-id field with a single users_db read."""
+    if not fields:
+        return records
+    with span('user_names'):
+        return prefetch(
+            records, fields, users_db,
+            as_=tuple(f'{f}_name' for f in fields),
+            transform=lambda u, user_id: _format_user(user_id, u)['full_name'],
+            fields=('first_name', 'last_name', 'username'),
+        )
+
+
+def _sparse_fields():
+    """Fields named by ?fields=a,b,c, or None for full records."""
+    fields = {f.strip() for f in request.args.get('fields', '').split(',') if f.strip()}
+    return fields or None
+
+
+def _int_arg(name):
+    """Integer query-string argument (cursor, limit, id), or None."""
+    try:
+        return int(request.args[name])
+    except (KeyError, ValueError):
+        return None
+
+
+def _load_fields(fields, *needed):
+    """Storage projection for `fields`: the requested ones plus join/sort keys."""
+    return None if fields is None else fields | {'id', *needed}
+
+
+def _name_fields(fields, *candidates):
+    """User-id fields whose `<field>_name` is wanted in the response."""
+    return tuple(f for f in candidates if fields is None or f'{f}_name' in fields)
+
+
+def _wants(fields, name):
+    return fields is None or name in fields
+
+
 def _get_profile(user_id):
     profiles = user_profiles_db.filter(user_id=user_id)
     return profiles[0] if profiles else None
 
 
+def _owned(collection, staff_field, staff_types=('doctor',)):
+    """Conditional-GET sources for a list that is filtered by the caller's role."""
+    profile = g.user._raw.get('profile') or {}
+    field = staff_field if profile.get('user_type') in staff_types else 'patient'
+    return [(collection, field, g.user.id), (user_profiles_db, 'user_id', g.user.id)]
+
+
 # ── User Profile ─────────────────────────────────
 
 @views_bp.route('/profiles/me/', methods=['GET', 'PUT', 'PATCH'])
 @login_required
+@conditional(lambda: [(user_profiles_db, 'user_id', g.user.id), (users_db, 'id', g.user.id)])
 def profile_me():
     try:
         profile = _get_profile(g.user.id)
@@ -72,8 +138,14 @@ def profile_me():
             'phone', 'date_of_birth', 'gender', 'address', 'blood_group',
             'height', 'weight', 'emergency_contact', 'specialization',
             'license_number', 'years_of_experience', 'consultation_fee', 'user_type',
+            'working_hours',
         ]
         updates = {k: v for k, v in data.items() if k in allowed}
+        if updates.get('working_hours') is not None:
+            try:
+                parse_working_hours(updates['working_hours'])
+            except ValueError as e:
+                return jsonify({'error': 'Invalid working_hours', 'detail': str(e)}), 400
         if updates:
             profile = user_profiles_db.update(profile['id'], updates)
             logger.info(f"Profile updated for user {g.user.id}")
@@ -90,18 +162,21 @@ def profile_me():
 
 @views_bp.route('/medical-records/', methods=['GET', 'POST'])
 @login_required
+@conditional(lambda: _owned(medical_records_db, 'recorded_by') + [users_db])
 def medical_records_list():
     uid = g.user.id
     profile = _get_profile(uid)
 
     if request.method == 'GET':
+        fields = _sparse_fields()
+        names = _name_fields(fields, 'patient')
+        load = _load_fields(fields, *names)
         if profile and profile.get('user_type') == 'doctor':
-            records = medical_records_db.filter(recorded_by=uid)
+            records = medical_records_db.filter(recorded_by=uid, fields=load)
         else:
-            records = medical_records_db.filter(patient=uid)
-        for r in records:
-            r['patient_name'] = _user_info(r.get('patient', 0)).get('full_name', '')
-        return jsonify(records)
+            records = medical_records_db.filter(patient=uid, fields=load)
+        _attach_user_names(records, *names)
+        return jsonify(project(records, fields))
 
     data = request.get_json(silent=True) or {}
     data['recorded_by'] = uid
@@ -115,14 +190,16 @@ def medical_records_list():
 
 @views_bp.route('/medical-records/<int:pk>/', methods=['GET', 'PUT', 'DELETE'])
 @login_required
+@conditional(lambda pk: [(medical_records_db, 'id', pk), users_db])
 def medical_records_detail(pk):
     record = medical_records_db.get(pk)
     if not record:
         return jsonify({'detail': 'Not found'}), 404
 
     if request.method == 'GET':
-        record['patient_name'] = _user_info(record.get('patient', 0)).get('full_name', '')
-        return jsonify(record)
+        fields = _sparse_fields()
+        _attach_user_names([record], *_name_fields(fields, 'patient'))
+        return jsonify(project(record, fields))
 
     if request.method == 'PUT':
         data = request.get_json(silent=True) or {}
@@ -139,20 +216,23 @@ def medical_records_detail(pk):
 
 @views_bp.route('/prescriptions/', methods=['GET', 'POST'])
 @login_required
+@conditional(lambda: _owned(prescriptions_db, 'doctor') + [medications_db, users_db])
 def prescriptions_list():
     uid = g.user.id
     profile = _get_profile(uid)
 
     if request.method == 'GET':
+        fields = _sparse_fields()
+        names = _name_fields(fields, 'patient', 'doctor')
+        load = _load_fields(fields, *names)
         if profile and profile.get('user_type') == 'doctor':
-            records = prescriptions_db.filter(doctor=uid)
+            records = prescriptions_db.filter(doctor=uid, fields=load)
         else:
-            records = prescriptions_db.filter(patient=uid)
-        for r in records:
-            r['medications'] = medications_db.filter(prescription_id=r['id'])
-            r['patient_name'] = _user_info(r.get('patient', 0)).get('full_name', '')
-            r['doctor_name'] = _user_info(r.get('doctor', 0)).get('full_name', '')
-        return jsonify(records)
+            records = prescriptions_db.filter(patient=uid, fields=load)
+        if _wants(fields, 'medications'):
+            prefetch_children(records, medications_db, fk='prescription_id', as_='medications')
+        _attach_user_names(records, *names)
+        return jsonify(project(records, fields))
 
     data = request.get_json(silent=True) or {}
     meds = data.pop('medications', [])
@@ -163,24 +243,24 @@ def prescriptions_list():
 
     for med in meds:
         med['prescription_id'] = record['id']
-        medications_db.create(med)
-
-    record['medications'] = medications_db.filter(prescription_id=record['id'])
+    record['medications'] = medications_db.bulk_create(meds) if meds else []
     return jsonify(record), 201
 
 
 @views_bp.route('/prescriptions/<int:pk>/', methods=['GET', 'PUT', 'DELETE'])
 @login_required
+@conditional(lambda pk: [(prescriptions_db, 'id', pk), medications_db, users_db])
 def prescriptions_detail(pk):
     record = prescriptions_db.get(pk)
     if not record:
         return jsonify({'detail': 'Not found'}), 404
 
     if request.method == 'GET':
-        record['medications'] = medications_db.filter(prescription_id=pk)
-        record['patient_name'] = _user_info(record.get('patient', 0)).get('full_name', '')
-        record['doctor_name'] = _user_info(record.get('doctor', 0)).get('full_name', '')
-        return jsonify(record)
+        fields = _sparse_fields()
+        if _wants(fields, 'medications'):
+            record['medications'] = medications_db.filter(prescription_id=pk)
+        _attach_user_names([record], *_name_fields(fields, 'patient', 'doctor'))
+        return jsonify(project(record, fields))
 
     if request.method == 'PUT':
         data = request.get_json(silent=True) or {}
@@ -245,10 +325,11 @@ def prescription_analyze(pk):
 
 @views_bp.route('/medicine-reminders/', methods=['GET', 'POST'])
 @login_required
+@conditional(lambda: [(medicine_reminders_db, 'user', g.user.id)])
 def medicine_reminders_list():
     uid = g.user.id
     if request.method == 'GET':
-        return jsonify(medicine_reminders_db.filter(user=uid))
+        return jsonify(medicine_reminders_db.filter(user=uid, fields=_sparse_fields()))
 
     data = request.get_json(silent=True) or {}
     data['user'] = uid
@@ -260,13 +341,14 @@ def medicine_reminders_list():
 
 @views_bp.route('/medicine-reminders/<int:pk>/', methods=['GET', 'PUT', 'DELETE'])
 @login_required
+@conditional(lambda pk: [(medicine_reminders_db, 'id', pk)])
 def medicine_reminders_detail(pk):
     record = medicine_reminders_db.get(pk)
     if not record:
         return jsonify({'detail': 'Not found'}), 404
 
     if request.method == 'GET':
-        return jsonify(record)
+        return jsonify(project(record, _sparse_fields()))
     if request.method == 'PUT':
         data = request.get_json(silent=True) or {}
         allowed = ['medication', 'dosage', 'frequency', 'start_date', 'end_date', 'reminder_times', 'is_active', 'notes']
@@ -280,21 +362,38 @@ def medicine_reminders_detail(pk):
 
 # ── Appointments ─────────────────────────────────
 
+def _booking_conflict(record, exclude=None):
+    """409 response if `record` overlaps another active appointment of its doctor, else None."""
+    interval = appointment_interval(record)
+    if interval is None or record.get('doctor') is None:
+        return None
+    clashes = schedule_index.conflicts(record['doctor'], *interval, exclude=exclude)
+    if not clashes:
+        return None
+    return jsonify({
+        'error': 'Conflict',
+        'detail': 'The doctor already has an appointment at that time',
+        'conflicts': [{'start': c['start'], 'end': c['end']} for c in clashes],
+    }), 409
+
+
 @views_bp.route('/appointments/', methods=['GET', 'POST'])
 @login_required
+@conditional(lambda: _owned(appointments_db, 'doctor') + [users_db])
 def appointments_list():
     uid = g.user.id
     profile = _get_profile(uid)
 
     if request.method == 'GET':
+        fields = _sparse_fields()
+        names = _name_fields(fields, 'patient', 'doctor')
+        load = _load_fields(fields, *names)
         if profile and profile.get('user_type') == 'doctor':
-            records = appointments_db.filter(doctor=uid)
+            records = appointments_db.filter(doctor=uid, fields=load)
         else:
-            records = appointments_db.filter(patient=uid)
-        for r in records:
-            r['patient_name'] = _user_info(r.get('patient', 0)).get('full_name', '')
-            r['doctor_name'] = _user_info(r.get('doctor', 0)).get('full_name', '')
-        return jsonify(records)
+            records = appointments_db.filter(patient=uid, fields=load)
+        _attach_user_names(records, *names)
+        return jsonify(project(records, fields))
 
     data = request.get_json(silent=True) or {}
     data['patient'] = uid
@@ -302,27 +401,44 @@ def appointments_list():
         data['status'] = 'scheduled'
     if 'duration' not in data:
         data['duration'] = 30
-    record = appointments_db.create(data)
+    if data.get('appointment_date') is not None and parse_datetime(data['appointment_date']) is None:
+        return jsonify({'error': 'Invalid appointment_date', 'detail': 'Use an ISO 8601 date and time'}), 400
+    with schedule_index.booking():
+        conflict = _booking_conflict(data)
+        if conflict is not None:
+            return conflict
+        record = appointments_db.create(data)
     return jsonify(record), 201
 
 
 @views_bp.route('/appointments/<int:pk>/', methods=['GET', 'PUT', 'DELETE'])
 @login_required
+@conditional(lambda pk: [(appointments_db, 'id', pk), users_db])
 def appointments_detail(pk):
     record = appointments_db.get(pk)
     if not record:
         return jsonify({'detail': 'Not found'}), 404
 
     if request.method == 'GET':
-        record['patient_name'] = _user_info(record.get('patient', 0)).get('full_name', '')
-        record['doctor_name'] = _user_info(record.get('doctor', 0)).get('full_name', '')
-        return jsonify(record)
+        fields = _sparse_fields()
+        _attach_user_names([record], *_name_fields(fields, 'patient', 'doctor'))
+        return jsonify(project(record, fields))
 
     if request.method == 'PUT':
         data = request.get_json(silent=True) or {}
         allowed = ['appointment_date', 'duration', 'status', 'reason', 'notes']
         updates = {k: v for k, v in data.items() if k in allowed}
-        record = appointments_db.update(pk, updates)
+        if updates.get('appointment_date') is not None and parse_datetime(updates['appointment_date']) is None:
+            return jsonify({'error': 'Invalid appointment_date', 'detail': 'Use an ISO 8601 date and time'}), 400
+        with schedule_index.booking():
+            # Re-read under the lock: another request may have moved or removed it
+            record = appointments_db.get(pk)
+            if not record:
+                return jsonify({'detail': 'Not found'}), 404
+            conflict = _booking_conflict({**record, **updates}, exclude=pk)
+            if conflict is not None:
+                return conflict
+            record = appointments_db.update(pk, updates)
         return jsonify(record)
 
     appointments_db.delete(pk)
@@ -333,31 +449,105 @@ def appointments_detail(pk):
 @login_required
 def appointments_upcoming():
     uid = g.user.id
-    now = datetime.now().isoformat()
-    records = appointments_db.filter_fn(
-        lambda r: (
-            r.get('patient') == uid and
-            r.get('appointment_date', '') >= now and
-            r.get('status') in ('scheduled', 'confirmed')
-        )
-    )
-    records.sort(key=lambda r: r.get('appointment_date', ''))
-    for r in records:
-        r['patient_name'] = _user_info(r.get('patient', 0)).get('full_name', '')
-        r['doctor_name'] = _user_info(r.get('doctor', 0)).get('full_name', '')
-    return jsonify(records)
+    fields = _sparse_fields()
+    names = _name_fields(fields, 'patient', 'doctor')
+    # The schedule index already holds them in start order
+    ids = schedule_index.patient_upcoming(uid, datetime.now())
+    found = appointments_db.get_many(ids, fields=_load_fields(fields, *names))
+    records = [found[i] for i in ids if i in found]
+    _attach_user_names(records, *names)
+    return jsonify(project(records, fields))
+
+
+@views_bp.route('/appointments/schedule/', methods=['GET'])
+@login_required
+def appointments_schedule():
+    """A doctor's calendar: ?doctor=<id> (default: the caller), ?date=YYYY-MM-DD (default today), ?days=1..31
+
+    Doctors get their own appointments in full; anyone else only the busy intervals.
+    """
+    uid = g.user.id
+    doctor = _int_arg('doctor') or uid
+    day = parse_datetime(request.args.get('date') or datetime.now().date().isoformat())
+    if day is None:
+        return jsonify({'error': 'Invalid date', 'detail': 'Use YYYY-MM-DD'}), 400
+    start = day.replace(hour=0, minute=0, second=0, microsecond=0)
+    end = start + timedelta(days=min(max(_int_arg('days') or 1, 1), 31))
+
+    busy = schedule_index.doctor_range(doctor, start, end)
+    result = {'doctor': doctor, 'start': start.isoformat(), 'end': end.isoformat()}
+    if doctor != uid:
+        result['busy'] = [{'start': b['start'], 'end': b['end']} for b in busy]
+        return jsonify(result), 200
+
+    fields = _sparse_fields()
+    names = _name_fields(fields, 'patient')
+    ids = [b['id'] for b in busy]
+    found = appointments_db.get_many(ids, fields=_load_fields(fields, *names))
+    records = [found[i] for i in ids if i in found]
+    _attach_user_names(records, *names)
+    result['results'] = project(records, fields)
+    return jsonify(result), 200
+
+
+@views_bp.route('/appointments/slots/', methods=['GET'])
+@login_required
+def appointments_slots():
+    """Open slots for ?doctor=<id> or every doctor of ?specialization=, earliest opening first
+
+    Optional: ?date=YYYY-MM-DD (today), ?days=1..31 (7), ?duration=<minutes> (30), ?limit=<per doctor> (20).
+    """
+    doctor_id = _int_arg('doctor')
+    specialization = request.args.get('specialization', '').strip().lower()
+    if doctor_id is None and not specialization:
+        return jsonify({'error': 'Give a doctor or a specialization'}), 400
+    day = parse_datetime(request.args.get('date') or datetime.now().date().isoformat())
+    if day is None:
+        return jsonify({'error': 'Invalid date', 'detail': 'Use YYYY-MM-DD'}), 400
+    start = max(day.replace(hour=0, minute=0, second=0, microsecond=0), datetime.now())
+    end = day.replace(hour=0, minute=0, second=0, microsecond=0) + timedelta(
+        days=min(max(_int_arg('days') or 7, 1), 31))
+    duration = timedelta(minutes=min(max(_int_arg('duration') or 30, 5), 480))
+    limit = min(max(_int_arg('limit') or 20, 1), 200)
+
+    if doctor_id is not None:
+        doctors = user_profiles_db.filter(user_id=doctor_id, user_type='doctor')
+    else:
+        doctors = [p for p in user_profiles_db.filter(user_type='doctor')
+                   if (p.get('specialization') or '').strip().lower() == specialization]
+
+    results = []
+    for profile in doctors:
+        slots = list(schedule_index.free_slots(
+            profile['user_id'], doctor_hours(profile), start, end, duration, limit=limit))
+        if slots:
+            results.append({
+                'doctor': profile['user_id'],
+                'specialization': profile.get('specialization'),
+                'consultation_fee': profile.get('consultation_fee'),
+                'slots': [{'start': s.isoformat(), 'end': e.isoformat()} for s, e in slots],
+            })
+    results.sort(key=lambda r: r['slots'][0]['start'])
+    _attach_user_names(results, 'doctor')
+    return jsonify({
+        'start': start.isoformat(), 'end': end.isoformat(),
+        'duration': int(duration.total_seconds() // 60),
+        'results': results,
+    }), 200
 
 
 # ── Health Metrics ───────────────────────────────
 
 @views_bp.route('/health-metrics/', methods=['GET', 'POST'])
 @login_required
+@conditional(lambda: [(health_metrics_db, 'user', g.user.id)])
 def health_metrics_list():
     uid = g.user.id
     if request.method == 'GET':
-        records = health_metrics_db.filter(user=uid)
+        fields = _sparse_fields()
+        records = health_metrics_db.filter(user=uid, fields=_load_fields(fields, 'recorded_at'))
         records.sort(key=lambda r: r.get('recorded_at', ''), reverse=True)
-        return jsonify(records)
+        return jsonify(project(records, fields))
 
     data = request.get_json(silent=True) or {}
     data['user'] = uid
@@ -369,13 +559,14 @@ def health_metrics_list():
 
 @views_bp.route('/health-metrics/<int:pk>/', methods=['GET', 'PUT', 'DELETE'])
 @login_required
+@conditional(lambda pk: [(health_metrics_db, 'id', pk)])
 def health_metrics_detail(pk):
     record = health_metrics_db.get(pk)
     if not record:
         return jsonify({'detail': 'Not found'}), 404
 
     if request.method == 'GET':
-        return jsonify(record)
+        return jsonify(project(record, _sparse_fields()))
     if request.method == 'PUT':
         data = request.get_json(silent=True) or {}
         allowed = ['metric_type', 'value', 'unit', 'notes', 'recorded_at']
@@ -395,28 +586,33 @@ def health_metrics_trends():
     days = int(request.args.get('days', 30))
     start = (datetime.now() - timedelta(days=days)).isoformat()
 
+    fields = _sparse_fields()
     records = health_metrics_db.filter_fn(
-        lambda r: r.get('user') == uid and r.get('recorded_at', '') >= start
+        lambda r: (
+            r.get('user') == uid and r.get('recorded_at', '') >= start
+            and (not metric_type or r.get('metric_type') == metric_type)
+        ),
+        fields=_load_fields(fields, 'recorded_at'),
     )
-    if metric_type:
-        records = [r for r in records if r.get('metric_type') == metric_type]
     records.sort(key=lambda r: r.get('recorded_at', ''))
-    return jsonify(records)
+    return jsonify(project(records, fields))
 
 
 # ── Diet Plans ───────────────────────────────────
 
 @views_bp.route('/diet-plans/', methods=['GET', 'POST'])
 @login_required
+@conditional(lambda: _owned(diet_plans_db, 'created_by', ('doctor', 'healthcare_worker')))
 def diet_plans_list():
     uid = g.user.id
     profile = _get_profile(uid)
 
     if request.method == 'GET':
+        fields = _sparse_fields()
         if profile and profile.get('user_type') in ('doctor', 'healthcare_worker'):
-            records = diet_plans_db.filter(created_by=uid)
+            records = diet_plans_db.filter(created_by=uid, fields=fields)
         else:
-            records = diet_plans_db.filter(patient=uid)
+            records = diet_plans_db.filter(patient=uid, fields=fields)
         return jsonify(records)
 
     data = request.get_json(silent=True) or {}
@@ -429,13 +625,14 @@ def diet_plans_list():
 
 @views_bp.route('/diet-plans/<int:pk>/', methods=['GET', 'PUT', 'DELETE'])
 @login_required
+@conditional(lambda pk: [(diet_plans_db, 'id', pk)])
 def diet_plans_detail(pk):
     record = diet_plans_db.get(pk)
     if not record:
         return jsonify({'detail': 'Not found'}), 404
 
     if request.method == 'GET':
-        return jsonify(record)
+        return jsonify(project(record, _sparse_fields()))
     if request.method == 'PUT':
         data = request.get_json(silent=True) or {}
         allowed = ['title', 'description', 'goal', 'daily_calories', 'plan_details', 'start_date', 'end_date', 'is_active']
@@ -449,23 +646,26 @@ def diet_plans_detail(pk):
 
 @views_bp.route('/diet-plans/active/', methods=['GET'])
 @login_required
+@conditional(lambda: [(diet_plans_db, 'patient', g.user.id)])
 def diet_plans_active():
     uid = g.user.id
-    return jsonify(diet_plans_db.filter(patient=uid, is_active=True))
+    return jsonify(diet_plans_db.filter(patient=uid, is_active=True, fields=_sparse_fields()))
 
 
 # ── AI Consultations ─────────────────────────────
 
 @views_bp.route('/ai-consultations/', methods=['GET', 'POST'])
 @login_required
+@conditional(lambda: [(ai_consultations_db, 'patient', g.user.id)])
 def ai_consultations_list():
     uid = g.user.id
 
     if request.method == 'GET':
-        records = ai_consultations_db.filter(patient=uid)
+        fields = _sparse_fields()
+        records = ai_consultations_db.filter(patient=uid, fields=_load_fields(fields, 'created_at'))
         records.sort(key=lambda r: r.get('created_at', ''), reverse=True)
         limit = int(request.args.get('limit', 50))
-        return jsonify(records[:limit])
+        return jsonify(project(records[:limit], fields))
 
     data = request.get_json(silent=True) or {}
     symptoms = data.get('symptoms', '')
@@ -536,10 +736,11 @@ def ai_consultations_list():
 
 @views_bp.route('/emergency-contacts/', methods=['GET', 'POST'])
 @login_required
+@conditional(lambda: [(emergency_contacts_db, 'user', g.user.id)])
 def emergency_contacts_list():
     uid = g.user.id
     if request.method == 'GET':
-        return jsonify(emergency_contacts_db.filter(user=uid))
+        return jsonify(emergency_contacts_db.filter(user=uid, fields=_sparse_fields()))
 
     data = request.get_json(silent=True) or {}
     data['user'] = uid
@@ -549,13 +750,14 @@ def emergency_contacts_list():
 
 @views_bp.route('/emergency-contacts/<int:pk>/', methods=['GET', 'PUT', 'DELETE'])
 @login_required
+@conditional(lambda pk: [(emergency_contacts_db, 'id', pk)])
 def emergency_contacts_detail(pk):
     record = emergency_contacts_db.get(pk)
     if not record:
         return jsonify({'detail': 'Not found'}), 404
 
     if request.method == 'GET':
-        return jsonify(record)
+        return jsonify(project(record, _sparse_fields()))
     if request.method == 'PUT':
         data = request.get_json(silent=True) or {}
         allowed = ['name', 'relationship', 'phone', 'email', 'is_primary']
@@ -571,37 +773,80 @@ def emergency_contacts_detail(pk):
 
 @views_bp.route('/doctor-reviews/', methods=['GET', 'POST'])
 @login_required
+@conditional(lambda: _owned(doctor_reviews_db, 'doctor') + [users_db])
 def doctor_reviews_list():
     uid = g.user.id
     profile = _get_profile(uid)
 
     if request.method == 'GET':
+        fields = _sparse_fields()
+        names = _name_fields(fields, 'patient', 'doctor')
+        load = _load_fields(fields, *names)
         if profile and profile.get('user_type') == 'doctor':
-            records = doctor_reviews_db.filter(doctor=uid)
+            records = doctor_reviews_db.filter(doctor=uid, fields=load)
         else:
-            records = doctor_reviews_db.filter(patient=uid)
-        for r in records:
-            r['patient_name'] = _user_info(r.get('patient', 0)).get('full_name', '')
-            r['doctor_name'] = _user_info(r.get('doctor', 0)).get('full_name', '')
-        return jsonify(records)
+            records = doctor_reviews_db.filter(patient=uid, fields=load)
+        _attach_user_names(records, *names)
+        return jsonify(project(records, fields))
 
     data = request.get_json(silent=True) or {}
+    doctor = data.get('doctor')
+    if (not isinstance(doctor, int) or isinstance(doctor, bool)
+            or not user_profiles_db.filter(user_id=doctor, user_type='doctor')):
+        return jsonify({'error': 'Invalid doctor', 'detail': 'doctor must be the id of a registered doctor'}), 400
     data['patient'] = uid
     record = doctor_reviews_db.create(data)
     return jsonify(record), 201
 
 
+@views_bp.route('/doctor-reviews/leaderboard/', methods=['GET'])
+@login_required
+def doctor_reviews_leaderboard():
+    """Top-rated doctors from the running aggregates, never the raw reviews
+
+    Optional: ?sort=score|recent|count, ?limit= (10), ?min_reviews= (1), ?clinic_id=, ?specialization=.
+    """
+    sort = request.args.get('sort', 'score')
+    if sort not in LEADERBOARD_SORTS:
+        return jsonify({'error': 'Invalid sort', 'detail': f"Use one of {', '.join(LEADERBOARD_SORTS)}"}), 400
+    limit = min(max(_int_arg('limit') or 10, 1), 100)
+    min_reviews = max(_int_arg('min_reviews') or 1, 1)
+
+    clinic_id = _int_arg('clinic_id')
+    specialization = request.args.get('specialization', '').strip().lower()
+    include = None
+    if clinic_id is not None or specialization:
+        doctors = {
+            p['user_id'] for p in user_profiles_db.filter(user_type='doctor')
+            if (clinic_id is None or p.get('clinic_id') == clinic_id)
+            and (not specialization or (p.get('specialization') or '').strip().lower() == specialization)
+        }
+        include = doctors.__contains__
+
+    results = rating_index.leaderboard(limit, sort, min_reviews, include)
+    _attach_user_names(results, 'doctor')
+    return jsonify({'sort': sort, 'results': results}), 200
+
+
+@views_bp.route('/doctor-reviews/summary/<int:doctor_id>/', methods=['GET'])
+@login_required
+def doctor_rating_summary(doctor_id):
+    """A doctor's review count, averages and 1–5 histogram"""
+    return jsonify(rating_index.summary(doctor_id)), 200
+
+
 @views_bp.route('/doctor-reviews/<int:pk>/', methods=['GET', 'PUT', 'DELETE'])
 @login_required
+@conditional(lambda pk: [(doctor_reviews_db, 'id', pk), users_db])
 def doctor_reviews_detail(pk):
     record = doctor_reviews_db.get(pk)
     if not record:
         return jsonify({'detail': 'Not found'}), 404
 
     if request.method == 'GET':
-        record['patient_name'] = _user_info(record.get('patient', 0)).get('full_name', '')
-        record['doctor_name'] = _user_info(record.get('doctor', 0)).get('full_name', '')
-        return jsonify(record)
+        fields = _sparse_fields()
+        _attach_user_names([record], *_name_fields(fields, 'patient', 'doctor'))
+        return jsonify(project(record, fields))
     if request.method == 'PUT':
         data = request.get_json(silent=True) or {}
         allowed = ['rating', 'review']
@@ -618,48 +863,24 @@ def doctor_reviews_detail(pk):
 @views_bp.route('/dashboard/stats/', methods=['GET'])
 @login_required
 def dashboard_stats():
-    uid = g.user.id
-    now = datetime.now().isoformat()
-    today = datetime.now().date().isoformat()
-
-    upcoming = appointments_db.filter_fn(
-        lambda r: r.get('patient') == uid and
-        r.get('appointment_date', '') >= now and
-        r.get('status') in ('scheduled', 'confirmed')
-    )
-
-    # Handle prescriptions with missing or empty valid_until (treat as ongoing)
-    active_prescriptions = prescriptions_db.filter_fn(
-        lambda r: r.get('patient') == uid and (
-            not r.get('valid_until') or 
-            r.get('valid_until') == '' or 
-            r.get('valid_until', '') >= today
-        )
-    )
-
-    # Handle reminders with missing or empty end_date (treat as ongoing)
-    active_reminders = medicine_reminders_db.filter_fn(
-        lambda r: r.get('user') == uid and
-        r.get('is_active') is True and (
-            not r.get('end_date') or 
-            r.get('end_date') == '' or 
-            r.get('end_date', '') >= today
-        )
-    )
+    # Counters are maintained incrementally by dashboard_service
+    summary = get_dashboard_summary(g.user.id)
+    return jsonify({
+        'upcoming_appointments': summary['upcoming_appointments'],
+        'active_prescriptions': summary['active_prescriptions'],
+        'active_reminders': summary['active_reminders'],
+        'total_consultations': summary['total_consultations'],
+        'recent_metrics': summary['recent_metrics'],
+    })
 
-    total_consultations = ai_consultations_db.count(patient=uid)
 
-    metrics = health_metrics_db.filter(user=uid)
-    metrics.sort(key=lambda r: r.get('recorded_at', ''), reverse=True)
-    recent_metrics = metrics[:5]
+# ── Delta Sync ───────────────────────────────────
 
-    return jsonify({
-        'upcoming_appointments': len(upcoming),
-        'active_prescriptions': len(active_prescriptions),
-        'active_reminders': len(active_reminders),
-        'total_consultations': total_consultations,
-        'recent_metrics': recent_metrics,
-    })
+@views_bp.route('/sync/', methods=['GET'])
+@login_required
+def sync_changes():
+    """Records changed since ?since=<cursor> (full snapshot without one)."""
+    return jsonify(get_changes(g.user.id, request.args.get('since')))
 
 
 # ── Health Education ─────────────────────────────
@@ -694,25 +915,23 @@ def health_education():
 
 # ── Messages / Chat ──────────────────────────────
 
-# Create a simple in-memory message store (in production, use a database)
-_messages_store = {}
-
 @views_bp.route('/messages/', methods=['GET', 'POST'])
 @login_required
 def messages():
-    """Get messages for the current user or send a message"""
+    """Conversation history (?recipient_id=), the conversation list, or send a message"""
     uid = g.user.id
     
     if request.method == 'GET':
-        # Get all messages for this user
-        recipient_id = request.args.get('recipient_id')
-        if recipient_id:
-            key = f"{min(uid, int(recipient_id))}_{max(uid, int(recipient_id))}"
+        before = _int_arg('before')
+        limit = _int_arg('limit') or MESSAGE_PAGE_SIZE
+        recipient_id = _int_arg('recipient_id')
+        if recipient_id is not None:
+            page = message_store.history(uid, recipient_id, before=before, limit=limit)
         else:
-            key = str(uid)
-        
-        msgs = _messages_store.get(key, [])
-        return jsonify(msgs), 200
+            page = message_store.conversations(uid, before=before, limit=limit)
+            _attach_user_names(page['results'], 'peer')
+        page['unread'] = message_store.unread_count(uid)
+        return jsonify(page), 200
     
     # POST - Send a message
     data = request.get_json(silent=True) or {}
@@ -721,33 +940,68 @@ def messages():
     
     if not recipient_id or not text:
         return jsonify({'error': 'recipient_id and text are required'}), 400
+    try:
+        recipient_id = int(recipient_id)
+    except (TypeError, ValueError):
+        return jsonify({'error': 'recipient_id must be a user id'}), 400
+    if recipient_id == uid or users_db.get(recipient_id, fields=('id',)) is None:
+        return jsonify({'error': 'Recipient not found'}), 404
     
-    key = f"{min(uid, int(recipient_id))}_{max(uid, int(recipient_id))}"
-    if key not in _messages_store:
-        _messages_store[key] = []
-    
-    message = {
-        'id': len(_messages_store[key]) + 1,
-        'sender': uid,
-        'recipient': int(recipient_id),
-        'text': text,
-        'timestamp': datetime.utcnow().isoformat(),
-        'read': False,
-    }
-    
-    _messages_store[key].append(message)
+    message = message_store.send(uid, recipient_id, text)
     return jsonify(message), 201
 
 
+@views_bp.route('/messages/unread/', methods=['GET'])
+@login_required
+def messages_unread():
+    """Total unread messages for the current user"""
+    return jsonify({'unread': message_store.unread_count(g.user.id)}), 200
+
+
 @views_bp.route('/messages/<int:message_id>/', methods=['PATCH'])
 @login_required
 def mark_message_read(message_id):
-    """Mark a message as read"""
+    """Read receipt: mark this message, and everything before it in the conversation, as read"""
     data = request.get_json(silent=True) or {}
-    read_status = data.get('read', True)
+    if not data.get('read', True):
+        return jsonify({'error': 'Messages cannot be marked unread'}), 400
     
-    # In a real app, update the message in the database
-    return jsonify({'id': message_id, 'read': read_status}), 200
+    receipt = message_store.mark_read(g.user.id, message_id)
+    if receipt is None:
+        return jsonify({'error': 'Message not found'}), 404
+    return jsonify(receipt), 200
+
+
+@views_bp.route('/events/', methods=['GET'])
+@stream_login_required
+def events():
+    """Server-Sent Events: new messages, read receipts, appointment changes and reminders"""
+    try:
+        subscription = subscribe(g.user.id)
+    except BrokerFull:
+        return jsonify({'error': 'Too many open event streams on this server'}), 503, {
+            'Retry-After': str(EVENTS_RETRY_MS // 1000)}
+    if subscription is None:
+        return jsonify({'error': 'Too many open event streams'}), 429
+    return Response(event_stream(subscription), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no',  # keep reverse proxies from buffering the stream
+    })
+
+
+@views_bp.route('/events/session/', methods=['POST', 'DELETE'])
+@login_required
+def events_session():
+    """Set (or clear) the cookie EventSource authenticates /api/events/ with"""
+    response = make_response('', 204)
+    if request.method == 'DELETE':
+        response.delete_cookie(STREAM_COOKIE, path='/api/events/')
+        return response
+    token = request.headers.get('Authorization', '')[len('Bearer '):]
+    response.set_cookie(STREAM_COOKIE, token, max_age=JWT_EXPIRATION_HOURS * 3600,
+                        path='/api/events/', secure=request.is_secure, httponly=True,
+                        samesite='Strict')
+    return response
 
 
 @views_bp.route('/appointments/<int:apt_id>/start-video/', methods=['POST'])
@@ -87,10 +87,15 @@ echo -e "${GREEN}✓ Video server ready${NC}\n"
 echo -e "${BLUE}Starting servers...${NC}\n"
 
 # Start backend
-echo -e "${YELLOW}Starting backend server (port 8000)...${NC}"
 cd "$BACKEND_DIR"
 source myenv/bin/activate
-python app.py > /tmp/backend.log 2>&1 &
+if [ "${SERVE_MODE:-development}" = "production" ]; then
+    echo -e "${YELLOW}Starting backend server with prefork workers (port 8000)...${NC}"
+    python serve.py > /tmp/backend.log 2>&1 &
+else
+    echo -e "${YELLOW}Starting backend server (port 8000)...${NC}"
+    python app.py > /tmp/backend.log 2>&1 &
+fi
 BACKEND_PID=$!
 echo -e "${GREEN}Backend started (PID: $BACKEND_PID)${NC}"
 